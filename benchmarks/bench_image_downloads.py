@@ -0,0 +1,46 @@
+"""
+Compare sequential image downloads with the pooled ImageDownloader
+
+Usage:
+    python benchmarks/bench_image_downloads.py --images 40 --latency 0.05
+"""
+import os
+import sys
+import time
+import argparse
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_downloader import ImageDownloader
+from stand_in_server import StandInServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=40, help="Number of images to download")
+    parser.add_argument("--latency", type=float, default=0.05, help="Server latency per request (seconds)")
+    parser.add_argument("--workers", type=int, default=None, help="Downloader worker threads")
+    args = parser.parse_args()
+
+    with StandInServer(image_count=args.images, latency=args.latency) as server:
+        urls = server.image_urls()
+
+        start = time.perf_counter()
+        for url in urls:
+            requests.get(url, timeout=10).raise_for_status()
+        sequential = time.perf_counter() - start
+
+        downloader = ImageDownloader(max_workers=args.workers, per_host_limit=args.workers)
+        start = time.perf_counter()
+        images = downloader.download_many(urls)
+        pooled = time.perf_counter() - start
+        downloader.close()
+
+    failed = sum(1 for image in images.values() if image is None)
+    print(f"sequential: {sequential:.2f}s ({len(urls) / sequential:.1f} images/s)")
+    print(f"pooled:     {pooled:.2f}s ({len(urls) / pooled:.1f} images/s, {failed} failed)")
+
+
+if __name__ == "__main__":
+    main()
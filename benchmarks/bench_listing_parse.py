@@ -0,0 +1,95 @@
+"""
+Compare whole-body and streaming parsing of a large Reddit listing page
+
+Serves a synthetic listing of gallery posts with full media_metadata and
+reads it with RedditRSSParser in both modes, reporting time and peak
+Python memory (tracemalloc).
+
+Usage:
+    python benchmarks/bench_listing_parse.py --posts 100 --gallery-size 20
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from rss_parser import RedditRSSParser
+from stand_in_server import StandInServer
+
+
+def make_listing(posts, gallery_size):
+    """
+    Build a listing page of gallery posts
+
+    Args:
+        posts (int): Number of posts
+        gallery_size (int): Images per gallery, each with a full set of preview resolutions
+
+    Returns:
+        bytes: Listing JSON
+    """
+    children = []
+    for i in range(posts):
+        media_ids = [f"m{i}x{j}" for j in range(gallery_size)]
+        resolutions = [
+            {"u": f"https://preview.redd.it/{media_id}.jpg?width={width}&amp;s=abc", "x": width, "y": width}
+            for media_id in media_ids for width in (108, 216, 320, 640, 960, 1080)
+        ]
+        children.append({"kind": "t3", "data": {
+            "id": f"post{i}",
+            "name": f"t3_post{i}",
+            "title": f"Gallery post {i}",
+            "selftext": "Some text " * 50,
+            "created_utc": 1700000000 - i * 60,
+            "permalink": f"/r/bench/comments/post{i}/",
+            "url": f"https://www.reddit.com/gallery/post{i}",
+            "is_gallery": True,
+            "gallery_data": {"items": [{"media_id": media_id} for media_id in media_ids]},
+            "media_metadata": {
+                media_id: {"status": "valid", "e": "Image", "m": "image/jpg", "p": resolutions,
+                           "s": {"u": f"https://preview.redd.it/{media_id}.jpg?s=abc", "x": 4000, "y": 3000}}
+                for media_id in media_ids
+            }
+        }})
+    return json.dumps({"kind": "Listing", "data": {"after": None, "dist": posts, "children": children}}).encode()
+
+
+def measure(api_url, streaming):
+    """Fetch the listing once and return (seconds, peak bytes, posts)"""
+    config.REDDIT_STREAMING_PARSE = streaming
+    parser = RedditRSSParser(api_url=api_url)
+    tracemalloc.start()
+    start = time.perf_counter()
+    posts = parser.get_new_posts()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(posts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=100, help="Posts in the listing page")
+    parser.add_argument("--gallery-size", type=int, default=20, help="Images per gallery post")
+    args = parser.parse_args()
+
+    config.DEMO_MODE = False
+    config.REDDIT_POLL_PAGE_SIZE = args.posts
+    body = make_listing(args.posts, args.gallery_size)
+
+    with StandInServer(image_count=0, latency=0) as server:
+        server.add_route("/r/bench/new.json", "application/json", body)
+        api_url = server.base_url + "/r/bench/new.json"
+        print(f"listing: {args.posts} posts, {len(body) / (1024 * 1024):.1f} MB")
+        for name, streaming in (("whole body", False), ("streaming", True)):
+            elapsed, peak, count = measure(api_url, streaming)
+            print(f"{name:<11} {elapsed:.3f}s, peak {peak / (1024 * 1024):.1f} MB, {count} posts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Measure how long the dashboard takes to start, and guard it
+
+Every check runs in a fresh Python process, so nothing is already imported:
+
+    import   imports streamlit_app and lists the heavy modules it pulled in
+    worker   renders the dashboard in read-only (INGESTION_MODE=worker) mode
+    inline   renders the dashboard in inline mode, where models warm up in the background
+
+Pages are rendered with Streamlit's AppTest against a temporary store seeded
+with synthetic posts; a rerun is timed after the first render. Startup must
+not import torch, transformers or onnxruntime, and no render may wait for a
+model to load. The script exits with status 1 if either happens or a time
+budget is exceeded, so it can run in CI.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --posts 5000 --max-render-seconds 5
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import importlib
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CHECKS = ["import", "worker", "inline"]
+
+# Modules that only model loading should import
+HEAVY_MODULES = ["torch", "transformers", "onnxruntime", "PIL"]
+
+
+def seed_store(db_path, count, seed=0):
+    """
+    Fill a post store with analyzed synthetic posts
+
+    Args:
+        db_path (str): Database file to create
+        count (int): Number of posts
+        seed (int): Random seed
+    """
+    import config
+    from models import Post, Sentiment
+    from post_store import PostStore
+
+    rng = random.Random(seed)
+    now = time.time()
+    posts = []
+    for i in range(count):
+        score = rng.uniform(-1, 1)
+        posts.append(Post(
+            f"post{i}",
+            title=f"Synthetic post {i}",
+            content="Some text about the city. " * rng.randint(1, 20),
+            link=f"https://www.reddit.com/r/bench/comments/post{i}/",
+            published=now - i * 60,
+            source="r/bench",
+            category=rng.choice(config.CATEGORIES),
+            sentiment=Sentiment(score, "NEGATIVE" if score < 0 else "POSITIVE", score < config.NEGATIVE_THRESHOLD),
+            timestamp=now - i * 60
+        ))
+    PostStore(db_path=db_path).upsert(posts)
+
+
+def child_import():
+    """Time importing the dashboard module (runs in the child process)"""
+    start = time.perf_counter()
+    importlib.import_module("streamlit_app")
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "heavy_modules": [name for name in HEAVY_MODULES if name in sys.modules]}
+
+
+def child_render():
+    """Time the first render and a rerun of the dashboard (runs in the child process)"""
+    from streamlit.testing.v1 import AppTest
+
+    start = time.perf_counter()
+    app = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=120)
+    app.run()
+    first = time.perf_counter() - start
+    # Checked straight away: in inline mode the warm-up thread starts loading right after the render
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    from model_registry import get_registry
+    loaded = sorted(get_registry().stats())
+
+    start = time.perf_counter()
+    app.run()
+    rerun = time.perf_counter() - start
+
+    return {
+        "seconds": first,
+        "rerun_seconds": rerun,
+        "heavy_modules": heavy,
+        "models_loaded": loaded,
+        "exceptions": [str(exception.value) for exception in app.exception],
+    }
+
+
+def run_check(name, directory, timeout):
+    """
+    Run one check in a fresh interpreter
+
+    Args:
+        name (str): One of CHECKS
+        directory (str): Scratch directory holding the seeded store
+        timeout (float): Seconds before the child is killed
+
+    Returns:
+        dict: The child's measurements, with the process wall time added
+    """
+    env = dict(
+        os.environ,
+        POSTS_DB_PATH=os.path.join(directory, "posts.sqlite3"),
+        METRICS_FILE=os.path.join(directory, "metrics.prom"),
+        METRICS_PORT="0",
+        INFERENCE_CACHE_PATH=os.path.join(directory, "inference_cache.sqlite3"),
+        IMAGE_CACHE_PATH=os.path.join(directory, "image_cache.sqlite3"),
+        INGESTION_MODE="inline" if name == "inline" else "worker",
+        PROFILING_MODE="off",
+    )
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", name],
+        cwd=directory, env=env, capture_output=True, text=True, timeout=timeout
+    )
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"{name} check failed:\n{completed.stderr[-2000:]}")
+    # The result is the last stdout line; Streamlit may log above it
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_seconds"] = wall
+    return result
+
+
+def check_budgets(results, args):
+    """
+    Compare results with the budgets
+
+    Returns:
+        list: Failure messages, empty if every check passed
+    """
+    failures = []
+    for name, result in results.items():
+        budget = args.max_import_seconds if name == "import" else args.max_render_seconds
+        if result["seconds"] > budget:
+            failures.append(f"{name}: {result['seconds']:.2f}s is over the {budget:.2f}s budget")
+        # The inline warm-up thread may import model libraries as soon as the render ends
+        if result["heavy_modules"] and name != "inline":
+            failures.append(f"{name}: imported {', '.join(result['heavy_modules'])} at startup")
+        if result.get("models_loaded"):
+            failures.append(f"{name}: loaded {', '.join(result['models_loaded'])} before the first render finished")
+        if result.get("exceptions"):
+            failures.append(f"{name}: the page raised {'; '.join(result['exceptions'])}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=2000, help="Posts in the seeded store")
+    parser.add_argument("--checks", nargs="+", choices=CHECKS, default=CHECKS, help="Checks to run")
+    parser.add_argument("--max-import-seconds", type=float, default=5.0, help="Budget for importing streamlit_app")
+    parser.add_argument("--max-render-seconds", type=float, default=10.0, help="Budget for the first render")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds before a check is killed")
+    parser.add_argument("--output", default=None,
+                        help="Result file, defaults to benchmarks/results/startup-<timestamp>.json")
+    parser.add_argument("--child", choices=CHECKS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = child_import() if args.child == "import" else child_render()
+        print(json.dumps(result))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        seed_store(os.path.join(directory, "posts.sqlite3"), args.posts)
+        for name in args.checks:
+            results[name] = run_check(name, directory, args.timeout)
+
+    print(f"{'check':<8} {'seconds':>9} {'rerun s':>9} {'process s':>10}  heavy modules")
+    for name, result in results.items():
+        rerun = f"{result['rerun_seconds']:.2f}" if "rerun_seconds" in result else "-"
+        print(f"{name:<8} {result['seconds']:>9.2f} {rerun:>9} {result['process_seconds']:>10.2f}  "
+              f"{', '.join(result['heavy_modules']) or '-'}")
+
+    failures = check_budgets(results, args)
+    document = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "posts": args.posts,
+        },
+        "checks": results,
+        "failures": failures,
+    }
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results", f"startup-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {output}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
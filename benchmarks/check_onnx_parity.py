@@ -0,0 +1,107 @@
+"""
+Check ONNX Runtime backends against the PyTorch baseline
+
+Runs the same texts through each backend of a text model and compares class
+probabilities with PyTorch. Reports the largest probability difference,
+label agreement, latency per text and RSS growth per backend, and exits with
+status 1 if a backend is outside its tolerance.
+
+Usage:
+    python benchmarks/check_onnx_parity.py --model sentiment
+    python benchmarks/check_onnx_parity.py --model zero_shot --backends onnx
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+import config
+from inference_backend import load_text_classifier
+from model_registry import _current_rss_bytes
+
+TEXTS = [
+    "Boston Public Garden looking beautiful today, the flowers are in full bloom!",
+    "Terrible accident on I-93 northbound. Avoid if possible, major delays expected.",
+    "Has anyone tried the new Italian place on Newbury Street? The pasta looks amazing!",
+    "Signal problems at Harvard Square. Expect 15-20 minute delays on the Red Line.",
+    "Looking for coffee shops with good wifi and plenty of outlets in Cambridge.",
+    "My car got towed again even though there was no sign. Absolutely furious.",
+    "Free outdoor concert on the Esplanade this Friday night, bring a blanket.",
+    "Rent went up 20% this year and the landlord still won't fix the heating.",
+    "The Celtics game last night was incredible, what a comeback in the fourth quarter.",
+    "Another water main break downtown, streets flooded near Downtown Crossing.",
+    "Lost dog near Jamaica Pond, brown lab mix answering to Max. Please help!",
+    "Is the Blue Line running normally today? Heading to the airport.",
+]
+
+MODELS = {
+    "sentiment": (config.SENTIMENT_MODEL, "sentiment-analysis"),
+    "zero_shot": (config.ZERO_SHOT_MODEL, "zero-shot-classification"),
+}
+
+# Largest allowed probability difference from PyTorch and smallest label agreement
+TOLERANCES = {
+    "onnx": (1e-3, 1.0),
+    "onnx-int8": (0.1, 0.9),
+}
+
+
+def encode(tokenizer, model_name):
+    """Tokenize the sample texts; zero-shot models get a premise/hypothesis pair per text"""
+    if model_name == "zero_shot":
+        hypotheses = [config.CATEGORY_HYPOTHESIS_TEMPLATE.format(category) for category in config.CATEGORIES]
+        premises = [text for text in TEXTS for _ in hypotheses]
+        pairs = hypotheses * len(TEXTS)
+        return tokenizer(premises, pairs, padding=True, truncation=True, return_tensors="pt")
+    return tokenizer(TEXTS, padding=True, truncation=True, return_tensors="pt")
+
+
+def run(backend, model_name, repeats):
+    """Load one backend and return (probabilities, seconds per text, RSS growth in bytes)"""
+    model_config, task = MODELS[model_name]
+    rss_before = _current_rss_bytes()
+    tokenizer, model, used = load_text_classifier(dict(model_config, backend=backend), task)
+    if used != backend:
+        raise SystemExit(f"Backend {backend} is unavailable (loaded {used})")
+
+    inputs = encode(tokenizer, model_name)
+    with torch.no_grad():
+        probabilities = model(**inputs).logits.softmax(dim=-1)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(**inputs)
+        elapsed = (time.perf_counter() - start) / repeats / len(inputs["input_ids"])
+    return probabilities, elapsed, _current_rss_bytes() - rss_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=sorted(MODELS), default="sentiment", help="Model to check")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"], choices=sorted(TOLERANCES),
+                        help="Backends to compare with torch")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the sample texts")
+    args = parser.parse_args()
+
+    baseline, baseline_latency, baseline_rss = run("torch", args.model, args.repeats)
+    print(f"torch:     {baseline_latency * 1000:.2f} ms/text, +{baseline_rss / (1024 * 1024):.0f} MB")
+
+    failed = False
+    for backend in args.backends:
+        probabilities, latency, rss = run(backend, args.model, args.repeats)
+        max_diff = (probabilities - baseline).abs().max().item()
+        agreement = (probabilities.argmax(dim=-1) == baseline.argmax(dim=-1)).float().mean().item()
+        max_allowed, min_agreement = TOLERANCES[backend]
+        ok = max_diff <= max_allowed and agreement >= min_agreement
+        failed = failed or not ok
+        print(f"{backend + ':':<10} {latency * 1000:.2f} ms/text, +{rss / (1024 * 1024):.0f} MB, "
+              f"max prob diff {max_diff:.5f} (<= {max_allowed}), labels agree {agreement:.0%} "
+              f"(>= {min_agreement:.0%}) {'OK' if ok else 'FAIL'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
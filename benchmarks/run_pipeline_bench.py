@@ -0,0 +1,396 @@
+"""
+Benchmark every post processing stage on a synthetic Reddit corpus
+
+Generates listing pages of text posts, preview-image posts and galleries,
+serves them and their images from the local stand-in server, then runs
+parsing, image download, image classification, categorization, sentiment,
+storage and burst detection one stage at a time in pipeline-sized batches.
+Each stage reports throughput, p50/p99 batch latency and peak RSS. Results
+are written to a JSON file; --compare prints the change against an earlier
+result file.
+
+Inference and image result caches are off unless --with-caches is given,
+so repeated runs measure the models rather than cache hits.
+
+Usage:
+    python benchmarks/run_pipeline_bench.py --posts 500
+    python benchmarks/run_pipeline_bench.py --posts 500 --compare benchmarks/results/previous.json
+    python benchmarks/run_pipeline_bench.py --stages parse store bursts   # no models needed
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import config
+from model_registry import _current_rss_bytes
+from stand_in_server import StandInServer
+
+STAGES = ["parse", "image_download", "image_classify", "categorize", "sentiment", "text_analysis", "store", "bursts"]
+
+# Phrases per category, so categorization sees realistic topical text
+TOPICS = {
+    "Transportation": ["Red Line delays at Park Street", "the Green Line shuttle buses", "parking on Beacon Hill",
+                       "traffic on the Mass Pike", "Blue Line to the airport"],
+    "Food": ["the new ramen place in Allston", "lobster rolls in the North End", "coffee shops near Kendall",
+             "brunch spots in the South End"],
+    "Housing": ["rent going up again in Somerville", "my landlord won't fix the heat", "September 1st move-in day",
+                "broker fees for a two bedroom"],
+    "Weather": ["the nor'easter this weekend", "a foot of snow overnight", "the heat wave this week"],
+    "Sports": ["the Celtics game last night", "Red Sox opening day at Fenway", "Bruins playoff tickets"],
+    "Events": ["the concert on the Esplanade", "First Night celebrations", "the farmers market on Saturday"],
+    "Crime": ["a car break-in on my street", "the police activity downtown", "stolen bikes near Harvard"],
+    "Politics": ["the city council vote", "the mayor's budget proposal", "the ballot question on rent control"],
+    "Question": ["does anyone know a good dentist", "where can I get my bike fixed", "is the ferry running"],
+}
+NEGATIVE = ["This is absolutely terrible.", "I'm so frustrated and angry.", "Worst experience ever, avoid it.",
+            "Honestly it's a disaster and nobody cares."]
+POSITIVE = ["This is wonderful!", "Really happy with how it turned out.", "Highly recommend it, great time.",
+            "Such a lovely day, loved it."]
+NEUTRAL = ["Posting for anyone who was wondering.", "More details in the comments.", "Not sure what to expect.",
+           "Curious what others think."]
+
+
+def make_corpus(count, base_url, image_count, image_share=0.3, gallery_share=0.1, gallery_size=4,
+                long_share=0.05, seed=0):
+    """
+    Generate Reddit listing children for a synthetic corpus
+
+    Args:
+        count (int): Number of posts
+        base_url (str): Stand-in server serving /images/<n>.jpg
+        image_count (int): Distinct images served; posts reuse them round-robin
+        image_share (float): Share of posts with a single preview image
+        gallery_share (float): Share of gallery posts
+        gallery_size (int): Images per gallery
+        long_share (float): Share of posts long enough to be truncated by the models
+        seed (int): Random seed, so runs are comparable
+
+    Returns:
+        list: Listing children ({"kind": "t3", "data": {...}}), newest first
+    """
+    rng = random.Random(seed)
+    now = time.time()
+    next_image = 0
+    children = []
+    for i in range(count):
+        category = rng.choice(list(TOPICS))
+        tone = rng.choice([NEGATIVE, POSITIVE, NEUTRAL])
+        topic = rng.choice(TOPICS[category])
+        sentences = 200 if rng.random() < long_share else rng.randint(0, 8)
+        selftext = " ".join(f"Thinking about {topic}. {rng.choice(tone)}" for _ in range(sentences))
+        data = {
+            "id": f"bench{i}",
+            "name": f"t3_bench{i}",
+            "title": f"{topic[0].upper()}{topic[1:]}. {rng.choice(tone)}",
+            "selftext": selftext,
+            # Newest first, a few posts a minute, so bursts form inside the detection window
+            "created_utc": now - i * 20,
+            "permalink": f"/r/bench/comments/bench{i}/",
+            "url": f"https://www.reddit.com/r/bench/comments/bench{i}/",
+        }
+
+        kind = rng.random()
+        if kind < gallery_share:
+            media_ids = []
+            for _ in range(gallery_size):
+                media_ids.append(f"img{next_image % image_count}")
+                next_image += 1
+            data["is_gallery"] = True
+            data["gallery_data"] = {"items": [{"media_id": media_id} for media_id in media_ids]}
+            data["media_metadata"] = {
+                media_id: {"status": "valid", "e": "Image", "m": "image/jpg",
+                           "s": {"u": f"{base_url}/images/{media_id[3:]}.jpg", "x": 640, "y": 480}}
+                for media_id in media_ids
+            }
+        elif kind < gallery_share + image_share:
+            data["preview"] = {"images": [{"source": {"url": f"{base_url}/images/{next_image % image_count}.jpg",
+                                                      "width": 640, "height": 480}}]}
+            next_image += 1
+
+        children.append({"kind": "t3", "data": data})
+    return children
+
+
+def serve_listing_pages(server, children, page_size):
+    """
+    Add the corpus to the stand-in server as separate listing pages
+
+    Returns:
+        list: URL of each page
+    """
+    urls = []
+    for number, start in enumerate(range(0, len(children), page_size)):
+        page = children[start:start + page_size]
+        body = json.dumps({"kind": "Listing", "data": {"after": None, "dist": len(page), "children": page}})
+        path = f"/r/bench/page{number}.json"
+        server.add_route(path, "application/json", body.encode())
+        urls.append(server.base_url + path)
+    return urls
+
+
+def batches(items, size):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def stage_batch_size(name, fallback=16):
+    """Batch size the ingestion pipeline uses for a stage"""
+    pipeline_name = {"categorize": "text_analysis", "sentiment": "text_analysis", "bursts": "burst_check"}.get(name, name)
+    return config.PIPELINE_STAGES.get(pipeline_name, {}).get("batch_size", fallback)
+
+
+class StageTimer:
+    """Times the batches of one stage and records its memory use"""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.items = 0
+        self.rss_before = _current_rss_bytes()
+
+    def add(self, seconds, items):
+        self.latencies.append(seconds)
+        self.items += items
+
+    def run(self, fn, batch, count=None):
+        """Call fn(batch) and record its time; count defaults to the batch size"""
+        start = time.perf_counter()
+        result = fn(batch)
+        self.add(time.perf_counter() - start, len(batch) if count is None else count)
+        return result
+
+    def summary(self):
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        total = float(latencies.sum())
+        return {
+            "items": self.items,
+            "batches": len(self.latencies),
+            "seconds": round(total, 4),
+            "throughput_per_s": round(self.items / total, 2) if total > 0 else None,
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 3),
+            "rss_delta_mb": round((_current_rss_bytes() - self.rss_before) / (1024 * 1024), 1),
+            # ru_maxrss is in kilobytes on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+
+
+def run_benchmark(args):
+    """Run the selected stages and return the result document"""
+    from post_store import PostStore
+    from burst_detector import BurstDetector
+    from rss_parser import RedditRSSParser
+
+    stages = set(args.stages)
+    results = {}
+    model_loads = {}
+
+    with StandInServer(image_count=args.images, latency=args.latency) as server:
+        children = make_corpus(args.posts, server.base_url, args.images, args.image_share,
+                               args.gallery_share, args.gallery_size, seed=args.seed)
+        page_urls = serve_listing_pages(server, children, config.REDDIT_PAGE_SIZE)
+
+        # Parsing: one parser per page, so every page is a fresh request
+        timer = StageTimer("parse")
+        posts = []
+        for url in page_urls:
+            start = time.perf_counter()
+            page_posts = RedditRSSParser(api_url=url).get_new_posts()
+            timer.add(time.perf_counter() - start, len(page_posts))
+            posts.extend(page_posts)
+        if "parse" in stages:
+            results["parse"] = timer.summary()
+        print(f"Parsed {len(posts)} posts, {sum(len(post.image_urls) for post in posts)} image URLs")
+
+        registry = None
+        if stages & {"image_classify", "categorize", "sentiment", "text_analysis"}:
+            from model_registry import get_registry
+            registry = get_registry()
+
+        # Image download and classification
+        fetched = []
+        if stages & {"image_download", "image_classify"}:
+            if "image_classify" in stages:
+                analyzer = registry.get("image")
+                fetch = analyzer.fetch_images
+            else:
+                from image_downloader import ImageDownloader
+                downloader = ImageDownloader()
+                fetch = lambda urls: ({}, {url: (image, None) for url, image in downloader.download_many(urls).items()})
+
+            timer = StageTimer("image_download")
+            for batch in batches(posts, stage_batch_size("image_download")):
+                urls = [url for post in batch for url in post.image_urls]
+                fetched.append((batch, timer.run(fetch, urls, count=len(batch))))
+            if "image_download" in stages:
+                results["image_download"] = timer.summary()
+
+        if "image_classify" in stages:
+            timer = StageTimer("image_classify")
+            for batch, (results_by_url, pending) in fetched:
+                analyses = timer.run(
+                    lambda batch: analyzer.analyze_fetched([post.image_urls for post in batch], results_by_url, pending),
+                    batch
+                )
+                for post, analysis in zip(batch, analyses):
+                    if analysis.get('captions'):
+                        post.content = post.content + " " + " ".join(analysis['captions'])
+            results["image_classify"] = timer.summary()
+
+        # Text models, each timed on its own
+        if "categorize" in stages:
+            categorizer = registry.get("categorizer")
+            timer = StageTimer("categorize")
+            for batch in batches(posts, stage_batch_size("categorize")):
+                for post, category in zip(batch, timer.run(categorizer.categorize_batch, batch)):
+                    post.category = category
+            results["categorize"] = timer.summary()
+
+        if "sentiment" in stages:
+            sentiment_analyzer = registry.get("sentiment")
+            timer = StageTimer("sentiment")
+            for batch in batches(posts, stage_batch_size("sentiment")):
+                for post, sentiment in zip(batch, timer.run(sentiment_analyzer.analyze_batch, batch)):
+                    post.sentiment = sentiment
+            results["sentiment"] = timer.summary()
+
+        if "text_analysis" in stages:
+            from text_analysis import get_text_engine
+            engine = get_text_engine()
+            timer = StageTimer("text_analysis")
+            for batch in batches(posts, stage_batch_size("text_analysis")):
+                for post, (category, sentiment) in zip(batch, timer.run(engine.analyze_batch, batch)):
+                    post.category, post.sentiment = category, sentiment
+            results["text_analysis"] = timer.summary()
+
+        if registry is not None:
+            model_loads = {
+                name: {"load_seconds": round(stats["load_seconds"], 3), "rss_mb": round(stats["rss_bytes"] / (1024 * 1024), 1)}
+                for name, stats in registry.stats().items()
+            }
+
+    # Posts skipped by the model stages still need a category and sentiment to store
+    from models import Sentiment
+    rng = random.Random(args.seed)
+    for post in posts:
+        post.category = post.category or rng.choice(list(TOPICS))
+        if post.sentiment is None:
+            score = rng.uniform(-1, 1)
+            post.sentiment = Sentiment(score, "NEGATIVE" if score < 0 else "POSITIVE", score < config.NEGATIVE_THRESHOLD)
+        post.timestamp = time.time()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if "store" in stages:
+            store = PostStore(db_path=os.path.join(directory, "posts.sqlite3"))
+            timer = StageTimer("store")
+            for batch in batches(posts, stage_batch_size("store")):
+                timer.run(store.upsert, batch)
+            results["store"] = timer.summary()
+
+    if "bursts" in stages:
+        detector = BurstDetector()
+        timer = StageTimer("bursts")
+        alerts = 0
+
+        def check(batch):
+            detector.add(batch)
+            return detector.new_bursts()
+
+        for batch in batches(posts, stage_batch_size("bursts")):
+            alerts += len(timer.run(check, batch))
+        results["bursts"] = dict(timer.summary(), alerts=alerts)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "posts": args.posts,
+            "images": args.images,
+            "latency": args.latency,
+            "seed": args.seed,
+            "with_caches": args.with_caches,
+            "categorizer_mode": config.CATEGORIZER_MODE,
+            "text_analysis_mode": config.TEXT_ANALYSIS_MODE,
+            "backends": {"sentiment": config.SENTIMENT_MODEL.get("backend"),
+                         "zero_shot": config.ZERO_SHOT_MODEL.get("backend")},
+        },
+        "model_loads": model_loads,
+        "stages": results,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_results(document, previous=None):
+    """Print a table of stage results, with the change from a previous run if given"""
+    previous_stages = (previous or {}).get("stages", {})
+    print(f"{'stage':<15} {'items/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'peak MB':>9}")
+    for name, stage in document["stages"].items():
+        line = (f"{name:<15} {stage['throughput_per_s'] or 0:>10.1f} {stage['p50_ms']:>10.2f} "
+                f"{stage['p99_ms']:>10.2f} {stage['peak_rss_mb']:>9.0f}")
+        before = previous_stages.get(name)
+        if before and before.get("throughput_per_s") and stage["throughput_per_s"]:
+            change = stage["throughput_per_s"] / before["throughput_per_s"] - 1
+            p99_change = stage["p99_ms"] / before["p99_ms"] - 1 if before["p99_ms"] else 0
+            line += f"   throughput {change:+.0%}, p99 {p99_change:+.0%}"
+        print(line)
+    print(f"peak RSS: {document['peak_rss_mb']:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=500, help="Posts in the synthetic corpus")
+    parser.add_argument("--images", type=int, default=60, help="Distinct images served")
+    parser.add_argument("--image-share", type=float, default=0.3, help="Share of posts with a preview image")
+    parser.add_argument("--gallery-share", type=float, default=0.1, help="Share of gallery posts")
+    parser.add_argument("--gallery-size", type=int, default=4, help="Images per gallery")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stand-in server latency per request (seconds)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to run")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus random seed")
+    parser.add_argument("--with-caches", action="store_true", help="Keep the inference and image result caches on")
+    parser.add_argument("--output", default=None,
+                        help="Result file, defaults to benchmarks/results/pipeline-<timestamp>.json")
+    parser.add_argument("--compare", default=None, help="Earlier result file to compare with")
+    args = parser.parse_args()
+
+    if not args.with_caches:
+        config.INFERENCE_CACHE_ENABLED = False
+        config.IMAGE_CACHE_ENABLED = False
+
+    document = run_benchmark(args)
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results", f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_results(document, previous)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Local HTTP stand-in for Reddit's image hosts, used by the benchmarks
+
+Serves generated JPEG images at /images/<n>.jpg with an optional artificial
+latency per request, so download concurrency can be measured without
+touching the network.
+"""
+import time
+import threading
+from io import BytesIO
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PIL import Image
+
+
+def make_image_bytes(index, size=(640, 480)):
+    """
+    Generate a distinct solid-color JPEG
+
+    Args:
+        index (int): Image number, used to pick the color
+        size (tuple): Image width and height
+
+    Returns:
+        bytes: Encoded JPEG
+    """
+    color = ((index * 67) % 256, (index * 131) % 256, (index * 197) % 256)
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class StandInServer:
+    """Threaded local HTTP server for images and other static payloads"""
+
+    def __init__(self, image_count=50, latency=0.05, port=0):
+        """
+        Args:
+            image_count (int): Number of distinct images to serve
+            latency (float): Seconds to wait before answering each request
+            port (int): Port to bind on localhost, 0 picks a free one
+        """
+        self.latency = latency
+        self.routes = {
+            f"/images/{i}.jpg": ("image/jpeg", make_image_bytes(i)) for i in range(image_count)
+        }
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so connection reuse is measurable
+
+            def do_GET(self):
+                time.sleep(server.latency)
+                route = server.routes.get(self.path.split("?")[0])
+                if route is None:
+                    self.send_error(404)
+                    return
+                content_type, body = route
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_route(self, path, content_type, body):
+        """Serve a static payload at a path"""
+        self.routes[path] = (content_type, body)
+
+    def image_urls(self):
+        """Get the URLs of every served image"""
+        return [self.base_url + path for path in self.routes if path.startswith("/images/")]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,141 @@
+import time
+import logging
+import threading
+from collections import deque
+import config
+from post_store import get_post_store
+
+logger = logging.getLogger("sentiment_agent")
+
+
+class BurstDetector:
+    """
+    Incremental sliding-window detector for bursts of negative posts
+
+    Keeps a time-ordered deque of negative posts per source and category, so
+    each subreddit's bursts are detected separately. Adding posts and
+    checking for bursts only touch new and expired entries, never all history.
+    Each burst is reported by new_bursts() once, when its category first crosses
+    the threshold; it is reported again only after the category drops back below.
+    Every post in a reported burst comes from the same source.
+    """
+
+    def __init__(self, threshold=None, timeframe_minutes=None):
+        """
+        Args:
+            threshold (int, optional): Negative posts needed for a burst, defaults to config.BURST_THRESHOLD
+            timeframe_minutes (int, optional): Window length, defaults to config.BURST_TIMEFRAME
+        """
+        self.threshold = threshold or config.BURST_THRESHOLD
+        self.window_seconds = (timeframe_minutes or config.BURST_TIMEFRAME) * 60
+        self._windows = {}  # (source, category) -> deque of (published timestamp, post)
+        self._seen_ids = set()
+        self._alerted = set()  # (source, category) keys whose current burst was already reported
+        self._lock = threading.Lock()
+
+    def add(self, posts, now=None):
+        """
+        Add processed posts; only negative posts inside the window are kept
+
+        Args:
+            posts (list): Processed Post records
+            now (float, optional): Current Unix time, defaults to time.time()
+        """
+        now = time.time() if now is None else now
+        cutoff = now - self.window_seconds
+
+        with self._lock:
+            for post in posts:
+                if post.sentiment is None or not post.sentiment.is_negative:
+                    continue
+                if post.id in self._seen_ids:
+                    continue
+
+                published = post.published
+                if published <= cutoff:
+                    continue
+
+                key = (post.source, post.category or 'Other')
+                window = self._windows.setdefault(key, deque())
+                # Posts usually arrive newest last; walk back only for out-of-order ones
+                position = len(window)
+                while position > 0 and window[position - 1][0] > published:
+                    position -= 1
+                window.insert(position, (published, post))
+                self._seen_ids.add(post.id)
+
+    def active_bursts(self, now=None):
+        """
+        Get every category currently over the burst threshold
+
+        Args:
+            now (float, optional): Current Unix time, defaults to time.time()
+
+        Returns:
+            list: List of (category, posts) tuples where a burst is active
+        """
+        return [(category, posts) for (_, category), posts in self._active(now)]
+
+    def _active(self, now):
+        """Get ((source, category), posts) for every window over the threshold"""
+        with self._lock:
+            self._evict(time.time() if now is None else now)
+            return [
+                (key, [post for _, post in window])
+                for key, window in self._windows.items()
+                if len(window) >= self.threshold
+            ]
+
+    def new_bursts(self, now=None):
+        """
+        Get bursts that haven't been reported yet and mark them as reported
+
+        Args:
+            now (float, optional): Current Unix time, defaults to time.time()
+
+        Returns:
+            list: List of (category, posts) tuples for newly detected bursts
+        """
+        bursts = self._active(now)
+        with self._lock:
+            active = {key for key, _ in bursts}
+            # A category that fell below the threshold can alert again later
+            self._alerted &= active
+            new = [(key, posts) for key, posts in bursts if key not in self._alerted]
+            self._alerted.update(key for key, _ in new)
+        return [(category, posts) for (_, category), posts in new]
+
+    def _evict(self, now):
+        """Drop posts that have moved out of the window"""
+        cutoff = now - self.window_seconds
+        for key in list(self._windows):
+            window = self._windows[key]
+            while window and window[0][0] <= cutoff:
+                _, post = window.popleft()
+                self._seen_ids.discard(post.id)
+            if not window:
+                del self._windows[key]
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_burst_detector():
+    """
+    Get the process-wide burst detector, seeded from the post store
+
+    Returns:
+        BurstDetector: The shared detector
+    """
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                detector = BurstDetector()
+                store = get_post_store()
+                detector.add(store.query(since=time.time() - detector.window_seconds, negative_only=True))
+                # Bursts that already existed before this process started were alerted by it
+                detector.new_bursts()
+                _detector = detector
+    return _detector
@@ -1,23 +1,116 @@
 import logging
+import threading
+import numpy as np
 import config
-from transformers import pipeline
+import torch
+from inference_backend import load_text_classifier
+from inference_cache import create_inference_cache
+from models import Post
+from profiling import profiled, section
+from text_embedder import TextEmbedder
+from tokenization import SpecialTokens, TokenizedTexts
 
 logger = logging.getLogger("sentiment_agent")
 
+# "nli" scores every post/category pair with the zero-shot model; "embedding" scores
+# posts against category prototypes and uses NLI only for ambiguous posts
+CATEGORIZER_MODES = ("nli", "embedding")
+
 class PostCategorizer:
-    def __init__(self):
+    def __init__(self, threads=None):
+        """
+        Args:
+            threads (int, optional): Intra-op threads for an ONNX backend, defaults to config.ONNX_THREADS
+        """
         # Initialize categories from config
         self.categories = config.CATEGORIES
         
-        # Initialize zero-shot classification pipeline
-        logger.info("Initializing zero-shot classification pipeline")
-        # Use model configuration from config.py
-        self.classifier = pipeline(
-            "zero-shot-classification",
-            model=config.ZERO_SHOT_MODEL["name"],
-            revision=config.ZERO_SHOT_MODEL["revision"]
+        self.mode = config.CATEGORIZER_MODE
+        if self.mode not in CATEGORIZER_MODES:
+            logger.warning(f"Unknown categorizer mode '{self.mode}', using nli")
+            self.mode = "nli"
+        
+        self.model = None
+        self.threads = threads
+        self._nli_lock = threading.Lock()
+        
+        if self.mode == "embedding":
+            # The NLI model is only loaded once a post needs the fallback
+            self.embedder = TextEmbedder()
+            self.prototypes = self._category_prototypes()
+            # Results depend on both models and on when the fallback kicks in
+            self.cache = create_inference_cache(
+                config.EMBEDDING_MODEL,
+                variant=repr((self.mode, self.categories, config.CATEGORY_DESCRIPTIONS,
+                              config.CATEGORY_HYPOTHESIS_TEMPLATE, config.CATEGORIZER_EMBEDDING_MARGIN,
+                              config.ZERO_SHOT_MODEL, config.CATEGORIZER_PRUNE_TOP_K,
+                              config.CATEGORIZER_PREVIEW_TOKENS, config.CATEGORIZER_EARLY_EXIT_CONFIDENCE))
+            )
+            return
+        
+        self._load_nli()
+        
+        # Results also depend on the label set and pruning settings, so they're part of the key
+        self.cache = create_inference_cache(
+            config.ZERO_SHOT_MODEL,
+            backend=self.backend,
+            variant=repr((self.categories, config.CATEGORY_HYPOTHESIS_TEMPLATE, config.CATEGORIZER_PRUNE_TOP_K,
+                          config.CATEGORIZER_PREVIEW_TOKENS, config.CATEGORIZER_EARLY_EXIT_CONFIDENCE))
         )
     
+    def _load_nli(self):
+        """Load the zero-shot NLI model and tokenize the category hypotheses, once"""
+        with self._nli_lock:
+            if self.model is not None:
+                return
+            
+            # Initialize zero-shot classification pipeline
+            logger.info("Initializing zero-shot classification pipeline")
+            # Use model configuration from config.py
+            # The backend (torch, onnx or onnx-int8) is chosen per model in config.ZERO_SHOT_MODEL
+            tokenizer, model, self.backend = load_text_classifier(
+                config.ZERO_SHOT_MODEL, "zero-shot-classification", threads=self.threads
+            )
+            
+            # Index of the NLI "entailment" logit (the last one if the model doesn't name it)
+            self.entailment_id = -1
+            for label, label_id in model.config.label2id.items():
+                if label.lower().startswith("entail"):
+                    self.entailment_id = label_id
+            
+            self.max_length = min(tokenizer.model_max_length, config.CATEGORIZER_MAX_LENGTH)
+            self.special_tokens = SpecialTokens(tokenizer)
+            
+            # The hypotheses never change, so tokenize them once up front
+            self.hypothesis_ids = [
+                tokenizer.encode(config.CATEGORY_HYPOTHESIS_TEMPLATE.format(category), add_special_tokens=False)
+                for category in self.categories
+            ]
+            
+            self.tokenizer = tokenizer
+            # Set last: other threads treat a loaded model as "everything is ready"
+            self.model = model
+    
+    def _category_prototypes(self):
+        """
+        Embed each category's hypothesis and example phrases into one prototype vector
+        
+        Returns:
+            numpy.ndarray: Unit vectors of shape (len(categories), dimension)
+        """
+        phrases = []
+        owners = []
+        for index, category in enumerate(self.categories):
+            descriptions = config.CATEGORY_DESCRIPTIONS.get(category, [])
+            for phrase in [config.CATEGORY_HYPOTHESIS_TEMPLATE.format(category)] + list(descriptions):
+                phrases.append(phrase)
+                owners.append(index)
+        
+        embeddings = self.embedder.embed(phrases)
+        owners = np.array(owners)
+        prototypes = np.stack([embeddings[owners == index].mean(axis=0) for index in range(len(self.categories))])
+        return prototypes / np.linalg.norm(prototypes, axis=1, keepdims=True)
+    
     def categorize(self, title, content):
         """
         Categorize a post based on its title and content
@@ -29,15 +122,210 @@ class PostCategorizer:
         Returns:
             str: The predicted category
         """
+        return self.categorize_batch([Post(None, title, content)])[0]
+    
+    @profiled("categorize")
+    def categorize_batch(self, posts, batch_size=None, tokenized=None, embeddings=None):
+        """
+        Categorize many posts, batching every post/label pair across posts
+        
+        With config.CATEGORIZER_PRUNE_TOP_K set, long posts are first scored
+        against all labels using only their first CATEGORIZER_PREVIEW_TOKENS
+        tokens. A confident preview result is used as-is (early exit);
+        otherwise only the top-k labels are re-scored on the full text.
+        
+        In "embedding" mode each post is embedded once and compared with every
+        category prototype in a single matrix product; only posts whose top two
+        categories are within config.CATEGORIZER_EMBEDDING_MARGIN go through NLI.
+        
+        Args:
+            posts (list): Post records
+            batch_size (int, optional): Premise/hypothesis pairs per forward pass,
+                defaults to config.CATEGORIZER_BATCH_SIZE
+            tokenized (TokenizedTexts, optional): The posts' texts, possibly already tokenized
+                for another model with the same vocabulary
+            embeddings (numpy.ndarray, optional): The posts' self.embedder embeddings in
+                "embedding" mode, when the caller already computed them for other heads
+            
+        Returns:
+            list: Predicted categories in the same order as posts
+        """
+        if not posts:
+            return []
+        
+        batch_size = batch_size or config.CATEGORIZER_BATCH_SIZE
+        
         # Combine title and content for categorization
-        text = f"{title}. {content}"
+        tokenized = tokenized or TokenizedTexts([post.text for post in posts])
+        texts = tokenized.texts
+        
+        if self.cache is None:
+            return self._categorize_texts(tokenized, batch_size, embeddings)
+        
+        # Only run the model on texts that aren't cached yet
+        results = self.cache.get_many(texts)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            computed = self._categorize_texts(
+                tokenized.subset(missing), batch_size, embeddings[missing] if embeddings is not None else None
+            )
+            self.cache.put_many([texts[i] for i in missing], computed)
+            for i, result in zip(missing, computed):
+                results[i] = result
+        
+        return results
+    
+    def _categorize_texts(self, tokenized, batch_size, embeddings=None):
+        """
+        Categorize combined title/content strings with the configured mode
         
-        # Get prediction using zero-shot classification
-        prediction = self.classifier(
-            text, 
-            candidate_labels=self.categories,
-            multi_label=False
+        Args:
+            tokenized (TokenizedTexts): Combined title/content strings
+            batch_size (int): Premise/hypothesis pairs per NLI forward pass
+            embeddings (numpy.ndarray, optional): Precomputed embeddings of the texts
+            
+        Returns:
+            list: Predicted categories in the same order as the texts
+        """
+        if self.mode != "embedding":
+            return self._nli_categorize(tokenized, batch_size)
+        
+        # One forward pass per post, then one (posts x categories) similarity matrix
+        if embeddings is None:
+            embeddings = self.embedder.embed(tokenized)
+        with section("categorize.postprocess"):
+            similarities = embeddings @ self.prototypes.T
+            
+            results = [None] * len(tokenized)
+            ambiguous = []
+            if len(self.categories) > 1:
+                top_two = np.sort(similarities, axis=1)[:, -2:]
+                margins = top_two[:, 1] - top_two[:, 0]
+            else:
+                margins = np.full(len(tokenized), np.inf)
+            for i, best in enumerate(similarities.argmax(axis=1)):
+                if margins[i] < config.CATEGORIZER_EMBEDDING_MARGIN:
+                    ambiguous.append(i)
+                else:
+                    results[i] = self.categories[best]
+        
+        if ambiguous:
+            logger.debug(f"Embedding categorizer: {len(ambiguous)}/{len(tokenized)} posts fell back to NLI")
+            self._load_nli()
+            fallback = self._nli_categorize(tokenized.subset(ambiguous), batch_size)
+            for i, category in zip(ambiguous, fallback):
+                results[i] = category
+        
+        return results
+    
+    def _nli_categorize(self, tokenized, batch_size):
+        """
+        Categorize combined title/content strings with the NLI model
+        
+        Args:
+            tokenized (TokenizedTexts): Combined title/content strings
+            batch_size (int): Premise/hypothesis pairs per forward pass
+            
+        Returns:
+            list: Predicted categories in the same order as the texts
+        """
+        with section("categorize.tokenize"):
+            premise_ids = [ids[:self.max_length] for ids in tokenized.ids_for(self.tokenizer)]
+        
+        all_labels = list(range(len(self.categories)))
+        top_k = config.CATEGORIZER_PRUNE_TOP_K
+        
+        if not top_k or top_k >= len(self.categories):
+            logits = self._entailment_logits(premise_ids, [all_labels] * len(premise_ids), batch_size)
+            return [self.categories[self._best_label(post_logits)] for post_logits in logits]
+        
+        # Stage 1: score every label against a short preview of each post
+        preview_tokens = config.CATEGORIZER_PREVIEW_TOKENS
+        preview_logits = self._entailment_logits(
+            premise_ids, [all_labels] * len(premise_ids), batch_size, max_premise_tokens=preview_tokens
         )
         
-        # Return the most likely category
-        return prediction['labels'][0]
\ No newline at end of file
+        results = [None] * len(premise_ids)
+        candidates = {}
+        for i, post_logits in enumerate(preview_logits):
+            best = self._best_label(post_logits)
+            # Posts that fit in the preview were scored on their full text already
+            if len(premise_ids[i]) <= preview_tokens:
+                results[i] = self.categories[best]
+                continue
+            
+            probabilities = self._label_probabilities(post_logits)
+            if probabilities[best] >= config.CATEGORIZER_EARLY_EXIT_CONFIDENCE:
+                results[i] = self.categories[best]
+                continue
+            
+            candidates[i] = sorted(probabilities, key=probabilities.get, reverse=True)[:top_k]
+        
+        # Stage 2: re-score only the most likely labels on the full text
+        if candidates:
+            indices = list(candidates)
+            full_logits = self._entailment_logits(
+                [premise_ids[i] for i in indices], [candidates[i] for i in indices], batch_size
+            )
+            for i, post_logits in zip(indices, full_logits):
+                results[i] = self.categories[self._best_label(post_logits)]
+        
+        return results
+    
+    def _entailment_logits(self, premise_ids, label_sets, batch_size, max_premise_tokens=None):
+        """
+        Run premise/hypothesis pairs through the NLI model in length-bucketed batches
+        
+        Args:
+            premise_ids (list): Token ids of each post (without special tokens)
+            label_sets (list): Category indices to score for each post
+            batch_size (int): Pairs per forward pass
+            max_premise_tokens (int, optional): Truncate premises to this many tokens
+            
+        Returns:
+            list: For each post, a dict mapping category index to entailment logit
+        """
+        pairs = []
+        with section("categorize.tokenize"):
+            for post_index, (premise, labels) in enumerate(zip(premise_ids, label_sets)):
+                if max_premise_tokens is not None:
+                    premise = premise[:max_premise_tokens]
+                for label in labels:
+                    hypothesis = self.hypothesis_ids[label]
+                    # Truncate the premise only, so the hypothesis is always complete
+                    room = self.max_length - len(hypothesis) - self.special_tokens.pair_count
+                    input_ids = self.special_tokens.pair(premise[:room], hypothesis)
+                    pairs.append((post_index, label, input_ids))
+        
+        # Bucket by length so pairs are padded only to their neighbours
+        pairs.sort(key=lambda pair: len(pair[2]))
+        
+        logits = [{} for _ in premise_ids]
+        for start in range(0, len(pairs), batch_size):
+            chunk = pairs[start:start + batch_size]
+            with section("categorize.tokenize"):
+                batch = self.tokenizer.pad(
+                    {
+                        'input_ids': [input_ids for _, _, input_ids in chunk],
+                        'attention_mask': [[1] * len(input_ids) for _, _, input_ids in chunk]
+                    },
+                    return_tensors="pt"
+                ).to(self.model.device)
+            
+            with section("categorize.forward"), torch.no_grad():
+                entailment = self.model(**batch).logits[:, self.entailment_id]
+            
+            with section("categorize.postprocess"):
+                for (post_index, label, _), value in zip(chunk, entailment.tolist()):
+                    logits[post_index][label] = value
+        
+        return logits
+    
+    def _label_probabilities(self, post_logits):
+        """Softmax entailment logits over the scored labels (single-label zero-shot)"""
+        values = torch.tensor(list(post_logits.values())).softmax(dim=-1).tolist()
+        return dict(zip(post_logits.keys(), values))
+    
+    def _best_label(self, post_logits):
+        """Get the category index with the highest entailment logit"""
+        return max(post_logits, key=post_logits.get)
@@ -47,17 +47,177 @@ CHECK_INTERVAL = 10
 INITIAL_POSTS_COUNT = 10
 
 # Model configurations
+# "backend" is "torch", "onnx" (ONNX Runtime) or "onnx-int8" (dynamically quantized ONNX).
+# The ONNX backends need the optional onnxruntime and onnx packages (see requirements.txt)
 ZERO_SHOT_MODEL = {
     "name": "facebook/bart-large-mnli",
-    "revision": "d7645e1"
+    "revision": "d7645e1",
+    "backend": os.getenv("ZERO_SHOT_BACKEND", "torch")
 }
 
 SENTIMENT_MODEL = {
     "name": "distilbert-base-uncased-finetuned-sst-2-english",
-    "revision": "af0f99b"
+    "revision": "af0f99b",
+    "backend": os.getenv("SENTIMENT_BACKEND", "torch")
 }
 
+# Exported ONNX graphs, created on first use of an ONNX backend
+ONNX_MODELS_DIR = os.getenv("ONNX_MODELS_DIR", "data/onnx")
+ONNX_OPSET = 14
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 lets ONNX Runtime decide
+
 IMAGE_MODEL = {
     "name": "google/vit-base-patch16-224",
     "revision": "5dca96d"
-}
\ No newline at end of file
+}
+
+# Models loaded ahead of first use: in the background once the dashboard has rendered, and before
+# the worker's first cycle (comma-separated, empty to disable). "sentiment" is skipped in shared
+# TEXT_ANALYSIS_MODE, which never uses it
+WARM_UP_MODELS = [name.strip() for name in os.getenv("WARM_UP_MODELS", "categorizer,sentiment,image").split(",") if name.strip()]
+
+# Batched inference settings
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "16"))
+SENTIMENT_MAX_LENGTH = 512  # Longer posts are truncated to the model's maximum input length
+
+# Zero-shot categorization settings
+CATEGORY_HYPOTHESIS_TEMPLATE = "This example is {}."  # Same template as the transformers zero-shot pipeline
+CATEGORIZER_BATCH_SIZE = int(os.getenv("CATEGORIZER_BATCH_SIZE", "48"))  # Post/label pairs per forward pass
+CATEGORIZER_MAX_LENGTH = 1024
+# Label pruning: score long posts on a short preview first, then re-score only the
+# top-k labels on the full text (0 disables pruning and scores every label in full)
+CATEGORIZER_PRUNE_TOP_K = int(os.getenv("CATEGORIZER_PRUNE_TOP_K", "0"))
+CATEGORIZER_PREVIEW_TOKENS = 64
+CATEGORIZER_EARLY_EXIT_CONFIDENCE = 0.9  # Accept the preview result outright above this probability
+
+# Categorizer mode: "nli" runs zero-shot NLI for every post; "embedding" compares one
+# sentence embedding per post with category prototypes and only falls back to NLI
+# when the best two categories are within CATEGORIZER_EMBEDDING_MARGIN of each other
+CATEGORIZER_MODE = os.getenv("CATEGORIZER_MODE", "nli").lower()
+CATEGORIZER_EMBEDDING_MARGIN = float(os.getenv("CATEGORIZER_EMBEDDING_MARGIN", "0.05"))  # Cosine similarity
+EMBEDDING_MODEL = {
+    "name": "sentence-transformers/all-MiniLM-L6-v2",
+    "revision": "c9745ed"
+}
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_MAX_LENGTH = 256
+# Example phrases embedded (with the hypothesis template) into each category's prototype
+CATEGORY_DESCRIPTIONS = {
+    "Events": ["an upcoming event, festival, concert or meetup", "things to do this weekend"],
+    "News": ["local news and announcements", "a news article about the city"],
+    "Question": ["a question asking for advice or recommendations", "does anyone know where to find this?"],
+    "Photo": ["a photo or picture of the city", "a view of the skyline I took today"],
+    "Food": ["restaurants, food and drinks", "where to get the best pizza, coffee or seafood"],
+    "Housing": ["apartments, rent, landlords and real estate", "looking for a place to live"],
+    "Transportation": ["public transit, trains, buses, traffic and parking", "delays on the subway line"],
+    "Crime": ["crime, police, theft or violence", "someone broke into my car"],
+    "Politics": ["local politics, elections and government", "the mayor and city council"],
+    "Weather": ["weather, snow, storms and temperature", "the forecast for this week"],
+    "Sports": ["sports teams, games and athletes", "the game last night"],
+    "Other": ["a general discussion post", "something random"]
+}
+
+# Text analysis: "separate" runs the sentiment model and the categorizer on their own
+# encoders, tokenizing each post once per distinct vocabulary; "shared" encodes each
+# post once with the embedding categorizer's sentence encoder and feeds both the
+# category prototypes and a linear sentiment head (needs CATEGORIZER_MODE=embedding)
+TEXT_ANALYSIS_MODE = os.getenv("TEXT_ANALYSIS_MODE", "separate").lower()
+# Fitted with "python text_analysis.py --fit-sentiment-head"; until then the head
+# compares embeddings with prototypes of the SENTIMENT_DESCRIPTIONS phrases
+SENTIMENT_HEAD_PATH = os.getenv("SENTIMENT_HEAD_PATH", "data/sentiment_head.npz")
+SENTIMENT_DESCRIPTIONS = {
+    "NEGATIVE": ["this is terrible, I am angry and upset", "a bad, frustrating, awful experience"],
+    "POSITIVE": ["this is great, I am happy and excited", "a good, wonderful, lovely experience"]
+}
+SENTIMENT_PROTOTYPE_TEMPERATURE = 0.05  # Softmax temperature over cosine similarities
+
+# Shared inference server (python inference_server.py): one process owns the text and
+# image models and coalesces concurrent requests from the dashboard and workers into
+# micro-batches. Clients use it instead of loading models when INFERENCE_SERVER_URL is set
+INFERENCE_SERVER_URL = os.getenv("INFERENCE_SERVER_URL")  # e.g. http://127.0.0.1:8502
+INFERENCE_SERVER_HOST = os.getenv("INFERENCE_SERVER_HOST", "127.0.0.1")
+INFERENCE_SERVER_PORT = int(os.getenv("INFERENCE_SERVER_PORT", "8502"))
+INFERENCE_SERVER_MAX_BATCH = int(os.getenv("INFERENCE_SERVER_MAX_BATCH", "64"))  # Posts or images per micro-batch
+INFERENCE_SERVER_MAX_WAIT = float(os.getenv("INFERENCE_SERVER_MAX_WAIT", "0.02"))  # Seconds a batch waits to fill
+# Intra-op threads for the models (0: half the CPUs, so text and image batches can run side by side)
+INFERENCE_SERVER_THREADS = int(os.getenv("INFERENCE_SERVER_THREADS", "0"))
+INFERENCE_SERVER_TIMEOUT = 300  # Seconds a client waits for a response
+
+# Inference result cache (memory LRU + SQLite on disk), keyed by model + revision + text
+INFERENCE_CACHE_ENABLED = os.getenv("INFERENCE_CACHE_ENABLED", "true").lower() == "true"
+INFERENCE_CACHE_PATH = os.getenv("INFERENCE_CACHE_PATH", "data/inference_cache.sqlite3")
+INFERENCE_CACHE_SIZE = 10000  # Entries kept in memory per model
+INFERENCE_CACHE_DISK_MAX_ENTRIES = 200000
+INFERENCE_CACHE_PRUNE_INTERVAL = 1000  # Writes between disk pruning passes
+
+# Metrics: Prometheus text written to METRICS_FILE after every fetch cycle (read by the
+# dashboard's System panel in worker mode) and served on METRICS_PORT if set
+METRICS_FILE = os.getenv("METRICS_FILE", "data/metrics.prom")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 disables the /metrics endpoint
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Profiling of the hot inference paths (sentiment, categorization, embedding, image
+# classification), one profile per fetch cycle in PROFILING_DIR. "sections" only times
+# the tokenize/forward/postprocess phases, "sampling" adds stack samples and is cheap
+# enough for production; "cprofile" and "torch" (torch.profiler) add real overhead
+PROFILING_MODE = os.getenv("PROFILING_MODE", "off").lower()  # off, sections, sampling, cprofile or torch
+PROFILING_DIR = os.getenv("PROFILING_DIR", "logs/profiles")
+PROFILING_SAMPLE_INTERVAL = float(os.getenv("PROFILING_SAMPLE_INTERVAL", "0.005"))  # Seconds between stack samples
+PROFILING_TOP_N = 20  # Hotspots listed in each summary
+PROFILING_KEEP = 100  # Newest cycle profiles kept
+
+# Post storage
+POSTS_DB_PATH = os.getenv("POSTS_DB_PATH", "data/posts.sqlite3")
+LEGACY_POSTS_FILE = "data/posts_data.pickle"  # Imported into the database on first start
+POSTS_RETENTION_DAYS = float(os.getenv("POSTS_RETENTION_DAYS", "30"))  # 0 keeps posts forever
+DASHBOARD_PAGE_SIZE = 50  # Posts per page of the dashboard table
+DASHBOARD_CARDS_PER_PAGE = 10  # Detail cards rendered for each page
+DASHBOARD_CACHE_ENTRIES = 64  # Cached dashboard query results kept per function
+
+# Image download pool and batched classification
+IMAGE_DOWNLOAD_WORKERS = int(os.getenv("IMAGE_DOWNLOAD_WORKERS", "8"))  # Concurrent downloads
+IMAGE_DOWNLOAD_PER_HOST = 4  # Concurrent downloads per host
+IMAGE_DOWNLOAD_TIMEOUT = 10  # Seconds
+IMAGE_BATCH_SIZE = int(os.getenv("IMAGE_BATCH_SIZE", "16"))  # Images per ViT forward pass
+
+# Image result cache, keyed by normalized URL and then by perceptual hash
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "true").lower() == "true"
+IMAGE_CACHE_PATH = os.getenv("IMAGE_CACHE_PATH", "data/image_cache.sqlite3")
+IMAGE_CACHE_SIZE = 5000  # Images kept in memory and on disk
+IMAGE_CACHE_MAX_DISTANCE = 4  # Max differing bits (of 64) for two images to count as the same
+
+# Staged ingestion pipeline: worker threads and batch size per stage
+PIPELINE_STAGES = {
+    "image_download": {"workers": 4, "batch_size": 4},
+    "image_classify": {"workers": 1, "batch_size": 16},
+    "text_analysis": {"workers": 1, "batch_size": 16},  # Categorization and sentiment
+    "store": {"workers": 1, "batch_size": 32},
+    "burst_check": {"workers": 1, "batch_size": 32}
+}
+PIPELINE_QUEUE_SIZE = 64  # Items buffered between stages before the previous stage blocks
+PIPELINE_BATCH_WAIT = 0.05  # Seconds a worker waits for a batch to fill
+
+# Run ingestion in a separate worker process (python worker.py); the dashboard then only reads the store
+INGESTION_MODE = os.getenv("INGESTION_MODE", "inline").lower()  # "inline" or "worker"
+UI_READ_ONLY = INGESTION_MODE == "worker"
+UI_REFRESH_SECONDS = 30  # How often an auto-refreshing dashboard reruns its posts section
+
+# Incremental Reddit fetching (pagination only applies to listings sorted by new, e.g. /r/boston/new.json)
+REDDIT_POLL_PAGE_SIZE = 25  # Posts in the first page of each poll
+REDDIT_PAGE_SIZE = 100  # Posts per page when more pages are needed (Reddit's maximum)
+REDDIT_MAX_PAGES = 10  # Most pages read per poll or backfill
+# Decode listing pages post by post as they download instead of parsing the whole body
+REDDIT_STREAMING_PARSE = os.getenv("REDDIT_STREAMING_PARSE", "true").lower() == "true"
+REDDIT_STREAM_CHUNK_SIZE = 64 * 1024  # Bytes read from the response at a time
+
+# Subreddits to watch (comma-separated listing URLs); defaults to REDDIT_JSON_URL
+REDDIT_SOURCES = [url.strip() for url in os.getenv("REDDIT_SOURCES", "").split(",") if url.strip()] or [REDDIT_JSON_URL]
+DEFAULT_SOURCE_NAME = "r/boston"  # Source name for sample data
+FETCH_WORKERS = 8  # Sources polled concurrently
+REDDIT_REQUESTS_PER_MINUTE = float(os.getenv("REDDIT_REQUESTS_PER_MINUTE", "10"))  # Shared by all sources
+REDDIT_REQUEST_BURST = 5
+# Adaptive poll intervals (seconds): busy sources are polled more often, quiet ones less
+TARGET_POSTS_PER_POLL = 10
+MIN_POLL_INTERVAL = 60
+MAX_POLL_INTERVAL = 3600
+WORKER_TICK_SECONDS = 30  # Longest the worker sleeps before checking for sources that are due
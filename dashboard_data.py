@@ -0,0 +1,114 @@
+import time
+import streamlit as st
+import config
+from post_store import get_post_store
+from post_index import get_post_index
+from burst_detector import get_burst_detector
+
+# Cached results are keyed on the store version, so they are reused across
+# reruns and sessions until posts are saved or deleted. Widget changes that
+# don't touch the data (slider moves, toggles) never recompute them.
+
+
+@st.cache_resource
+def post_index():
+    """Get the process-wide post index, shared by every session"""
+    return get_post_index()
+
+
+def store_version():
+    """
+    Get the current store version, bringing the post index up to date with it
+
+    Returns:
+        int: Version to pass to the cached queries
+    """
+    # Use the version the index read, not a fresh one: a worker commit made
+    # during the refresh would otherwise cache old results under its version
+    return post_index().refresh()
+
+
+@st.cache_data(max_entries=config.DASHBOARD_CACHE_ENTRIES, show_spinner=False)
+def posts_page(version, categories=None, sentiment=None, sources=None, page=0, page_size=None):
+    """
+    Get one page of posts matching the dashboard filters, newest published first
+
+    Args:
+        version (int): Store version from store_version(), part of the cache key
+        categories (tuple, optional): Only posts in these categories
+        sentiment (str, optional): "Positive", "Negative" or "Neutral"
+        sources (tuple, optional): Only posts from these sources
+        page (int): Zero-based page number
+        page_size (int, optional): Posts per page, defaults to config.DASHBOARD_PAGE_SIZE
+
+    Returns:
+        pandas.DataFrame: The page's indexed fields
+    """
+    page_size = page_size or config.DASHBOARD_PAGE_SIZE
+    index = post_index()
+    rows = index.select(
+        categories=list(categories) if categories else None,
+        sentiment=sentiment,
+        sources=list(sources) if sources else None,
+        limit=page_size,
+        offset=page * page_size
+    )
+    return index.frame(rows)
+
+
+@st.cache_data(max_entries=config.DASHBOARD_CACHE_ENTRIES, show_spinner=False)
+def post_count(version, categories=None, sentiment=None, sources=None):
+    """
+    Count posts matching the dashboard filters
+
+    Args:
+        version (int): Store version from store_version(), part of the cache key
+        categories, sentiment, sources: Filters as for posts_page()
+
+    Returns:
+        int: Number of matching posts
+    """
+    return post_index().count(
+        categories=list(categories) if categories else None,
+        sentiment=sentiment,
+        sources=list(sources) if sources else None
+    )
+
+
+@st.cache_data(max_entries=config.DASHBOARD_CACHE_ENTRIES, show_spinner=False)
+def posts_by_id(version, post_ids):
+    """
+    Load full posts for the detail cards of one page
+
+    Args:
+        version (int): Store version from store_version(), part of the cache key
+        post_ids (tuple): Ids of the posts to load
+
+    Returns:
+        list: Post records, in the order of post_ids
+    """
+    store = get_post_store()
+    posts = [store.get(post_id) for post_id in post_ids]
+    return [post for post in posts if post is not None]
+
+
+@st.cache_data(max_entries=config.DASHBOARD_CACHE_ENTRIES, show_spinner=False)
+def _active_bursts(version, minute):
+    """Bursts for a store version; the minute is in the key because windows expire over time"""
+    detector = get_burst_detector()
+    # Posts saved by a separate worker process only reach this process through the store
+    detector.add(get_post_store().query(since=time.time() - detector.window_seconds, negative_only=True))
+    return detector.active_bursts()
+
+
+def active_bursts(version):
+    """
+    Get the categories currently in a burst, recomputed at most once a minute per store version
+
+    Args:
+        version (int): Store version from store_version()
+
+    Returns:
+        list: List of (category, posts) tuples
+    """
+    return _active_bursts(version, int(time.time() // 60))
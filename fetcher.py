@@ -0,0 +1,182 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import config
+from rss_parser import RedditRSSParser
+from metrics import count, ERRORS_TOTAL
+
+logger = logging.getLogger("sentiment_agent")
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every source, which also obeys Reddit's rate-limit headers
+
+    Tokens refill continuously at requests_per_minute. When a response says the
+    quota is used up (X-Ratelimit-Remaining) or asks us to wait (Retry-After on
+    429), every caller pauses until the reset time.
+    """
+
+    def __init__(self, requests_per_minute=None, burst=None):
+        """
+        Args:
+            requests_per_minute (float, optional): Refill rate, defaults to config.REDDIT_REQUESTS_PER_MINUTE
+            burst (int, optional): Bucket capacity, defaults to config.REDDIT_REQUEST_BURST
+        """
+        self.rate = (requests_per_minute or config.REDDIT_REQUESTS_PER_MINUTE) / 60.0
+        self.capacity = burst or config.REDDIT_REQUEST_BURST
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent, then take a token"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def observe(self, status_code, headers):
+        """
+        Pause according to a response's rate-limit headers
+
+        Args:
+            status_code (int): HTTP status of the response
+            headers (Mapping): Response headers
+        """
+        remaining = _float_header(headers, 'X-Ratelimit-Remaining')
+        reset = _float_header(headers, 'X-Ratelimit-Reset')
+        retry_after = _float_header(headers, 'Retry-After')
+
+        pause = None
+        if status_code == 429:
+            pause = retry_after or reset or 60
+        elif remaining is not None and remaining < 1 and reset is not None:
+            pause = reset
+
+        if pause:
+            logger.warning(f"Reddit rate limit reached, pausing requests for {pause:.0f}s")
+            with self._lock:
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+
+def _float_header(headers, name):
+    """Parse a numeric header, or None if it is missing or not a number"""
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Source:
+    """Polling state of one listing"""
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.interval = config.CHECK_INTERVAL * 60
+        self.next_poll = 0.0
+        self.velocity = None  # Smoothed new posts per second
+
+
+class MultiSourceFetcher:
+    """
+    Polls many subreddit listings concurrently under one shared rate limit
+
+    Each source's poll interval adapts to how fast it gets new posts, aiming
+    for about config.TARGET_POSTS_PER_POLL new posts per poll, between
+    config.MIN_POLL_INTERVAL and config.MAX_POLL_INTERVAL seconds.
+    """
+
+    def __init__(self, urls=None, max_workers=None):
+        """
+        Args:
+            urls (list, optional): Listing URLs, defaults to config.REDDIT_SOURCES
+            max_workers (int, optional): Concurrent polls, defaults to config.FETCH_WORKERS
+        """
+        urls = urls if urls is not None else config.REDDIT_SOURCES
+        self.rate_limiter = RateLimiter()
+        self.sources = [_Source(RedditRSSParser(url, rate_limiter=self.rate_limiter)) for url in urls or [None]]
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.FETCH_WORKERS, thread_name_prefix="fetch"
+        )
+        self._lock = threading.Lock()
+
+    @property
+    def source_names(self):
+        """Display names of every source"""
+        return [source.parser.source for source in self.sources]
+
+    def fetch_due(self, seen_ids=None):
+        """
+        Poll every source whose interval has elapsed
+
+        Args:
+            seen_ids (set, optional): Already processed post IDs (a PostStore works too)
+
+        Returns:
+            list: New posts from all polled sources, each tagged with its 'source'
+        """
+        now = time.time()
+        with self._lock:
+            due = [source for source in self.sources if source.next_poll <= now]
+        return self._poll(due, seen_ids)
+
+    def fetch_all(self, seen_ids=None):
+        """Poll every source now, regardless of its schedule"""
+        return self._poll(list(self.sources), seen_ids)
+
+    def seconds_until_next_poll(self):
+        """Seconds until the next source is due (0 if one is due now)"""
+        with self._lock:
+            return max(min(source.next_poll for source in self.sources) - time.time(), 0)
+
+    def _poll(self, sources, seen_ids):
+        """Poll sources concurrently and reschedule each one"""
+        futures = [(source, self._executor.submit(self._fetch_source, source, seen_ids)) for source in sources]
+        posts = []
+        for source, future in futures:
+            try:
+                new_posts = future.result()
+            except Exception as e:
+                logger.error(f"Error fetching from {source.parser.source}: {str(e)}")
+                count(ERRORS_TOTAL, component="fetch")
+                new_posts = []
+            self._reschedule(source, len(new_posts))
+            posts.extend(new_posts)
+        return posts
+
+    def _fetch_source(self, source, seen_ids):
+        """Poll one source, then backfill any posts the poll left behind at the page limit"""
+        parser = source.parser
+        posts = parser.get_new_posts(seen_ids)
+        if parser.needs_backfill:
+            fetched_ids = {post.id for post in posts}
+            posts.extend(post for post in parser.backfill(seen_ids) if post.id not in fetched_ids)
+        return posts
+
+    def _reschedule(self, source, new_count):
+        """Adapt a source's poll interval to its recent post velocity"""
+        with self._lock:
+            velocity = new_count / source.interval
+            if source.velocity is None:
+                source.velocity = velocity
+            else:
+                source.velocity = 0.5 * source.velocity + 0.5 * velocity
+
+            if source.velocity > 0:
+                interval = config.TARGET_POSTS_PER_POLL / source.velocity
+            else:
+                # Nothing new lately: back off gradually
+                interval = source.interval * 2
+            source.interval = min(max(interval, config.MIN_POLL_INTERVAL), config.MAX_POLL_INTERVAL)
+            source.next_poll = time.time() + source.interval
+            logger.info(f"Next poll of {source.parser.source} in {source.interval / 60:.1f} minutes "
+                        f"({new_count} new posts)")
@@ -1,16 +1,17 @@
-import requests
-from io import BytesIO
-from PIL import Image
-from transformers import ViTImageProcessor, ViTForImageClassification
-import torch
 import logging
 import config
 import numpy as np
+from image_downloader import ImageDownloader
+from image_cache import create_image_cache
+from metrics import count, IMAGES_TOTAL, ERRORS_TOTAL
+from profiling import profiled, section
 
 logger = logging.getLogger("sentiment_agent")
 
 class ImageAnalyzer:
     def __init__(self):
+        from transformers import ViTImageProcessor, ViTForImageClassification
+        
         logger.info("Initializing Image Analyzer")
         
         # Initialize Vision Transformer for image classification
@@ -21,6 +22,12 @@ class ImageAnalyzer:
         self.processor = ViTImageProcessor.from_pretrained(model_name, revision=model_revision)
         self.model = ViTForImageClassification.from_pretrained(model_name, revision=model_revision)
         logger.info("Image classification model loaded successfully")
+        
+        # Pooled, concurrent downloader shared by every analysis
+        self.downloader = ImageDownloader()
+        
+        # Results for images seen before, by URL and by perceptual hash
+        self.cache = create_image_cache()
             
         # Initialize image captioning model
         # This could be modified to use a larger model like BLIP or CoCa depending on needs
@@ -35,36 +42,116 @@ class ImageAnalyzer:
         Returns:
             PIL.Image: Downloaded image
         """
-        # Set proper headers to avoid 403 Forbidden errors from Reddit
-        headers = {
-            'User-Agent': config.USER_AGENT,
-            'Referer': 'https://www.reddit.com/',
-            'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8'
-        }
+        return self.downloader.download(url)
+    
+    def analyze_posts_images(self, posts):
+        """
+        Analyze the images of many posts together
         
-        try:
-            # First try with headers
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            return Image.open(BytesIO(response.content))
-        except requests.HTTPError as e:
-            if e.response.status_code == 403:
-                # Try using the Reddit URL with "amp;" stripped out (common Reddit URL issue)
-                cleaned_url = url.replace("&amp;", "&")
-                if cleaned_url != url:
-                    logger.info(f"Retrying with cleaned URL: {cleaned_url}")
-                    try:
-                        response = requests.get(cleaned_url, headers=headers, timeout=10)
-                        response.raise_for_status()
-                        return Image.open(BytesIO(response.content))
-                    except Exception as e2:
-                        logger.error(f"Error downloading image with cleaned URL {cleaned_url}: {str(e2)}")
-                        return None
-            logger.error(f"HTTP error downloading image {url}: {str(e)}")
-            return None
-        except Exception as e:
-            logger.error(f"Error downloading image {url}: {str(e)}")
-            return None
+        Images are looked up in the result cache by URL first. The rest are
+        downloaded in parallel, near-duplicates of cached images are matched by
+        perceptual hash, and only the remaining ones are classified in batched
+        forward passes. Results are then mapped back to their posts.
+        
+        Args:
+            posts (list): Post records
+            
+        Returns:
+            list: For each post, the analysis returned by analyze_images()
+        """
+        url_lists = [post.image_urls for post in posts]
+        results_by_url, pending = self.fetch_images([url for urls in url_lists for url in urls])
+        return self.analyze_fetched(url_lists, results_by_url, pending)
+    
+    def fetch_images(self, image_urls):
+        """
+        Resolve cached results and download every other image (network-bound step)
+        
+        Args:
+            image_urls (list): Image URLs, possibly from many posts
+            
+        Returns:
+            tuple: (results_by_url, pending) where results_by_url maps URLs to cached
+                results and pending maps URLs to (PIL.Image or None, perceptual hash or None)
+                for images that still need classifying
+        """
+        all_urls = list(dict.fromkeys(url for url in image_urls if is_valid_image_url(url)))
+        
+        # Images already analyzed under the same URL need no download at all
+        results_by_url = {}
+        to_download = []
+        for url in all_urls:
+            cached = self.cache.lookup_url(url) if self.cache else None
+            if cached is not None:
+                results_by_url[url] = cached
+            else:
+                to_download.append(url)
+        
+        pending = {}
+        if not to_download:
+            return results_by_url, pending
+        
+        logger.info(f"Downloading {len(to_download)} images ({len(results_by_url)} cached)")
+        downloaded = self.downloader.download_many(to_download)
+        failed = sum(1 for image in downloaded.values() if image is None)
+        count(IMAGES_TOTAL, len(downloaded) - failed, event="downloaded")
+        count(IMAGES_TOTAL, failed, event="failed")
+        
+        # Near-duplicates of images seen before reuse their result instead of being classified
+        for url, image in downloaded.items():
+            if image is None or self.cache is None:
+                pending[url] = (image, None)
+                continue
+            try:
+                cached, phash = self.cache.lookup_image(image)
+            except Exception as e:
+                logger.error(f"Error hashing image {url}: {str(e)}")
+                cached, phash = None, None
+            if cached is not None:
+                results_by_url[url] = cached
+                self.cache.put(url, phash, cached)
+            else:
+                pending[url] = (image, phash)
+        
+        return results_by_url, pending
+    
+    def analyze_fetched(self, url_lists, results_by_url, pending):
+        """
+        Classify pending images in batches and build each post's analysis (CPU-bound step)
+        
+        Args:
+            url_lists (list): Image URLs of each post
+            results_by_url (dict): Cached results from fetch_images()
+            pending (dict): Images awaiting classification from fetch_images()
+            
+        Returns:
+            list: For each URL list, the analysis returned by analyze_images()
+        """
+        results_by_url = self.classify_pending(results_by_url, pending)
+        return [summarize_image_results(urls, results_by_url) for urls in url_lists]
+    
+    def classify_pending(self, results_by_url, pending, classify=None):
+        """
+        Classify pending images in batches and cache their results
+        
+        Args:
+            results_by_url (dict): Cached results from fetch_images()
+            pending (dict): Images awaiting classification from fetch_images()
+            classify (callable, optional): Classifies a list of RGB images, defaults to
+                self.classify_images; the inference server passes its micro-batcher
+            
+        Returns:
+            dict: URL -> dict with 'content_tags' and 'caption' for every analyzed image
+        """
+        results_by_url = dict(results_by_url)
+        classified = self._classify_downloaded({url: image for url, (image, _) in pending.items()}, classify)
+        for url, tags in classified.items():
+            result = {'content_tags': tags, 'caption': self.simple_image_description(tags)}
+            results_by_url[url] = result
+            phash = pending[url][1]
+            if self.cache is not None and phash is not None:
+                self.cache.put(url, phash, result)
+        return results_by_url
     
     def analyze_images(self, image_urls):
         """
@@ -78,51 +165,43 @@ class ImageAnalyzer:
                 - content_tags: List of content tags from images
                 - captions: List of image captions
         """
-        if not image_urls:
-            return {
-                'content_tags': [],
-                'captions': []
-            }
-        
-        content_tags = []
-        captions = []
-        successful_analyses = 0
+        results_by_url, pending = self.fetch_images(image_urls)
+        return self.analyze_fetched([image_urls], results_by_url, pending)[0]
+    
+    def _classify_downloaded(self, downloaded, classify=None):
+        """
+        Classify every successfully downloaded image in batches
         
-        for url in image_urls:
+        Args:
+            downloaded (dict): URL -> PIL.Image (or None for failed downloads)
+            classify (callable, optional): Replaces self.classify_images
+            
+        Returns:
+            dict: URL -> list of content tags
+        """
+        urls = []
+        images = []
+        for url, image in downloaded.items():
+            if image is None:
+                continue
             try:
-                # Skip empty or invalid URLs
-                if not url or not isinstance(url, str) or len(url) < 5:
-                    logger.warning(f"Skipping invalid image URL: {url}")
-                    continue
-                
-                # Download image
-                logger.info(f"Downloading image from: {url}")
-                image = self.download_image(url)
-                if image is None:
-                    logger.warning(f"Could not download image from: {url}")
-                    continue
-                
-                # Classify image
-                tags = self.classify_image(image)
-                if tags:
-                    content_tags.extend(tags)
-                    logger.info(f"Image tags: {', '.join(tags[:5])}")
-                
-                # Generate caption for image
-                caption = self.simple_image_description(tags)
-                if caption:
-                    captions.append(caption)
-                    logger.info(f"Image caption: {caption}")
-                
-                successful_analyses += 1
-                
+                # Ensure the image is in RGB format (handle PNG with alpha channel, etc.)
+                images.append(image if image.mode == 'RGB' else image.convert('RGB'))
+                urls.append(url)
             except Exception as e:
                 logger.error(f"Error analyzing image {url}: {str(e)}")
         
-        return {
-            'content_tags': list(set(content_tags)),  # Remove duplicates
-            'captions': captions
-        }
+        if not images:
+            return {}
+        
+        try:
+            results = dict(zip(urls, (classify or self.classify_images)(images)))
+        except Exception as e:
+            logger.error(f"Error classifying {len(images)} images: {str(e)}")
+            count(ERRORS_TOTAL, component="image_classify")
+            return {}
+        count(IMAGES_TOTAL, len(results), event="classified")
+        return results
     
     def classify_image(self, image):
         """
@@ -137,23 +216,42 @@ class ImageAnalyzer:
         # Ensure the image is in RGB format (handle PNG with alpha channel, etc.)
         if image.mode != 'RGB':
             image = image.convert('RGB')
-            
-        # Resize to expected size for most vision models
-        image = image.resize((224, 224))
         
-        # Preprocess image with padding to ensure consistent tensor sizes
-        inputs = self.processor(images=image, return_tensors="pt")
+        return self.classify_images([image])[0]
+    
+    @profiled("image")
+    def classify_images(self, images, batch_size=None):
+        """
+        Classify many RGB images with batched forward passes
         
-        # Get model predictions
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            predictions = outputs.logits.softmax(dim=-1)
+        The processor resizes and normalizes each image itself, so images are
+        passed through at their original size.
         
-        # Get top 5 predictions
-        top_indices = predictions[0].topk(5).indices
+        Args:
+            images (list): RGB PIL images
+            batch_size (int, optional): Images per forward pass, defaults to config.IMAGE_BATCH_SIZE
+            
+        Returns:
+            list: Top 5 content tags for each image, in the same order
+        """
+        import torch
         
-        # Convert indices to labels
-        labels = [self.model.config.id2label[idx.item()] for idx in top_indices]
+        batch_size = batch_size or config.IMAGE_BATCH_SIZE
+        labels = []
+        
+        for start in range(0, len(images), batch_size):
+            # Preprocess the whole batch into one stacked tensor
+            with section("image.preprocess"):
+                inputs = self.processor(images=images[start:start + batch_size], return_tensors="pt")
+            
+            # Get model predictions
+            with section("image.forward"), torch.no_grad():
+                predictions = self.model(**inputs).logits.softmax(dim=-1)
+            
+            # Get top 5 predictions and convert indices to labels
+            with section("image.postprocess"):
+                for top_indices in predictions.topk(5, dim=-1).indices.tolist():
+                    labels.append([self.model.config.id2label[idx] for idx in top_indices])
         
         return labels
     
@@ -172,4 +270,49 @@ class ImageAnalyzer:
         
         # This is a simplistic approach - a dedicated image captioning model would be better
         return f"Image showing {', '.join(tags[:3])}"
+
+
+def is_valid_image_url(url):
+    """Check that an image URL is a plausible non-empty string"""
+    return bool(url) and isinstance(url, str) and len(url) >= 5
+
+
+def summarize_image_results(image_urls, results_by_url):
+    """
+    Build one post's image analysis from per-image results
+    
+    Args:
+        image_urls (list): The post's image URLs
+        results_by_url (dict): URL -> dict with 'content_tags' and 'caption'
+        
+    Returns:
+        dict: Analysis results in the format returned by ImageAnalyzer.analyze_images()
+    """
+    content_tags = []
+    captions = []
+    
+    for url in image_urls:
+        # Skip empty or invalid URLs
+        if not is_valid_image_url(url):
+            logger.warning(f"Skipping invalid image URL: {url}")
+            continue
+        
+        result = results_by_url.get(url)
+        if result is None:
+            logger.warning(f"Could not analyze image from: {url}")
+            continue
+        
+        tags = result['content_tags']
+        if tags:
+            content_tags.extend(tags)
+            logger.info(f"Image tags: {', '.join(tags[:5])}")
+        
+        caption = result['caption']
+        if caption:
+            captions.append(caption)
+            logger.info(f"Image caption: {caption}")
     
+    return {
+        'content_tags': list(set(content_tags)),  # Remove duplicates
+        'captions': captions
+    }
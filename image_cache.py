@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+import numpy as np
+from PIL import Image
+import config
+
+logger = logging.getLogger("sentiment_agent")
+
+# Reddit serves the same media id from both hosts, the preview with resize/signature params
+REDDIT_IMAGE_HOSTS = ("i.redd.it", "preview.redd.it")
+
+# Set bits in every byte value, for counting differing hash bits across many hashes at once
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def normalize_image_url(url):
+    """
+    Normalize an image URL so different spellings of one image share a key
+
+    Args:
+        url (str): Image URL
+
+    Returns:
+        str: URL with "&amp;" cleaned up, lowercase scheme/host and no fragment;
+            Reddit preview and source URLs of the same media map to one key
+    """
+    parts = urlsplit(url.strip().replace("&amp;", "&"))
+    host = parts.netloc.lower()
+    if host in REDDIT_IMAGE_HOSTS:
+        return f"redd.it{parts.path}"
+    return urlunsplit((parts.scheme.lower(), host, parts.path, parts.query, ""))
+
+
+def perceptual_hash(image, hash_size=8):
+    """
+    Compute a difference hash (dHash) of an image's pixels
+
+    Visually similar images (re-encoded, resized, lightly edited) get hashes
+    that differ in only a few bits.
+
+    Args:
+        image (PIL.Image): Decoded image
+        hash_size (int): Hash is hash_size * hash_size bits
+
+    Returns:
+        int: The perceptual hash
+    """
+    pixels = list(image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class ImageResultCache:
+    """
+    Cache of image analysis results keyed by normalized URL, then perceptual hash
+
+    A URL hit skips the download entirely; a hash hit skips classification
+    for a re-uploaded or re-encoded copy of an image seen before. Entries are
+    kept in a bounded LRU that is persisted to SQLite.
+
+    Hashes are also kept in a NumPy array, one slot per entry, so a
+    near-duplicate lookup compares against every entry in one vectorized
+    pass. Hits update the LRU order in memory; their SQLite last-used times
+    are written with the next put().
+    """
+
+    def __init__(self, model_key="", max_entries=None, db_path=None, max_distance=None):
+        """
+        Args:
+            model_key (str): Identifies the model that produced the results; entries
+                from other models are ignored
+            max_entries (int, optional): Entries kept, defaults to config.IMAGE_CACHE_SIZE
+            db_path (str, optional): SQLite file for persistence, None keeps the cache in memory only
+            max_distance (int, optional): Max differing hash bits for a near-duplicate,
+                defaults to config.IMAGE_CACHE_MAX_DISTANCE
+        """
+        self.model_key = model_key
+        self.max_entries = max_entries or config.IMAGE_CACHE_SIZE
+        self.max_distance = config.IMAGE_CACHE_MAX_DISTANCE if max_distance is None else max_distance
+        self._entries = OrderedDict()  # url key -> (perceptual hash, result)
+        # Perceptual hashes by slot; only slots of entries that may match are flagged active
+        self._hashes = np.zeros(self.max_entries, dtype=np.uint64)
+        self._active = np.zeros(self.max_entries, dtype=bool)
+        self._slot_keys = [None] * self.max_entries
+        self._slots = {}  # url key -> slot
+        self._touched = {}  # url key -> last hit time not yet written to SQLite
+        self._lock = threading.Lock()
+
+        self.url_hits = 0
+        self.hash_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS image_cache ("
+                    "model TEXT, url_key TEXT, phash TEXT, result TEXT, last_used REAL, "
+                    "PRIMARY KEY (model, url_key))"
+                )
+                self._db.commit()
+                self._load()
+            except sqlite3.Error as e:
+                logger.error(f"Error opening image cache {db_path}: {str(e)}")
+                self._db = None
+
+    def lookup_url(self, url):
+        """
+        Look up a result by URL
+
+        Args:
+            url (str): Image URL
+
+        Returns:
+            dict: Cached result, or None
+        """
+        key = normalize_image_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.url_hits += 1
+            self._touched[key] = time.time()
+            return entry[1]
+
+    def lookup_image(self, image):
+        """
+        Look up a result for a near-duplicate of a downloaded image
+
+        Args:
+            image (PIL.Image): Decoded image
+
+        Returns:
+            tuple: (cached result or None, perceptual hash of the image)
+        """
+        phash = perceptual_hash(image)
+        with self._lock:
+            best_key = None
+            if self._is_matchable(phash) and self._active.any():
+                distances = _POPCOUNT[
+                    (self._hashes ^ np.uint64(phash)).view(np.uint8)
+                ].reshape(-1, 8).sum(axis=1, dtype=np.int32)
+                distances[~self._active] = self.max_distance + 1
+                slot = int(np.argmin(distances))
+                if distances[slot] <= self.max_distance:
+                    best_key = self._slot_keys[slot]
+
+            if best_key is None:
+                self.misses += 1
+                return None, phash
+
+            self._entries.move_to_end(best_key)
+            self.hash_hits += 1
+            self._touched[best_key] = time.time()
+            return self._entries[best_key][1], phash
+
+    def put(self, url, phash, result):
+        """
+        Store the result for an image
+
+        Args:
+            url (str): Image URL
+            phash (int): Perceptual hash from lookup_image()
+            result (dict): JSON-serializable analysis result
+        """
+        key = normalize_image_url(url)
+        with self._lock:
+            evicted = []
+            if key not in self._entries:
+                while len(self._entries) >= self.max_entries:
+                    evicted.append(self._remove_oldest())
+            self._set_entry(key, phash, result)
+            self._touched.pop(key, None)
+
+            if self._db is not None:
+                # Hits since the last write are saved in the same transaction
+                touched = [(last_used, self.model_key, k) for k, last_used in self._touched.items()]
+                self._touched.clear()
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO image_cache (model, url_key, phash, result, last_used) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (self.model_key, key, format(phash, "x"), json.dumps(result), time.time())
+                    )
+                    self._db.executemany(
+                        "DELETE FROM image_cache WHERE model = ? AND url_key = ?",
+                        [(self.model_key, k) for k in evicted]
+                    )
+                    self._db.executemany(
+                        "UPDATE image_cache SET last_used = ? WHERE model = ? AND url_key = ?", touched
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing image cache: {str(e)}")
+
+    def stats(self):
+        """
+        Get hit/miss counters
+
+        Returns:
+            dict: URL hits, perceptual hash hits, misses and current size
+        """
+        with self._lock:
+            return {
+                'url_hits': self.url_hits,
+                'hash_hits': self.hash_hits,
+                'misses': self.misses,
+                'entries': len(self._entries)
+            }
+
+    def _load(self):
+        """Load the most recently used entries from SQLite and drop the rest"""
+        rows = self._db.execute(
+            "SELECT url_key, phash, result FROM image_cache WHERE model = ? ORDER BY last_used DESC LIMIT ?",
+            (self.model_key, self.max_entries)
+        ).fetchall()
+        self._db.execute(
+            "DELETE FROM image_cache WHERE model != ? OR url_key NOT IN ("
+            "SELECT url_key FROM image_cache WHERE model = ? ORDER BY last_used DESC LIMIT ?)",
+            (self.model_key, self.model_key, self.max_entries)
+        )
+        self._db.commit()
+        # Insert oldest first so the LRU order matches last use
+        for key, phash, result in reversed(rows):
+            self._set_entry(key, int(phash, 16), json.loads(result))
+        logger.info(f"Loaded {len(rows)} cached image results")
+
+    def _is_matchable(self, phash):
+        """
+        Check whether a hash carries enough detail for near-duplicate matching
+
+        Flat images (and smooth left-to-right gradients) hash to 0 or close to
+        it, so any two of them would look like duplicates.
+        """
+        return phash.bit_count() > self.max_distance
+
+    def _set_entry(self, key, phash, result):
+        """Add or replace an entry as the most recently used, keeping its hash slot in sync"""
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = len(self._slots)
+            self._slots[key] = slot
+            self._slot_keys[slot] = key
+        self._hashes[slot] = phash
+        self._active[slot] = self._is_matchable(phash)
+        self._entries[key] = (phash, result)
+        self._entries.move_to_end(key)
+
+    def _remove_oldest(self):
+        """Evict the least recently used entry, moving the last slot into its place"""
+        key, _ = self._entries.popitem(last=False)
+        self._touched.pop(key, None)
+        slot = self._slots.pop(key)
+        last = len(self._slots)
+        if slot != last:
+            moved = self._slot_keys[last]
+            self._slots[moved] = slot
+            self._slot_keys[slot] = moved
+            self._hashes[slot] = self._hashes[last]
+            self._active[slot] = self._active[last]
+        self._slot_keys[last] = None
+        self._active[last] = False
+        return key
+
+
+def create_image_cache():
+    """
+    Create the image result cache, if caching is enabled
+
+    Returns:
+        ImageResultCache: The cache, or None when config.IMAGE_CACHE_ENABLED is off
+    """
+    if not config.IMAGE_CACHE_ENABLED:
+        return None
+    return ImageResultCache(
+        model_key=f"{config.IMAGE_MODEL['name']}@{config.IMAGE_MODEL['revision']}",
+        db_path=config.IMAGE_CACHE_PATH
+    )
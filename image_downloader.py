@@ -0,0 +1,145 @@
+import logging
+import threading
+from io import BytesIO
+from collections import deque, defaultdict
+from urllib.parse import urlsplit
+from concurrent.futures import Future, ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+import config
+
+logger = logging.getLogger("sentiment_agent")
+
+
+class ImageDownloader:
+    """
+    Concurrent image downloader backed by a pooled, keep-alive requests.Session
+
+    Downloads run on a bounded thread pool, with an extra per-host limit so a
+    gallery hosted on one CDN doesn't take every worker. URLs wait in a queue
+    per host and are only handed to the pool while their host is under its
+    limit, so a busy host never holds up a worker that another host could use.
+    """
+
+    def __init__(self, max_workers=None, per_host_limit=None, timeout=None):
+        """
+        Args:
+            max_workers (int, optional): Concurrent downloads, defaults to config.IMAGE_DOWNLOAD_WORKERS
+            per_host_limit (int, optional): Concurrent downloads per host, defaults to config.IMAGE_DOWNLOAD_PER_HOST
+            timeout (float, optional): Request timeout in seconds, defaults to config.IMAGE_DOWNLOAD_TIMEOUT
+        """
+        self.max_workers = max_workers or config.IMAGE_DOWNLOAD_WORKERS
+        self.per_host_limit = per_host_limit or config.IMAGE_DOWNLOAD_PER_HOST
+        self.timeout = timeout or config.IMAGE_DOWNLOAD_TIMEOUT
+
+        # Set proper headers to avoid 403 Forbidden errors from Reddit
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': config.USER_AGENT,
+            'Referer': 'https://www.reddit.com/',
+            'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8'
+        })
+        # Keep enough pooled connections per host for every worker to reuse one
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="image-download")
+        self._waiting = defaultdict(deque)  # host -> (url, future) not yet handed to the pool
+        self._running = defaultdict(int)  # host -> downloads in the pool
+        self._hosts_lock = threading.Lock()
+
+    def download(self, url):
+        """
+        Download and decode a single image
+
+        Args:
+            url (str): Image URL
+
+        Returns:
+            PIL.Image: Downloaded image, or None if it couldn't be downloaded
+        """
+        return self._submit(url).result()
+
+    def download_many(self, urls):
+        """
+        Download many images in parallel
+
+        Args:
+            urls (list): Image URLs (duplicates are downloaded once)
+
+        Returns:
+            dict: URL -> PIL.Image, or None for images that couldn't be downloaded
+        """
+        unique_urls = list(dict.fromkeys(urls))
+        futures = {url: self._submit(url) for url in unique_urls}
+        return {url: future.result() for url, future in futures.items()}
+
+    def close(self):
+        """Stop the worker threads and close pooled connections"""
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def _submit(self, url):
+        """Queue a download behind its host's limit, returning a Future of the image"""
+        future = Future()
+        host = urlsplit(url).netloc
+        with self._hosts_lock:
+            self._waiting[host].append((url, future))
+        self._dispatch(host)
+        return future
+
+    def _dispatch(self, host):
+        """Hand a host's waiting downloads to the pool while it is under its limit"""
+        with self._hosts_lock:
+            waiting = self._waiting[host]
+            while waiting and self._running[host] < self.per_host_limit:
+                url, future = waiting.popleft()
+                self._running[host] += 1
+                self._executor.submit(self._run, host, url, future)
+            if not waiting:
+                del self._waiting[host]
+
+    def _run(self, host, url, future):
+        """Download on a pool thread, then let the host's next URL in"""
+        try:
+            future.set_result(self._download(url))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._hosts_lock:
+                self._running[host] -= 1
+                if not self._running[host]:
+                    del self._running[host]
+            self._dispatch(host)
+
+    def _download(self, url):
+        """Download and decode an image, logging failures and returning None for them"""
+        try:
+            return self._fetch(url)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 403:
+                # Try using the Reddit URL with "amp;" stripped out (common Reddit URL issue)
+                cleaned_url = url.replace("&amp;", "&")
+                if cleaned_url != url:
+                    logger.info(f"Retrying with cleaned URL: {cleaned_url}")
+                    try:
+                        return self._fetch(cleaned_url)
+                    except Exception as e2:
+                        logger.error(f"Error downloading image with cleaned URL {cleaned_url}: {str(e2)}")
+                        return None
+            logger.error(f"HTTP error downloading image {url}: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"Error downloading image {url}: {str(e)}")
+            return None
+
+    def _fetch(self, url):
+        """Fetch a URL and decode it as an image, raising on HTTP errors"""
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        image = Image.open(BytesIO(response.content))
+        # Decode now, on the download thread, instead of lazily on first use
+        image.load()
+        return image
@@ -0,0 +1,197 @@
+import os
+import inspect
+import logging
+import config
+
+logger = logging.getLogger("sentiment_agent")
+
+# "torch" runs the transformers model as-is; "onnx" runs an exported graph with
+# ONNX Runtime and "onnx-int8" a dynamically quantized copy of that graph
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+class OnnxSequenceClassifier:
+    """
+    ONNX Runtime session that stands in for a transformers sequence classification model
+
+    Takes the same tokenized torch inputs and returns an output with .logits
+    as a torch tensor, so the analyzers' batching code works unchanged.
+    """
+
+    def __init__(self, session, model_config):
+        """
+        Args:
+            session (onnxruntime.InferenceSession): Session over the exported graph
+            model_config (transformers.PretrainedConfig): Config of the original model (labels etc.)
+        """
+        import torch
+
+        self.session = session
+        self.config = model_config
+        self.device = torch.device("cpu")
+        self.input_names = [graph_input.name for graph_input in session.get_inputs()]
+
+    def eval(self):
+        return self
+
+    def __call__(self, **inputs):
+        import numpy as np
+        import torch
+        from transformers.modeling_outputs import SequenceClassifierOutput
+
+        # Only feed what the graph takes (e.g. no token_type_ids for DistilBERT)
+        feeds = {
+            name: inputs[name].cpu().numpy().astype(np.int64)
+            for name in self.input_names if name in inputs
+        }
+        logits = self.session.run(["logits"], feeds)[0]
+        return SequenceClassifierOutput(logits=torch.from_numpy(logits))
+
+
+def onnx_model_path(model_config, quantized=False):
+    """
+    Get where the exported graph of a model is kept
+
+    Args:
+        model_config (dict): Model configuration from config.py with 'name' and 'revision'
+        quantized (bool): Path of the int8 copy instead of the fp32 export
+
+    Returns:
+        str: Path of the .onnx file
+    """
+    directory = os.path.join(
+        config.ONNX_MODELS_DIR, f"{model_config['name'].replace('/', '--')}@{model_config['revision']}"
+    )
+    return os.path.join(directory, "model.int8.onnx" if quantized else "model.onnx")
+
+
+def export_onnx(model, tokenizer, path):
+    """
+    Export a transformers sequence classification model to ONNX
+
+    Args:
+        model (transformers.PreTrainedModel): Model in eval mode
+        tokenizer (transformers.PreTrainedTokenizer): Its tokenizer, used for example inputs
+        path (str): Where to write the graph
+    """
+    import torch
+
+    class LogitsOnly(torch.nn.Module):
+        # Encoder-decoder models (BART) also return caches and hidden states the exporter can't trace
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+    if hasattr(model.config, "use_cache"):
+        model.config.use_cache = False
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    example = tokenizer(["An example premise.", "Another one"], padding=True, return_tensors="pt")
+    input_names = ["input_ids", "attention_mask"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    # Newer torch versions default to the dynamo exporter; the TorchScript one handles these models
+    options = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            LogitsOnly(model),
+            (example["input_ids"], example["attention_mask"]),
+            path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=config.ONNX_OPSET,
+            **options
+        )
+    logger.info(f"Exported ONNX graph to {path}")
+
+
+def quantize_onnx(source_path, path):
+    """
+    Write a copy of an ONNX graph with int8 dynamic quantization of its weights
+
+    Args:
+        source_path (str): fp32 graph from export_onnx()
+        path (str): Where to write the quantized graph
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(source_path, path, weight_type=QuantType.QInt8)
+    logger.info(f"Quantized ONNX graph to {path}")
+
+
+def _onnx_session(path, threads=None):
+    """Open an ONNX Runtime session on the CPU with full graph optimizations"""
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    threads = threads or config.ONNX_THREADS
+    if threads:
+        options.intra_op_num_threads = threads
+    return onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+def _load_onnx(model_config, quantized, threads=None):
+    """Load a model's exported graph, exporting (and quantizing) it on first use"""
+    from transformers import AutoConfig, AutoTokenizer
+
+    name, revision = model_config["name"], model_config["revision"]
+    tokenizer = AutoTokenizer.from_pretrained(name, revision=revision)
+    fp32_path = onnx_model_path(model_config)
+    path = onnx_model_path(model_config, quantized=quantized)
+
+    if not os.path.exists(path):
+        if not os.path.exists(fp32_path):
+            # The PyTorch weights are only needed once, to export the graph
+            from transformers import AutoModelForSequenceClassification
+
+            model = AutoModelForSequenceClassification.from_pretrained(name, revision=revision)
+            model.eval()
+            export_onnx(model, tokenizer, fp32_path)
+            del model
+        if quantized:
+            quantize_onnx(fp32_path, path)
+
+    model = OnnxSequenceClassifier(_onnx_session(path, threads), AutoConfig.from_pretrained(name, revision=revision))
+    return tokenizer, model
+
+
+def load_text_classifier(model_config, task, threads=None):
+    """
+    Load a text classification model with the backend chosen in its config
+
+    Args:
+        model_config (dict): Model configuration from config.py; 'backend' is one of
+            BACKENDS and defaults to "torch"
+        task (str): transformers pipeline task for the PyTorch backend
+        threads (int, optional): Intra-op threads of ONNX Runtime sessions, defaults to
+            config.ONNX_THREADS (PyTorch uses the process-wide torch.set_num_threads())
+
+    Returns:
+        tuple: (tokenizer, model, backend actually used); ONNX backends fall back to
+            "torch" when onnxruntime isn't installed
+    """
+    backend = model_config.get("backend", "torch")
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown inference backend '{backend}' for {model_config['name']}, using torch")
+        backend = "torch"
+
+    if backend != "torch":
+        try:
+            tokenizer, model = _load_onnx(model_config, quantized=backend == "onnx-int8", threads=threads)
+            logger.info(f"Loaded {model_config['name']} with the {backend} backend")
+            return tokenizer, model, backend
+        except ImportError as e:
+            logger.warning(f"ONNX Runtime unavailable ({str(e)}), running {model_config['name']} with torch")
+            backend = "torch"
+
+    from transformers import pipeline
+
+    classifier = pipeline(task, model=model_config["name"], revision=model_config["revision"])
+    classifier.model.eval()
+    return classifier.tokenizer, classifier.model, backend
@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+import config
+
+logger = logging.getLogger("sentiment_agent")
+
+
+class InferenceCache:
+    """
+    Two-tier cache of model results keyed by a hash of model + revision + text
+
+    The memory tier is a bounded LRU; the disk tier is a SQLite table shared by
+    every model, so results survive restarts and crashes.
+    """
+
+    def __init__(self, model_name, revision, variant="", max_entries=None, db_path=None,
+                 max_disk_entries=None):
+        """
+        Args:
+            model_name (str): Model name, part of the cache key
+            revision (str): Model revision, part of the cache key
+            variant (str): Extra key component for settings that change results
+            max_entries (int, optional): Size of the memory tier
+            db_path (str, optional): SQLite file for the disk tier, None disables it
+            max_disk_entries (int, optional): Entries kept on disk before the oldest are pruned
+        """
+        self.key_prefix = f"{model_name}\0{revision}\0{variant}\0"
+        self.model_name = model_name
+        self.max_entries = max_entries or config.INFERENCE_CACHE_SIZE
+        self.max_disk_entries = max_disk_entries or config.INFERENCE_CACHE_DISK_MAX_ENTRIES
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_prune = 0
+
+        self.memory_hits = 0
+        self.memory_misses = 0
+        self.disk_hits = 0
+        self.disk_misses = 0
+
+        self._db = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS inference_cache ("
+                    "key TEXT PRIMARY KEY, model TEXT, value TEXT, created REAL)"
+                )
+                self._db.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_inference_cache_created "
+                    "ON inference_cache (created)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error opening inference cache {db_path}: {str(e)}")
+                self._db = None
+
+    @staticmethod
+    def normalize_text(text):
+        """Normalize unicode and whitespace so trivially different copies share a key"""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def key(self, text):
+        """
+        Build the cache key for a text
+
+        Args:
+            text (str): Model input text
+
+        Returns:
+            str: Hex SHA-256 digest of model name, revision, variant and normalized text
+        """
+        return hashlib.sha256((self.key_prefix + self.normalize_text(text)).encode("utf-8")).hexdigest()
+
+    def get_many(self, texts):
+        """
+        Look up cached results for several texts
+
+        Args:
+            texts (list): Model input texts
+
+        Returns:
+            list: Cached result for each text, or None where there is no entry
+        """
+        keys = [self.key(text) for text in texts]
+        results = [None] * len(keys)
+        missing = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    results[i] = self._memory[key]
+                    self.memory_hits += 1
+                else:
+                    self.memory_misses += 1
+                    missing.setdefault(key, []).append(i)
+
+            if missing and self._db is not None:
+                found = self._read_disk(list(missing))
+                for key, indices in missing.items():
+                    if key in found:
+                        self._remember(key, found[key])
+                        self.disk_hits += len(indices)
+                        for i in indices:
+                            results[i] = found[key]
+                    else:
+                        self.disk_misses += len(indices)
+
+        return results
+
+    def get(self, text):
+        """Look up the cached result for one text, or None"""
+        return self.get_many([text])[0]
+
+    def put_many(self, texts, values):
+        """
+        Store results for several texts in both tiers
+
+        Args:
+            texts (list): Model input texts
+            values (list): JSON-serializable results, one per text
+        """
+        rows = []
+        now = time.time()
+        with self._lock:
+            for text, value in zip(texts, values):
+                key = self.key(text)
+                self._remember(key, value)
+                rows.append((key, self.model_name, json.dumps(value), now))
+
+            if rows and self._db is not None:
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO inference_cache (key, model, value, created) "
+                        "VALUES (?, ?, ?, ?)",
+                        rows
+                    )
+                    self._puts_since_prune += len(rows)
+                    if self._puts_since_prune >= config.INFERENCE_CACHE_PRUNE_INTERVAL:
+                        self._prune_disk()
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing inference cache: {str(e)}")
+
+    def put(self, text, value):
+        """Store the result for one text"""
+        self.put_many([text], [value])
+
+    def stats(self):
+        """
+        Get hit/miss counters for both tiers
+
+        Returns:
+            dict: Counters plus the current number of entries in memory
+        """
+        with self._lock:
+            return {
+                'memory_hits': self.memory_hits,
+                'memory_misses': self.memory_misses,
+                'disk_hits': self.disk_hits,
+                'disk_misses': self.disk_misses,
+                'memory_entries': len(self._memory)
+            }
+
+    def _remember(self, key, value):
+        """Insert into the memory tier, evicting the least recently used entry"""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, keys):
+        """Fetch entries for keys from SQLite, in chunks to stay under the variable limit"""
+        found = {}
+        try:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key, value FROM inference_cache WHERE key IN ({placeholders})",
+                    chunk
+                )
+                for key, value in rows:
+                    found[key] = json.loads(value)
+        except sqlite3.Error as e:
+            logger.error(f"Error reading inference cache: {str(e)}")
+        return found
+
+    def _prune_disk(self):
+        """Drop the oldest disk entries beyond max_disk_entries"""
+        self._puts_since_prune = 0
+        self._db.execute(
+            "DELETE FROM inference_cache WHERE key IN ("
+            "SELECT key FROM inference_cache ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+
+def create_inference_cache(model_config, variant="", backend="torch"):
+    """
+    Create the result cache for a model, if caching is enabled
+
+    Args:
+        model_config (dict): Model configuration from config.py with 'name' and 'revision'
+        variant (str): Extra key component for settings that change results
+        backend (str): Inference backend in use; ONNX and quantized results are cached separately
+
+    Returns:
+        InferenceCache: The cache, or None when config.INFERENCE_CACHE_ENABLED is off
+    """
+    if not config.INFERENCE_CACHE_ENABLED:
+        return None
+    revision = model_config["revision"] if backend == "torch" else f"{model_config['revision']}+{backend}"
+    return InferenceCache(
+        model_config["name"],
+        revision,
+        variant=variant,
+        db_path=config.INFERENCE_CACHE_PATH
+    )
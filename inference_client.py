@@ -0,0 +1,126 @@
+import logging
+import threading
+import requests
+import config
+from models import Sentiment
+
+logger = logging.getLogger("sentiment_agent")
+
+
+class InferenceClient:
+    """
+    Client of the shared inference server (inference_server.py)
+
+    Has the methods the ingestion pipeline calls on a TextAnalysisEngine and
+    an ImageAnalyzer, so it can stand in for both without loading any model
+    in this process.
+    """
+
+    def __init__(self, url=None, timeout=None):
+        """
+        Args:
+            url (str, optional): Server URL, defaults to config.INFERENCE_SERVER_URL
+            timeout (float, optional): Seconds to wait for a response,
+                defaults to config.INFERENCE_SERVER_TIMEOUT
+        """
+        self.url = (url or config.INFERENCE_SERVER_URL).rstrip("/")
+        self.timeout = timeout or config.INFERENCE_SERVER_TIMEOUT
+        # Keep-alive connections, shared by every pipeline worker thread
+        self.session = requests.Session()
+
+    def _request(self, method, path, payload=None):
+        response = self.session.request(method, f"{self.url}{path}", json=payload, timeout=self.timeout)
+        if response.status_code != 200:
+            try:
+                message = response.json().get('error')
+            except ValueError:
+                message = response.text
+            raise RuntimeError(f"Inference server returned {response.status_code} for {path}: {message}")
+        return response.json()
+
+    def analyze_batch(self, posts, batch_size=None):
+        """
+        Categorize many posts and analyze their sentiment on the server
+
+        Args:
+            posts (list): Post records
+            batch_size (int, optional): Ignored; the server batches across clients
+
+        Returns:
+            list: (category, Sentiment) tuples in the same order as posts
+        """
+        if not posts:
+            return []
+        results = self._request("POST", "/text", {
+            'posts': [{'title': post.title, 'content': post.content} for post in posts]
+        })['results']
+        return [(result['category'], Sentiment.from_dict(result['sentiment'])) for result in results]
+
+    def fetch_images(self, image_urls):
+        """
+        Analyze images on the server, which downloads and caches them itself
+
+        Args:
+            image_urls (list): Image URLs, possibly from many posts
+
+        Returns:
+            tuple: (results_by_url, pending) as returned by ImageAnalyzer.fetch_images();
+                every image is already analyzed, so pending is always empty
+        """
+        urls = list(dict.fromkeys(url for url in image_urls if url))
+        if not urls:
+            return {}, {}
+        return self._request("POST", "/images", {'urls': urls})['results'], {}
+
+    def analyze_fetched(self, url_lists, results_by_url, pending):
+        """
+        Build each post's image analysis from fetch_images() results
+
+        Args:
+            url_lists (list): Image URLs of each post
+            results_by_url (dict): Results from fetch_images()
+            pending (dict): Unused, fetch_images() leaves nothing pending
+
+        Returns:
+            list: For each URL list, the analysis returned by ImageAnalyzer.analyze_images()
+        """
+        from image_analyzer import summarize_image_results
+
+        return [summarize_image_results(urls, results_by_url) for urls in url_lists]
+
+    def analyze_posts_images(self, posts):
+        """Analyze the images of many posts, as ImageAnalyzer.analyze_posts_images() does"""
+        url_lists = [post.image_urls for post in posts]
+        results_by_url, pending = self.fetch_images([url for urls in url_lists for url in urls])
+        return self.analyze_fetched(url_lists, results_by_url, pending)
+
+    def health(self):
+        """
+        Get the server's status
+
+        Returns:
+            dict: Loaded models, thread count and micro-batch stats
+        """
+        return self._request("GET", "/health")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_inference_client():
+    """
+    Get the process-wide inference server client
+
+    Returns:
+        InferenceClient: The client, or None when config.INFERENCE_SERVER_URL is not set
+    """
+    global _client
+    if not config.INFERENCE_SERVER_URL:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = InferenceClient()
+                logger.info(f"Running inference on the server at {_client.url}")
+    return _client
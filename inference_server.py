@@ -0,0 +1,352 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import config
+from metrics import (
+    get_metrics, count, stage_timer, start_metrics_server, ERRORS_TOTAL, SERVER_BATCH_SIZE, BATCH_SIZE_BUCKETS
+)
+from models import Post
+
+logger = logging.getLogger("sentiment_agent")
+
+
+class _Request:
+    """Items submitted by one caller, waiting for their results"""
+
+    __slots__ = ('items', 'results', 'error', 'done')
+
+    def __init__(self, items):
+        self.items = items
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests for one model into micro-batches
+
+    One thread runs the model. It takes the oldest waiting request, then keeps
+    adding requests that arrive within max_wait seconds until the batch holds
+    max_batch items, runs fn once on all of their items and hands each caller
+    its share of the results. A single request larger than max_batch is run
+    on its own; the model splits it into forward passes itself. If a batch
+    fails, its items are retried one by one, so only the requests holding a
+    bad item get the error.
+    """
+
+    def __init__(self, name, fn, max_batch=None, max_wait=None):
+        """
+        Args:
+            name (str): Model name, used for the stage timings ("server_<name>")
+            fn (callable): Takes a list of items and returns one result per item, in order
+            max_batch (int, optional): Items per micro-batch, defaults to config.INFERENCE_SERVER_MAX_BATCH
+            max_wait (float, optional): Seconds the first request waits for others,
+                defaults to config.INFERENCE_SERVER_MAX_WAIT
+        """
+        self.name = name
+        self.fn = fn
+        self.max_batch = max_batch or config.INFERENCE_SERVER_MAX_BATCH
+        self.max_wait = config.INFERENCE_SERVER_MAX_WAIT if max_wait is None else max_wait
+        self.batches = 0
+        self.items = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, items):
+        """
+        Run items through the model as part of the next micro-batch
+
+        Args:
+            items (list): Inputs for fn
+
+        Returns:
+            list: fn's results for these items, in order
+        """
+        if not items:
+            return []
+        request = _Request(list(items))
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def stats(self):
+        """Get request, batch and item counts, and the mean batch size"""
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else None
+        }
+
+    def _run(self):
+        batch_sizes = get_metrics().histogram(
+            SERVER_BATCH_SIZE, "Items per inference server micro-batch", buckets=BATCH_SIZE_BUCKETS
+        )
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].items)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                try:
+                    request = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.items)
+
+            items = [item for request in batch for item in request.items]
+            try:
+                results = self._process(items)
+                start = 0
+                for request in batch:
+                    request.results = results[start:start + len(request.items)]
+                    start += len(request.items)
+            except Exception as e:
+                if len(items) == 1:
+                    logger.error(f"Error running a {self.name} batch: {str(e)}")
+                    batch[0].error = e
+                else:
+                    logger.error(f"Error running a {self.name} batch of {len(items)} items, "
+                                 f"retrying items individually: {str(e)}")
+                    for request in batch:
+                        self._retry_items(request)
+            finally:
+                for request in batch:
+                    request.done.set()
+
+            self.requests += len(batch)
+            self.batches += 1
+            self.items += len(items)
+            batch_sizes.observe(len(items), model=self.name)
+
+    def _process(self, items):
+        """Run fn on items, counting errors"""
+        try:
+            with stage_timer(f"server_{self.name}"):
+                return self.fn(items)
+        except Exception:
+            count(ERRORS_TOTAL, component=f"server_{self.name}")
+            raise
+
+    def _retry_items(self, request):
+        """Run a request's items one at a time after its batch failed"""
+        results = []
+        for item in request.items:
+            try:
+                results.extend(self._process([item]))
+            except Exception as e:
+                logger.error(f"Error running a {self.name} item: {str(e)}")
+                request.error = e
+                return
+        request.results = results
+
+
+def server_threads():
+    """
+    Get the intra-op thread count for each model in the server
+
+    The text and image batchers can run at the same time, so by default each
+    gets half the CPUs instead of every model assuming it owns the machine.
+
+    Returns:
+        int: config.INFERENCE_SERVER_THREADS, or half the CPUs when it is 0
+    """
+    return config.INFERENCE_SERVER_THREADS or max((os.cpu_count() or 2) // 2, 1)
+
+
+class InferenceServer:
+    """
+    Serves the text and image models to other processes over localhost HTTP
+
+    Endpoints (JSON bodies):
+        POST /text    {"posts": [{"title", "content"}, ...]}
+                      -> {"results": [{"category", "sentiment"}, ...]}
+        POST /images  {"urls": [...]}
+                      -> {"results": {url: {"content_tags", "caption"}, ...}}
+        GET /health   -> batcher stats and loaded models
+
+    Every request is handled on its own thread. Images are downloaded there,
+    while the model work of concurrent requests is coalesced by one
+    MicroBatcher per model.
+    """
+
+    def __init__(self, text_engine, image_analyzer, host=None, port=None, max_batch=None, max_wait=None,
+                 registry=None):
+        """
+        Args:
+            text_engine (TextAnalysisEngine): Categorization and sentiment models
+            image_analyzer (ImageAnalyzer): Image download, cache and classification
+            host (str, optional): Bind address, defaults to config.INFERENCE_SERVER_HOST
+            port (int, optional): Port, defaults to config.INFERENCE_SERVER_PORT (0 picks a free port)
+            max_batch (int, optional): Items per micro-batch
+            max_wait (float, optional): Seconds a micro-batch waits to fill
+            registry (ModelRegistry, optional): Registry the models came from, reported by
+                /health; defaults to the process-wide registry
+        """
+        self.text_engine = text_engine
+        self.image_analyzer = image_analyzer
+        self.registry = registry
+        self.text_batcher = MicroBatcher("text", text_engine.analyze_batch, max_batch, max_wait)
+        self.image_batcher = MicroBatcher("image", image_analyzer.classify_images, max_batch, max_wait)
+
+        self.httpd = ThreadingHTTPServer(
+            (host or config.INFERENCE_SERVER_HOST, config.INFERENCE_SERVER_PORT if port is None else port),
+            self._handler_class()
+        )
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def analyze_text(self, posts):
+        """
+        Categorize posts and analyze their sentiment
+
+        Args:
+            posts (list): Dicts with 'title' and 'content'
+
+        Returns:
+            list: Dicts with 'category' and 'sentiment' (Sentiment.to_dict() form)
+        """
+        records = [Post(None, post.get('title') or '', post.get('content') or '') for post in posts]
+        return [
+            {'category': category, 'sentiment': sentiment.to_dict()}
+            for category, sentiment in self.text_batcher.submit(records)
+        ]
+
+    def analyze_images(self, urls):
+        """
+        Analyze images by URL, reusing cached results
+
+        Args:
+            urls (list): Image URLs
+
+        Returns:
+            dict: URL -> dict with 'content_tags' and 'caption'; failed images are left out
+        """
+        results_by_url, pending = self.image_analyzer.fetch_images(urls)
+        return self.image_analyzer.classify_pending(results_by_url, pending, classify=self.image_batcher.submit)
+
+    def health(self):
+        """Get batcher stats and the models loaded in this process"""
+        import torch
+        from model_registry import get_registry
+
+        return {
+            'models': sorted((self.registry or get_registry()).stats()),
+            'text_analysis_mode': self.text_engine.mode,
+            'threads': torch.get_num_threads(),
+            'batchers': {'text': self.text_batcher.stats(), 'image': self.image_batcher.stats()}
+        }
+
+    def serve_forever(self):
+        """Handle requests until shutdown() is called"""
+        logger.info(f"Inference server listening on {self.url}")
+        self.httpd.serve_forever()
+
+    def start(self):
+        """
+        Handle requests from a daemon thread
+
+        Returns:
+            threading.Thread: The serving thread
+        """
+        thread = threading.Thread(target=self.serve_forever, name="inference-server", daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        """Stop serving and close the socket"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so clients reuse their connections
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/health":
+                    self._reply(404, {'error': "Not found"})
+                    return
+                self._reply(200, server.health())
+
+            def do_POST(self):
+                path = self.path.split("?")[0]
+                try:
+                    payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                except ValueError as e:
+                    self._reply(400, {'error': f"Invalid JSON: {str(e)}"})
+                    return
+
+                try:
+                    if path == "/text":
+                        self._reply(200, {'results': server.analyze_text(payload.get('posts') or [])})
+                    elif path == "/images":
+                        self._reply(200, {'results': server.analyze_images(payload.get('urls') or [])})
+                    else:
+                        self._reply(404, {'error': "Not found"})
+                except Exception as e:
+                    logger.error(f"Error handling {path}: {str(e)}")
+                    self._reply(500, {'error': str(e)})
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    """
+    Run the shared inference server
+
+    Loads the models once, then serves every dashboard session and worker
+    that has INFERENCE_SERVER_URL pointing here.
+    """
+    import torch
+    from model_registry import create_registry
+    from text_analysis import create_text_engine
+
+    threads = server_threads()
+    logger.info(f"Starting inference server ({threads} intra-op threads per model)")
+    # PyTorch only has a process-wide setting; ONNX sessions get the count when they're created
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    start_metrics_server()
+
+    registry = create_registry(threads=threads)
+    server = InferenceServer(create_text_engine(registry), registry.get("image"), registry=registry)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    os.makedirs("logs", exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler("logs/inference_server.log")
+        ]
+    )
+    main()
@@ -0,0 +1,225 @@
+import re
+import json
+import logging
+import config
+
+logger = logging.getLogger("sentiment_agent")
+
+# Structural characters that matter outside strings; keys and commas are only
+# tracked down to the children array, below it only nesting is followed
+_SHALLOW_TOKENS = re.compile(rb'["{}\[\],:]')
+_DEEP_TOKENS = re.compile(rb'["{}\[\]]')
+_STRING_TOKENS = re.compile(rb'["\\]')
+
+# Depth of the children array in {"data": {"children": [...]}}
+_CHILDREN_DEPTH = 3
+
+
+class _Container:
+    """An open JSON object or array and, for objects, the key being read"""
+
+    __slots__ = ('is_object', 'key', 'expect_key')
+
+    def __init__(self, is_object):
+        self.is_object = is_object
+        self.key = None
+        self.expect_key = is_object
+
+
+class ListingStreamParser:
+    """
+    Incremental parser for a Reddit listing body
+
+    Bytes are fed in as they arrive. Only the listing's skeleton is tracked;
+    each child of data.children is sliced out and decoded on its own as soon
+    as it is complete, so at most one child is held in memory whatever the
+    page size. The "after"/"before" cursors are picked up along the way.
+    """
+
+    def __init__(self):
+        self.after = None
+        self.before = None
+        self.found_children = False
+        self._buffer = bytearray()
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._string_start = None
+        self._child_start = None
+
+    def feed(self, chunk):
+        """
+        Parse the next chunk of the body
+
+        Args:
+            chunk (bytes): Next bytes of the response
+
+        Returns:
+            list: Data dictionaries of the children completed by this chunk
+        """
+        self._buffer.extend(chunk)
+        children = self._scan()
+
+        # Drop everything already parsed except a child or string still being read
+        keep = self._pos
+        if self._child_start is not None:
+            keep = self._child_start
+        elif self._in_string:
+            keep = self._string_start
+        if keep:
+            del self._buffer[:keep]
+            self._pos -= keep
+            if self._child_start is not None:
+                self._child_start -= keep
+            if self._string_start is not None:
+                self._string_start -= keep
+        return children
+
+    def close(self):
+        """
+        Check that the whole body was parsed
+
+        Raises:
+            ValueError: If the body ended in the middle of the listing
+        """
+        if self._stack or self._in_string:
+            raise ValueError("Listing response ended before the JSON was complete")
+
+    def _scan(self):
+        """Advance through the buffer, collecting completed children"""
+        buffer = self._buffer
+        stack = self._stack
+        pos = self._pos
+        children = []
+
+        while True:
+            if self._in_string:
+                match = _STRING_TOKENS.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                if buffer[match.start()] == 0x5C:  # backslash escapes the next byte
+                    if match.start() + 1 >= len(buffer):
+                        pos = match.start()
+                        break
+                    pos = match.start() + 2
+                    continue
+                pos = match.end()
+                self._in_string = False
+                if len(stack) < _CHILDREN_DEPTH:
+                    self._string_read(buffer[self._string_start:pos])
+                self._string_start = None
+                continue
+
+            tokens = _SHALLOW_TOKENS if len(stack) < _CHILDREN_DEPTH else _DEEP_TOKENS
+            match = tokens.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+            char = buffer[match.start()]
+            pos = match.end()
+
+            if char == 0x22:  # "
+                self._in_string = True
+                self._string_start = match.start()
+            elif char in (0x7B, 0x5B):  # { [
+                if len(stack) == _CHILDREN_DEPTH and self._child_start is None and self._in_children():
+                    self._child_start = match.start()
+                elif len(stack) == _CHILDREN_DEPTH - 1 and char == 0x5B and stack[-1].key == 'children':
+                    self.found_children = True
+                if stack and stack[-1].is_object:
+                    stack[-1].expect_key = False
+                stack.append(_Container(char == 0x7B))
+            elif char in (0x7D, 0x5D):  # } ]
+                if not stack:
+                    raise ValueError("Unbalanced brackets in listing response")
+                stack.pop()
+                if len(stack) == _CHILDREN_DEPTH and self._child_start is not None:
+                    child = json.loads(bytes(buffer[self._child_start:pos]))
+                    self._child_start = None
+                    if isinstance(child, dict) and isinstance(child.get('data'), dict):
+                        children.append(child['data'])
+            elif char == 0x2C:  # ,
+                if stack and stack[-1].is_object:
+                    stack[-1].expect_key = True
+            elif char == 0x3A:  # :
+                if stack and stack[-1].is_object:
+                    stack[-1].expect_key = False
+
+        self._pos = pos
+        return children
+
+    def _in_children(self):
+        """Whether the innermost open container is data.children"""
+        stack = self._stack
+        return stack[0].key == 'data' and stack[1].key == 'children' and not stack[2].is_object
+
+    def _string_read(self, raw):
+        """Handle a complete string above the children: a key, or a cursor value"""
+        top = self._stack[-1] if self._stack else None
+        if top is None or not top.is_object:
+            return
+        if top.expect_key:
+            top.key = json.loads(bytes(raw))
+        elif len(self._stack) == 2 and self._stack[0].key == 'data' and top.key in ('after', 'before'):
+            setattr(self, top.key, json.loads(bytes(raw)))
+
+
+class ListingPage:
+    """
+    One page of a Reddit listing, iterated as post data dictionaries
+
+    Streamed pages decode one child at a time from the response, so reading
+    can stop at the first already-seen post without downloading or parsing
+    the rest. Pages built from already-parsed JSON behave the same way.
+    """
+
+    def __init__(self, response=None, data=None, chunk_size=None):
+        """
+        Args:
+            response (requests.Response, optional): Response opened with stream=True
+            data (dict, optional): Already-parsed listing JSON, used instead of a response
+            chunk_size (int, optional): Bytes read per chunk, defaults to config.REDDIT_STREAM_CHUNK_SIZE
+        """
+        self.response = response
+        self.data = data
+        self.chunk_size = chunk_size or config.REDDIT_STREAM_CHUNK_SIZE
+        self.after = None
+        self.before = None
+
+    def __iter__(self):
+        if self.response is None:
+            yield from self._parsed_children()
+            return
+
+        parser = ListingStreamParser()
+        try:
+            for chunk in self.response.iter_content(chunk_size=self.chunk_size):
+                children = parser.feed(chunk)
+                self.after, self.before = parser.after, parser.before
+                yield from children
+            parser.close()
+            self.after, self.before = parser.after, parser.before
+        finally:
+            self.close()
+
+        if not parser.found_children:
+            logger.error("Unexpected JSON structure: listing has no data.children")
+
+    def close(self):
+        """Release the connection if the page wasn't read to the end"""
+        if self.response is not None:
+            self.response.close()
+
+    def _parsed_children(self):
+        """Yield post data from already-parsed listing JSON"""
+        data = self.data
+        if not isinstance(data, dict) or 'data' not in data or 'children' not in data.get('data', {}):
+            logger.error(f"Unexpected JSON structure: {str(data)[:100]}...")
+            return
+
+        self.after = data['data'].get('after')
+        self.before = data['data'].get('before')
+        for child in data['data']['children']:
+            if isinstance(child, dict) and 'data' in child:
+                yield child.get('data', {})
@@ -0,0 +1,409 @@
+import os
+import re
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import config
+
+logger = logging.getLogger("sentiment_agent")
+
+# Metric names, all prefixed so they group together in Prometheus
+STAGE_SECONDS = "sentiment_agent_stage_seconds"
+POSTS_TOTAL = "sentiment_agent_posts_total"
+IMAGES_TOTAL = "sentiment_agent_images_total"
+ERRORS_TOTAL = "sentiment_agent_errors_total"
+CACHE_EVENTS_TOTAL = "sentiment_agent_cache_events_total"
+CACHE_ENTRIES = "sentiment_agent_cache_entries"
+MODEL_LOAD_SECONDS = "sentiment_agent_model_load_seconds"
+MODEL_RSS_BYTES = "sentiment_agent_model_rss_bytes"
+SERVER_BATCH_SIZE = "sentiment_agent_server_batch_size"
+
+# Histogram buckets (seconds) from a cached lookup up to a slow fetch cycle
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Items per inference server micro-batch
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count, per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """Add to the count for a label set"""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        """Get (name, labels, value) for every label set"""
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, per label set"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        """Set the value for a label set"""
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram:
+    """
+    Distribution of observed values in cumulative buckets, per label set
+
+    Same layout as a Prometheus histogram: _bucket{le=...}, _sum and _count.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """Record one observation for a label set"""
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent in a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        """Get (name, labels, value) for every bucket, sum and count of every label set"""
+        samples = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket", key + (("le", _format_value(bound)),), cumulative))
+                samples.append((f"{self.name}_sum", key, total))
+                samples.append((f"{self.name}_count", key, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Process-wide set of metrics, rendered in the Prometheus text format
+
+    Collectors are callables run at render time for values that already live
+    elsewhere (model load stats, cache counters); each returns a list of
+    (kind, name, help, samples) with samples as (labels dict, value) pairs.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help_text, **kwargs)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name, help_text=""):
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=STAGE_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def add_collector(self, collector):
+        """Register a callable returning extra metrics at render time"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format
+
+        Returns:
+            str: Exposition text
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        families = [(metric.kind, metric.name, metric.help_text, metric.samples()) for metric in metrics]
+        for collector in collectors:
+            try:
+                for kind, name, help_text, samples in collector():
+                    families.append((kind, name, help_text,
+                                     [(name, _label_key(labels), value) for labels, value in samples]))
+            except Exception as e:
+                logger.error(f"Error collecting metrics: {str(e)}")
+
+        lines = []
+        for kind, name, help_text, samples in families:
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+_SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)')
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_metrics_text(text):
+    """
+    Parse Prometheus exposition text, e.g. a metrics file written by another process
+
+    Args:
+        text (str): Exposition text
+
+    Returns:
+        list: (name, labels dict, value) samples
+    """
+    samples = []
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _SAMPLE_LINE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        labels = {
+            key: raw.replace('\\"', '"').replace("\\n", "\n").replace("\\\\", "\\")
+            for key, raw in _LABEL.findall(labels or "")
+        }
+        samples.append((name, labels, float(value)))
+    return samples
+
+
+def stage_summary(samples):
+    """
+    Summarize the stage histogram for display
+
+    p50/p99 are estimated from the buckets (upper bound of the bucket the
+    quantile falls in), as Prometheus' histogram_quantile would.
+
+    Args:
+        samples (list): (name, labels dict, value) from parse_metrics_text()
+
+    Returns:
+        list: Dicts with stage, count, mean, p50 and p99 (seconds), one per stage
+    """
+    stages = {}
+    for name, labels, value in samples:
+        if not name.startswith(STAGE_SECONDS):
+            continue
+        stage = stages.setdefault(labels.get("stage", ""), {"buckets": [], "sum": 0.0, "count": 0})
+        if name.endswith("_bucket"):
+            stage["buckets"].append((float(labels["le"]), value))
+        elif name.endswith("_sum"):
+            stage["sum"] = value
+        elif name.endswith("_count"):
+            stage["count"] = int(value)
+
+    rows = []
+    for stage_name, stage in stages.items():
+        buckets = sorted(stage["buckets"])
+
+        def quantile(q):
+            target = q * stage["count"]
+            for bound, cumulative in buckets:
+                if cumulative >= target:
+                    # Observations past the last finite bucket are reported at that bound
+                    return bound if bound != float("inf") else buckets[-2][0] if len(buckets) > 1 else None
+            return None
+
+        rows.append({
+            "stage": stage_name,
+            "count": stage["count"],
+            "mean": stage["sum"] / stage["count"] if stage["count"] else None,
+            "p50": quantile(0.5) if stage["count"] else None,
+            "p99": quantile(0.99) if stage["count"] else None,
+        })
+    return rows
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """
+    Get the process-wide metrics registry
+
+    Returns:
+        MetricsRegistry: Registry with the stage histogram and counters defined
+    """
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                registry = MetricsRegistry()
+                registry.histogram(STAGE_SECONDS, "Seconds spent per call of each processing stage")
+                registry.counter(POSTS_TOTAL, "Posts by event (fetched, processed)")
+                registry.counter(IMAGES_TOTAL, "Images by event (downloaded, failed, classified)")
+                registry.counter(ERRORS_TOTAL, "Errors by component")
+                _metrics = registry
+    return _metrics
+
+
+def stage_timer(stage):
+    """
+    Time a with-block as one call of a processing stage
+
+    Args:
+        stage (str): Stage name, e.g. "fetch" or "categorize"
+
+    Returns:
+        contextmanager: Records into the stage histogram on exit
+    """
+    return get_metrics().histogram(STAGE_SECONDS).time(stage=stage)
+
+
+def count(name, amount=1, **labels):
+    """Add to one of the counters defined in get_metrics()"""
+    if amount:
+        get_metrics().counter(name).inc(amount, **labels)
+
+
+def write_metrics_file(path=None):
+    """
+    Write the current metrics to a file, for node_exporter's textfile collector
+    or a dashboard running in another process
+
+    Args:
+        path (str, optional): Output file, defaults to config.METRICS_FILE
+    """
+    path = path or config.METRICS_FILE
+    if not path:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Write then rename, so readers never see a half-written file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "w") as f:
+            f.write(get_metrics().render())
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write metrics to {path}: {str(e)}")
+
+
+def read_metrics_file(path=None):
+    """
+    Read metrics written by write_metrics_file()
+
+    Returns:
+        list: (name, labels dict, value) samples, empty if there is no file yet
+    """
+    path = path or config.METRICS_FILE
+    if not path or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return parse_metrics_text(f.read())
+
+
+_server = None
+_server_failed = False  # Binding failed once; not retried on every Streamlit rerun
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host=None):
+    """
+    Serve /metrics over HTTP from a daemon thread, once per process
+
+    If the port can't be bound, that is logged once and later calls return None
+    without trying again.
+
+    Args:
+        port (int, optional): Port, defaults to config.METRICS_PORT (0 disables the server)
+        host (str, optional): Bind address, defaults to config.METRICS_HOST
+
+    Returns:
+        ThreadingHTTPServer: The running server, or None when disabled
+    """
+    global _server, _server_failed
+    port = config.METRICS_PORT if port is None else port
+    if not port:
+        return None
+    with _server_lock:
+        if _server is not None or _server_failed:
+            return _server
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = get_metrics().render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer((host or config.METRICS_HOST, port), Handler)
+        except OSError as e:
+            # Another process (e.g. the worker next to the dashboard) may already hold the port
+            logger.warning(f"Metrics server not started on port {port}: {str(e)}")
+            _server_failed = True
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Serving metrics on http://{server.server_address[0]}:{port}/metrics")
+        _server = server
+        return server
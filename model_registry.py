@@ -0,0 +1,238 @@
+import os
+import time
+import logging
+import resource
+import threading
+from functools import partial
+from metrics import get_metrics
+
+logger = logging.getLogger("sentiment_agent")
+
+
+def _current_rss_bytes():
+    """
+    Get the resident set size of this process
+
+    Returns:
+        int: Resident memory in bytes (peak RSS if /proc is unavailable)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is reported in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _load_categorizer(threads=None):
+    from categorizer import PostCategorizer
+    return PostCategorizer(threads=threads)
+
+
+def _load_sentiment_analyzer(threads=None):
+    from sentiment_analyzer import SentimentAnalyzer
+    return SentimentAnalyzer(threads=threads)
+
+
+def _load_image_analyzer():
+    from image_analyzer import ImageAnalyzer
+    return ImageAnalyzer()
+
+
+class ModelRegistry:
+    """
+    Process-wide registry that loads each model once and shares it
+
+    Streamlit re-executes the app script on every rerun and for every session,
+    but imported modules are only loaded once per process, so instances kept
+    here survive across reruns and are shared between sessions.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._stats = {}
+        # Loads are serialized so the RSS delta can be attributed to one model
+        self._load_lock = threading.Lock()
+        # Separate from the load lock, so checking on the warm-up never waits for a load
+        self._warm_up_lock = threading.Lock()
+        self._warm_up_thread = None
+
+    def register(self, name, factory):
+        """
+        Register a factory that builds a model wrapper
+
+        Args:
+            name (str): Name used to look the model up
+            factory (callable): Zero-argument callable returning the instance
+        """
+        self._factories[name] = factory
+
+    def get(self, name):
+        """
+        Get a model instance, loading it on first use
+
+        Args:
+            name (str): Registered model name
+
+        Returns:
+            object: The shared model instance
+        """
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        if name not in self._factories:
+            raise KeyError(f"Unknown model: {name}")
+
+        with self._load_lock:
+            # Another thread may have finished loading while we waited
+            instance = self._instances.get(name)
+            if instance is not None:
+                return instance
+
+            logger.info(f"Loading model '{name}'")
+            rss_before = _current_rss_bytes()
+            start = time.perf_counter()
+            instance = self._factories[name]()
+            load_seconds = time.perf_counter() - start
+            rss_delta = max(_current_rss_bytes() - rss_before, 0)
+
+            self._instances[name] = instance
+            self._stats[name] = {
+                'load_seconds': load_seconds,
+                'rss_bytes': rss_delta,
+                'loaded_at': time.time()
+            }
+            logger.info(f"Loaded model '{name}' in {load_seconds:.1f}s "
+                        f"(+{rss_delta / (1024 * 1024):.0f} MB RSS)")
+            return instance
+
+    def is_loaded(self, name):
+        """Check whether a model has already been loaded"""
+        return name in self._instances
+
+    def warm_up(self, names=None, background=False):
+        """
+        Load models ahead of their first use
+
+        Args:
+            names (list, optional): Models to load, defaults to all registered models
+            background (bool): If True, load in a daemon thread and return immediately
+
+        Returns:
+            threading.Thread: The warm-up thread when running in background, else None
+                (also None when every model is already loaded)
+        """
+        names = list(names) if names is not None else list(self._factories)
+        # Dashboard reruns call this again; there is nothing to do once everything is loaded
+        names = [name for name in names if not self.is_loaded(name)]
+        if not names:
+            return None
+
+        def _load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logger.error(f"Error warming up model '{name}': {str(e)}")
+
+        if not background:
+            _load_all()
+            return None
+
+        with self._warm_up_lock:
+            if self._warm_up_thread is not None and self._warm_up_thread.is_alive():
+                return self._warm_up_thread
+            self._warm_up_thread = threading.Thread(
+                target=_load_all, name="model-warm-up", daemon=True
+            )
+            self._warm_up_thread.start()
+            return self._warm_up_thread
+
+    def collect_metrics(self):
+        """
+        Report model load stats and result cache counters as metrics
+
+        Returns:
+            list: (kind, name, help, samples) families for MetricsRegistry.add_collector()
+        """
+        from metrics import MODEL_LOAD_SECONDS, MODEL_RSS_BYTES, CACHE_EVENTS_TOTAL, CACHE_ENTRIES
+
+        stats = self.stats()
+        cache_events = []
+        cache_entries = []
+        for name, instance in list(self._instances.items()):
+            cache = getattr(instance, 'cache', None)
+            if cache is None:
+                continue
+            for key, value in cache.stats().items():
+                if key.endswith('entries'):
+                    cache_entries.append(({'cache': name, 'tier': key[:-len('_entries')] or 'all'}, value))
+                else:
+                    cache_events.append(({'cache': name, 'event': key}, value))
+        return [
+            ("gauge", MODEL_LOAD_SECONDS, "Seconds it took to load each model",
+             [({'model': name}, model['load_seconds']) for name, model in stats.items()]),
+            ("gauge", MODEL_RSS_BYTES, "Resident memory added by loading each model",
+             [({'model': name}, model['rss_bytes']) for name, model in stats.items()]),
+            ("counter", CACHE_EVENTS_TOTAL, "Result cache hits and misses", cache_events),
+            ("gauge", CACHE_ENTRIES, "Entries held by each result cache", cache_entries),
+        ]
+
+    def stats(self):
+        """
+        Get load statistics for every loaded model
+
+        Returns:
+            dict: Model name -> dict with load_seconds, rss_bytes and loaded_at
+        """
+        return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+def create_registry(threads=None):
+    """
+    Create a registry of the categorizer, sentiment and image models
+
+    Args:
+        threads (int, optional): Intra-op threads for text models on an ONNX backend,
+            defaults to config.ONNX_THREADS
+
+    Returns:
+        ModelRegistry: The registry, reporting its stats to the metrics registry
+    """
+    registry = ModelRegistry()
+    registry.register("categorizer", partial(_load_categorizer, threads))
+    registry.register("sentiment", partial(_load_sentiment_analyzer, threads))
+    registry.register("image", _load_image_analyzer)
+    get_metrics().add_collector(registry.collect_metrics)
+    return registry
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Get the process-wide model registry
+
+    Returns:
+        ModelRegistry: Registry with the categorizer, sentiment and image models registered
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = create_registry()
+    return _registry
+
+
+if __name__ == "__main__":
+    # Pre-load every model, e.g. to populate the Hugging Face cache at build time
+    logging.basicConfig(level=logging.INFO)
+    registry = get_registry()
+    registry.warm_up()
+    for name, stats in registry.stats().items():
+        print(f"{name}: {stats['load_seconds']:.1f}s, {stats['rss_bytes'] / (1024 * 1024):.0f} MB")
@@ -0,0 +1,155 @@
+from datetime import datetime
+import config
+
+
+def parse_published(value, fallback=0.0):
+    """
+    Convert a published time from any stored format to a Unix timestamp
+
+    Args:
+        value: Unix timestamp, ISO 8601 string (older stored posts) or None
+        fallback (float): Returned when value is missing or can't be parsed
+
+    Returns:
+        float: Unix timestamp
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            pass
+    return float(fallback or 0.0)
+
+
+class Sentiment:
+    """Sentiment of a post: a score from -1 to 1, its label and any image tags"""
+
+    __slots__ = ('score', 'label', 'is_negative', 'image_tags')
+
+    def __init__(self, score=0.0, label='NEUTRAL', is_negative=False, image_tags=None):
+        """
+        Args:
+            score (float): Sentiment from -1 (negative) to 1 (positive)
+            label (str): Model label, e.g. 'POSITIVE' or 'NEGATIVE'
+            is_negative (bool): Whether the score is below config.NEGATIVE_THRESHOLD
+            image_tags (list, optional): Content tags of the post's images
+        """
+        self.score = score
+        self.label = label
+        self.is_negative = is_negative
+        self.image_tags = image_tags or []
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: JSON-serializable form, as stored and cached
+        """
+        data = {'score': self.score, 'label': self.label, 'is_negative': self.is_negative}
+        if self.image_tags:
+            data['image_tags'] = self.image_tags
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Args:
+            data (dict): Output of to_dict(), or None
+
+        Returns:
+            Sentiment: The sentiment, or None if data is empty
+        """
+        if not data:
+            return None
+        return cls(
+            score=data.get('score', 0.0),
+            label=data.get('label', 'NEUTRAL'),
+            is_negative=bool(data.get('is_negative', False)),
+            image_tags=data.get('image_tags')
+        )
+
+
+class Post:
+    """
+    A Reddit post and the results of analyzing it
+
+    The published time is parsed once, when the post is created, and kept as
+    a Unix timestamp, so sorting, windowing and display never re-parse it.
+    """
+
+    __slots__ = ('id', 'title', 'content', 'link', 'published', 'image_urls', 'source',
+                 'category', 'sentiment', 'timestamp')
+
+    def __init__(self, id, title='', content='', link='', published=0.0, image_urls=None, source=None,
+                 category=None, sentiment=None, timestamp=None):
+        """
+        Args:
+            id (str): Reddit post id
+            title (str): Post title
+            content (str): Post text
+            link (str): URL of the post on Reddit
+            published (float): Unix time the post was published
+            image_urls (list, optional): URLs of the post's images
+            source (str, optional): Where the post came from, defaults to config.DEFAULT_SOURCE_NAME
+            category (str, optional): Predicted category, set during processing
+            sentiment (Sentiment, optional): Predicted sentiment, set during processing
+            timestamp (float, optional): Unix time the post was processed
+        """
+        self.id = id
+        self.title = title
+        self.content = content
+        self.link = link
+        self.published = published
+        self.image_urls = image_urls or []
+        self.source = source or config.DEFAULT_SOURCE_NAME
+        self.category = category
+        self.sentiment = sentiment
+        self.timestamp = timestamp
+
+    @property
+    def text(self):
+        """Title and content combined, as read by the text models"""
+        return f"{self.title}. {self.content}"
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: JSON-serializable form, as stored
+        """
+        return {
+            'id': self.id,
+            'title': self.title,
+            'content': self.content,
+            'link': self.link,
+            'published': self.published,
+            'image_urls': self.image_urls,
+            'source': self.source,
+            'category': self.category,
+            'sentiment': self.sentiment.to_dict() if self.sentiment is not None else None,
+            'timestamp': self.timestamp
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a post from to_dict() output or an older post dictionary
+
+        Args:
+            data (dict): Post dictionary; 'published' may be an ISO 8601 string
+
+        Returns:
+            Post: The post
+        """
+        return cls(
+            id=data.get('id'),
+            title=data.get('title', ''),
+            content=data.get('content', ''),
+            link=data.get('link', ''),
+            published=parse_published(data.get('published'), data.get('timestamp')),
+            image_urls=data.get('image_urls'),
+            source=data.get('source'),
+            category=data.get('category'),
+            sentiment=Sentiment.from_dict(data.get('sentiment')),
+            timestamp=data.get('timestamp')
+        )
@@ -27,7 +27,9 @@ class EmailNotifier:
         msg = MIMEMultipart()
         msg['From'] = self.sender
         msg['To'] = self.recipient
-        msg['Subject'] = f"Alert: Negative Sentiment Burst in r/boston - {category}"
+        # Bursts are detected per source, so every post shares one
+        source = posts[0].source if posts else config.DEFAULT_SOURCE_NAME
+        msg['Subject'] = f"Alert: Negative Sentiment Burst in {source} - {category}"
         
         # Create email body
         body = f"<h2>Negative Sentiment Burst Detected in Category: {category}</h2>"
@@ -36,21 +38,21 @@ class EmailNotifier:
         body += "<ul>"
         
         for post in posts:
-            body += f"<li><strong><a href='{post['link']}'>{post['title']}</a></strong>"
+            body += f"<li><strong><a href='{post.link}'>{post.title}</a></strong>"
             
             # Add sentiment information
-            sentiment_info = f" (Sentiment Score: {post['sentiment']['score']:.2f})"
+            sentiment_info = f" (Sentiment Score: {post.sentiment.score:.2f})"
             
             # Add image information if available
-            if 'image_tags' in post['sentiment'] and post['sentiment']['image_tags']:
-                sentiment_info += f" - Contains images of: {', '.join(post['sentiment']['image_tags'][:3])}"
+            if post.sentiment.image_tags:
+                sentiment_info += f" - Contains images of: {', '.join(post.sentiment.image_tags[:3])}"
             
             body += sentiment_info + "</li>"
             
             # Add post content preview
-            if post['content']:
+            if post.content:
                 # Truncate content for preview
-                content_preview = post['content'][:200] + "..." if len(post['content']) > 200 else post['content']
+                content_preview = post.content[:200] + "..." if len(post.content) > 200 else post.content
                 body += f"<p><em>{content_preview}</em></p>"
         
         body += "</ul>"
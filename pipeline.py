@@ -0,0 +1,359 @@
+import time
+import queue
+import logging
+import threading
+import config
+from fetcher import MultiSourceFetcher
+from notifier import EmailNotifier
+from model_registry import get_registry
+from inference_client import get_inference_client
+from post_store import get_post_store
+from burst_detector import get_burst_detector
+from metrics import stage_timer, count, write_metrics_file, POSTS_TOTAL, ERRORS_TOTAL
+from profiling import profile_cycle
+
+logger = logging.getLogger("sentiment_agent")
+
+# Marks the end of the stream; each worker consumes exactly one
+_STOP = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline, run by its own pool of worker threads
+
+    Each worker takes up to batch_size items from the stage's input queue
+    (waiting at most batch_wait seconds to fill a batch), calls fn on the
+    batch and passes the returned items on to the next stage.
+    """
+
+    def __init__(self, name, fn, workers=1, batch_size=1, batch_wait=None):
+        """
+        Args:
+            name (str): Stage name, used for thread names and logging
+            fn (callable): Takes a list of items and returns the list of items to pass on
+            workers (int): Number of worker threads
+            batch_size (int): Maximum items per call to fn
+            batch_wait (float, optional): Seconds to wait for a batch to fill,
+                defaults to config.PIPELINE_BATCH_WAIT
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = config.PIPELINE_BATCH_WAIT if batch_wait is None else batch_wait
+
+    def process(self, items):
+        """
+        Run fn on a batch, retrying items one by one if the batch fails
+
+        Args:
+            items (list): Items taken from the input queue
+
+        Returns:
+            list: Items to pass to the next stage (failed items are dropped)
+        """
+        try:
+            with stage_timer(self.name):
+                return self.fn(items)
+        except Exception as e:
+            count(ERRORS_TOTAL, component=self.name)
+            if len(items) == 1:
+                logger.error(f"Error in pipeline stage '{self.name}': {str(e)}")
+                return []
+            logger.error(f"Error in pipeline stage '{self.name}' for a batch of {len(items)}, "
+                         f"retrying items individually: {str(e)}")
+
+        results = []
+        for item in items:
+            results.extend(self.process([item]))
+        return results
+
+
+class Pipeline:
+    """
+    Streaming pipeline of stages connected by bounded queues
+
+    Every stage runs concurrently, so network waits in one stage overlap with
+    inference in another and throughput is limited by the slowest stage. Full
+    queues block the stage before them, which gives backpressure all the way
+    back to the source.
+    """
+
+    def __init__(self, stages, queue_size=None):
+        """
+        Args:
+            stages (list): Stage instances in processing order
+            queue_size (int, optional): Capacity of each queue, defaults to config.PIPELINE_QUEUE_SIZE
+        """
+        self.stages = stages
+        self.queue_size = queue_size or config.PIPELINE_QUEUE_SIZE
+
+    def run(self, source):
+        """
+        Feed items through every stage
+
+        Args:
+            source (iterable): Items to process; consumed on a separate thread
+
+        Yields:
+            object: Items that made it through the last stage, as they finish
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(
+            target=self._feed, args=(source, queues[0], self.stages[0].workers),
+            name="pipeline-source", daemon=True
+        )]
+
+        for index, stage in enumerate(self.stages):
+            next_workers = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            for worker in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(stage, queues[index], queues[index + 1], next_workers, remaining, lock),
+                    name=f"pipeline-{stage.name}-{worker}",
+                    daemon=True
+                ))
+
+        for thread in threads:
+            thread.start()
+
+        output = queues[-1]
+        while True:
+            item = output.get()
+            if item is _STOP:
+                break
+            yield item
+
+        for thread in threads:
+            thread.join()
+
+    def _feed(self, source, output, next_workers):
+        """Put source items on the first queue, then one stop marker per worker"""
+        try:
+            for item in source:
+                output.put(item)
+        except Exception as e:
+            logger.error(f"Error reading pipeline source: {str(e)}")
+        finally:
+            for _ in range(next_workers):
+                output.put(_STOP)
+
+    def _work(self, stage, input_queue, output_queue, next_workers, remaining, lock):
+        """Worker loop: take batches, process them and pass results on"""
+        stopped = False
+        while not stopped:
+            item = input_queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + stage.batch_wait
+            while len(batch) < stage.batch_size:
+                try:
+                    item = input_queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopped = True
+                    break
+                batch.append(item)
+
+            for result in stage.process(batch):
+                output_queue.put(result)
+
+        # The last worker of a stage to finish tells the next stage to stop
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            for _ in range(next_workers):
+                output_queue.put(_STOP)
+
+
+class _Work:
+    """A post plus intermediate results as it moves through the ingestion stages"""
+
+    __slots__ = ('post', 'image_results', 'image_pending', 'image_analysis')
+
+    def __init__(self, post):
+        self.post = post
+        self.image_results = {}
+        self.image_pending = {}
+        self.image_analysis = None
+
+
+def build_ingestion_pipeline(image_analyzer, text_engine, store, detector, notifier):
+    """
+    Build the staged post-processing pipeline
+
+    Stages: image download -> image classify -> text analysis (category and
+    sentiment) -> store -> burst check. Worker counts and batch sizes come
+    from config.PIPELINE_STAGES.
+
+    Args:
+        image_analyzer (ImageAnalyzer): Image analysis model, or an InferenceClient
+        text_engine (TextAnalysisEngine): Categorization and sentiment models, or an InferenceClient
+        store (PostStore): Where processed posts are saved
+        detector (BurstDetector): Burst detector fed with stored posts
+        notifier (EmailNotifier): Sends alerts for new bursts
+
+    Returns:
+        Pipeline: Pipeline that takes Post records and yields processed posts
+    """
+    def download_images(batch):
+        urls = [url for work in batch for url in work.post.image_urls]
+        results, pending = image_analyzer.fetch_images(urls)
+        for work in batch:
+            work.image_results = results
+            work.image_pending = pending
+        return batch
+
+    def classify_images(batch):
+        results = {}
+        pending = {}
+        for work in batch:
+            results.update(work.image_results)
+            pending.update(work.image_pending)
+        analyses = image_analyzer.analyze_fetched(
+            [work.post.image_urls for work in batch], results, pending
+        )
+        for work, image_analysis in zip(batch, analyses):
+            work.image_analysis = image_analysis
+            work.image_results = work.image_pending = None
+            # Add image captions to post content for better categorization and sentiment analysis
+            if image_analysis.get('captions'):
+                work.post.content = work.post.content + " " + " ".join(image_analysis['captions'])
+        return batch
+
+    def analyze_text(batch):
+        # Each post's text is tokenized once for both categorization and sentiment
+        results = text_engine.analyze_batch([work.post for work in batch])
+        for work, (category, sentiment) in zip(batch, results):
+            work.post.category = category
+            logger.info(f"Categorized post {work.post.id} as {category}")
+            # Add image tags if available
+            if work.image_analysis and 'content_tags' in work.image_analysis:
+                sentiment.image_tags = work.image_analysis.get('content_tags', [])
+            work.post.sentiment = sentiment
+            work.post.timestamp = time.time()
+        return [work.post for work in batch]
+
+    def save(posts):
+        store.upsert(posts)
+        return posts
+
+    def check_bursts(posts):
+        detector.add(posts)
+        for category, category_posts in detector.new_bursts():
+            logger.info(f"Sending notification for burst in category {category}")
+            notifier.send_burst_alert(category, category_posts)
+        return posts
+
+    stage_functions = [
+        ("image_download", download_images),
+        ("image_classify", classify_images),
+        ("text_analysis", analyze_text),
+        ("store", save),
+        ("burst_check", check_bursts)
+    ]
+    stages = []
+    for name, fn in stage_functions:
+        settings = config.PIPELINE_STAGES.get(name, {})
+        stages.append(Stage(name, fn, workers=settings.get('workers', 1), batch_size=settings.get('batch_size', 1)))
+    return Pipeline(stages)
+
+
+def run_ingestion(posts, image_analyzer, text_engine, store, detector, notifier):
+    """
+    Process posts through the staged ingestion pipeline
+
+    Args:
+        posts (iterable): New Post records from the parser
+        image_analyzer, text_engine, store, detector, notifier:
+            Components passed to build_ingestion_pipeline()
+
+    Yields:
+        Post: Each post once it has been processed, stored and burst-checked
+    """
+    pipeline = build_ingestion_pipeline(image_analyzer, text_engine, store, detector, notifier)
+    yield from pipeline.run(_Work(post) for post in posts)
+
+
+_shared_fetcher = None
+
+
+def get_shared_fetcher():
+    """Get a process-wide fetcher so parser cursors and poll schedules persist between cycles"""
+    global _shared_fetcher
+    if _shared_fetcher is None:
+        _shared_fetcher = MultiSourceFetcher()
+    return _shared_fetcher
+
+
+def run_fetch_cycle(fetcher=None, on_progress=None, due_only=False):
+    """
+    Fetch new posts, process them through the pipeline and apply retention
+
+    Used by both the headless worker and the dashboard's "Fetch New Posts" button.
+
+    Args:
+        fetcher (MultiSourceFetcher, optional): Fetcher to poll, defaults to a
+            process-wide one that keeps its state between cycles
+        on_progress (callable, optional): Called with a status message as work progresses
+        due_only (bool): Only poll sources whose adaptive interval has elapsed
+
+    Returns:
+        int: Number of posts processed
+    """
+    def report(message):
+        if on_progress is not None:
+            on_progress(message)
+
+    # The store answers "already processed?" lookups by post id
+    store = get_post_store()
+    fetcher = fetcher or get_shared_fetcher()
+
+    report("Fetching posts...")
+    with stage_timer("fetch"):
+        new_posts = fetcher.fetch_due(store) if due_only else fetcher.fetch_all(store)
+    logger.info(f"Found {len(new_posts)} new posts")
+    count(POSTS_TOTAL, len(new_posts), event="fetched")
+    if not new_posts:
+        report("No new posts found")
+        write_metrics_file()
+        return 0
+
+    # Initialize components: the shared inference server if there is one, otherwise
+    # in-process models (loaded once per process by the registry)
+    client = get_inference_client()
+    if client is not None:
+        image_analyzer = text_engine = client
+    else:
+        from text_analysis import get_text_engine
+        image_analyzer, text_engine = get_registry().get("image"), get_text_engine()
+    report(f"Processing {len(new_posts)} new posts...")
+
+    # Posts stream through image download, image classification, text analysis,
+    # storage and burst checks, with every stage running concurrently
+    processed = 0
+    with profile_cycle():
+        for post in run_ingestion(
+            new_posts,
+            image_analyzer,
+            text_engine,
+            store,
+            get_burst_detector(),
+            EmailNotifier()
+        ):
+            processed += 1
+            report(f"Processed post {processed}/{len(new_posts)}: {post.title[:30]}...")
+
+    count(POSTS_TOTAL, processed, event="processed")
+
+    # Drop posts past the retention period
+    store.apply_retention()
+    write_metrics_file()
+    return processed
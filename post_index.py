@@ -0,0 +1,255 @@
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from post_store import get_post_store
+
+logger = logging.getLogger("sentiment_agent")
+
+# Vectorized versions of post_store.SENTIMENT_FILTERS
+SENTIMENT_MASKS = {
+    "Positive": lambda score: score > 0.1,
+    "Negative": lambda score: score < -0.1,
+    "Neutral": lambda score: (score >= -0.1) & (score <= 0.1)
+}
+
+# Column name -> dtype; strings are coded as small ints against a lookup list
+_COLUMNS = {
+    'published': np.float64,
+    'score': np.float32,
+    'category': np.int16,
+    'label': np.int16,
+    'source': np.int16,
+    'is_negative': np.bool_,
+    'id': object,
+    'title': object
+}
+
+
+class PostIndex:
+    """
+    Columnar in-memory index of stored posts for dashboard filtering
+
+    Each field is a NumPy column kept sorted by published time, oldest first.
+    Filters are vectorized masks over those columns, newest-first order is a
+    reversed view, and unfiltered pages are plain slices, so none of them
+    touch per-post objects. refresh() pulls only posts saved since the last
+    refresh from the store.
+    """
+
+    def __init__(self, store=None):
+        """
+        Args:
+            store (PostStore, optional): Store to index, defaults to the process-wide store
+        """
+        self.store = store or get_post_store()
+        self._columns = {name: np.empty(0, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self._positions = {}  # post id -> row
+        self._codes = {'category': {}, 'label': {}, 'source': {}}  # value -> code
+        self._values = {'category': [], 'label': [], 'source': []}  # code -> value
+        self._watermark = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._columns['published'])
+
+    def refresh(self):
+        """
+        Index posts saved since the last refresh
+
+        Rebuilds from scratch if the store lost posts (e.g. to retention).
+        The version is read before the posts, so the index holds at least
+        everything saved up to the version returned.
+
+        Returns:
+            int: Store version the index is now up to date with
+        """
+        # Nothing was saved or deleted since the last refresh
+        version = self.store.version()
+        if version == self._version:
+            return version
+
+        posts = self.store.changed_since(self._watermark)
+        with self._lock:
+            # Posts saved exactly at the watermark were already indexed last time
+            posts = [
+                post for post in posts
+                if post.id not in self._positions or (post.timestamp or 0) > self._watermark
+            ]
+            if posts:
+                self._add(posts)
+                self._watermark = max(post.timestamp or 0 for post in posts)
+            stale = len(self) != len(self.store)
+        if stale:
+            logger.info("Post index out of sync with the store, rebuilding")
+            with self._lock:
+                self._clear()
+                posts = self.store.changed_since(None)
+                self._add(posts)
+                self._watermark = max((post.timestamp or 0 for post in posts), default=None)
+        self._version = version
+        return version
+
+    def select(self, since=None, until=None, categories=None, sentiment=None, negative_only=False,
+               sources=None, limit=None, offset=0):
+        """
+        Find posts matching the filters, newest published first
+
+        Takes the same filters as PostStore.query().
+
+        Returns:
+            numpy.ndarray or slice: Rows of the matching posts, for frame()
+        """
+        with self._lock:
+            count = len(self)
+            mask = self._mask(since, until, categories, sentiment, negative_only, sources)
+
+        stop = None if limit is None else offset + limit
+        if mask is None:
+            # Unfiltered: a slice of the reversed order, no row numbers materialized
+            first = count - offset
+            last = 0 if stop is None else max(count - stop, 0)
+            if first <= last:
+                return slice(0, 0)
+            return slice(first - 1, last - 1 if last > 0 else None, -1)
+        return np.flatnonzero(mask)[::-1][offset:stop]
+
+    def count(self, since=None, until=None, categories=None, sentiment=None, negative_only=False,
+              sources=None):
+        """Count indexed posts matching the same filters as select()"""
+        with self._lock:
+            mask = self._mask(since, until, categories, sentiment, negative_only, sources)
+            return len(self) if mask is None else int(np.count_nonzero(mask))
+
+    def frame(self, rows):
+        """
+        Build a DataFrame of indexed fields for the selected rows
+
+        Args:
+            rows (numpy.ndarray or slice): Output of select()
+
+        Returns:
+            pandas.DataFrame: Columns id, title, category, source, sentiment, score,
+                published and is_negative
+        """
+        with self._lock:
+            columns = {name: column[rows] for name, column in self._columns.items()}
+            values = {name: np.array(self._values[name] or [None], dtype=object) for name in self._values}
+
+        return pd.DataFrame({
+            'id': columns['id'],
+            'title': columns['title'],
+            'category': values['category'][columns['category']],
+            'source': values['source'][columns['source']],
+            'sentiment': values['label'][columns['label']],
+            'score': columns['score'],
+            'published': columns['published'],
+            'is_negative': columns['is_negative']
+        }, copy=False)
+
+    def _mask(self, since, until, categories, sentiment, negative_only, sources):
+        """Build the boolean row mask for a set of filters, or None if nothing is filtered"""
+        columns = self._columns
+        mask = None
+
+        def both(condition):
+            return condition if mask is None else mask & condition
+
+        if since is not None or until is not None:
+            # Rows are sorted by published time, so a time range is a contiguous run
+            start = np.searchsorted(columns['published'], since, side='right') if since is not None else 0
+            end = np.searchsorted(columns['published'], until, side='right') if until is not None else len(self)
+            mask = np.zeros(len(self), dtype=np.bool_)
+            mask[start:end] = True
+        if categories:
+            mask = both(np.isin(columns['category'], self._lookup('category', categories)))
+        if sentiment in SENTIMENT_MASKS:
+            mask = both(SENTIMENT_MASKS[sentiment](columns['score']))
+        if negative_only:
+            mask = both(columns['is_negative'])
+        if sources:
+            mask = both(np.isin(columns['source'], self._lookup('source', sources)))
+        return mask
+
+    def _add(self, posts):
+        """Merge posts into the columns, keeping them sorted by published time"""
+        # Posts saved again (reprocessed) replace their old row
+        replaced = [self._positions[post.id] for post in posts if post.id in self._positions]
+        if replaced:
+            keep = np.ones(len(self), dtype=np.bool_)
+            keep[replaced] = False
+            self._columns = {name: column[keep] for name, column in self._columns.items()}
+
+        latest = {post.id: post for post in posts}  # last write wins within a batch
+        new = self._to_columns(list(latest.values()))
+        order = np.argsort(new['published'], kind='stable')
+        new = {name: column[order] for name, column in new.items()}
+
+        appended = not replaced and (len(self) == 0 or new['published'][0] >= self._columns['published'][-1])
+        merged = {name: np.concatenate((self._columns[name], new[name])) for name in _COLUMNS}
+        if appended:
+            # The usual case: everything new was published after everything indexed
+            start = len(self)
+            self._columns = merged
+            for offset, post_id in enumerate(new['id']):
+                self._positions[post_id] = start + offset
+        else:
+            order = np.argsort(merged['published'], kind='stable')
+            self._columns = {name: column[order] for name, column in merged.items()}
+            self._positions = {post_id: row for row, post_id in enumerate(self._columns['id'])}
+
+    def _to_columns(self, posts):
+        """Convert Post records into column arrays"""
+        sentiments = [post.sentiment for post in posts]
+        return {
+            'published': np.fromiter((post.published for post in posts), dtype=np.float64, count=len(posts)),
+            'score': np.fromiter((s.score if s else 0.0 for s in sentiments), dtype=np.float32, count=len(posts)),
+            'category': self._encode('category', [post.category or 'Other' for post in posts]),
+            'label': self._encode('label', [s.label if s else 'NEUTRAL' for s in sentiments]),
+            'source': self._encode('source', [post.source for post in posts]),
+            'is_negative': np.fromiter((bool(s and s.is_negative) for s in sentiments), dtype=np.bool_,
+                                       count=len(posts)),
+            'id': np.array([post.id for post in posts], dtype=object),
+            'title': np.array([post.title for post in posts], dtype=object)
+        }
+
+    def _encode(self, name, values):
+        """Map strings to their int codes, adding codes for values not seen before"""
+        codes = self._codes[name]
+        for value in values:
+            if value not in codes:
+                codes[value] = len(self._values[name])
+                self._values[name].append(value)
+        return np.array([codes[value] for value in values], dtype=_COLUMNS[name])
+
+    def _lookup(self, name, values):
+        """Codes of known values; unknown values can't match any row"""
+        return [self._codes[name][value] for value in values if value in self._codes[name]]
+
+    def _clear(self):
+        """Drop every indexed post"""
+        self._columns = {name: np.empty(0, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self._positions = {}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_post_index():
+    """
+    Get the process-wide post index over the shared post store
+
+    Returns:
+        PostIndex: The shared index, refreshed from the store
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = PostIndex()
+                index.refresh()
+                logger.info(f"Indexed {len(index)} stored posts")
+                _index = index
+    return _index
@@ -0,0 +1,286 @@
+import os
+import json
+import time
+import pickle
+import sqlite3
+import logging
+import threading
+import config
+from models import Post
+
+logger = logging.getLogger("sentiment_agent")
+
+# Score bands used by the dashboard's sentiment filter
+SENTIMENT_FILTERS = {
+    "Positive": "score > 0.1",
+    "Negative": "score < -0.1",
+    "Neutral": "score BETWEEN -0.1 AND 0.1"
+}
+
+
+class PostStore:
+    """
+    SQLite-backed post storage with upserts by post id
+
+    Each post is stored as JSON next to indexed columns for published time,
+    category and sentiment score, so the dashboard and burst detection can
+    query a slice of history without loading all of it.
+    """
+
+    def __init__(self, db_path=None):
+        """
+        Args:
+            db_path (str, optional): SQLite file, defaults to config.POSTS_DB_PATH
+        """
+        self.db_path = db_path or config.POSTS_DB_PATH
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS posts (
+                id TEXT PRIMARY KEY,
+                published_ts REAL NOT NULL,
+                processed_ts REAL,
+                category TEXT,
+                score REAL,
+                is_negative INTEGER NOT NULL DEFAULT 0,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_posts_published ON posts (published_ts);
+            CREATE INDEX IF NOT EXISTS idx_posts_category_published ON posts (category, published_ts);
+            CREATE INDEX IF NOT EXISTS idx_posts_score ON posts (score);
+            CREATE INDEX IF NOT EXISTS idx_posts_processed ON posts (processed_ts);
+            CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO store_meta (key, value) VALUES ('version', 0);
+        """)
+        # Databases created before posts were tagged with their source lack the column
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(posts)")}
+        if 'source' not in columns:
+            self._db.execute("ALTER TABLE posts ADD COLUMN source TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_posts_source_published ON posts (source, published_ts)")
+        self._db.commit()
+
+    def __contains__(self, post_id):
+        """Check whether a post id is already stored (lets the store act as seen_ids)"""
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM posts WHERE id = ?", (post_id,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def upsert(self, posts):
+        """
+        Insert posts, replacing any stored post with the same id
+
+        Args:
+            posts (list): Post records
+        """
+        rows = []
+        for post in posts:
+            sentiment = post.sentiment
+            rows.append((
+                post.id,
+                post.published,
+                post.timestamp,
+                post.category,
+                sentiment.score if sentiment is not None else 0,
+                int(sentiment is not None and bool(sentiment.is_negative)),
+                post.source,
+                json.dumps(post.to_dict())
+            ))
+
+        if not rows:
+            return
+
+        with self._lock:
+            self._db.executemany("""
+                INSERT INTO posts (id, published_ts, processed_ts, category, score, is_negative, source, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    published_ts = excluded.published_ts,
+                    processed_ts = excluded.processed_ts,
+                    category = excluded.category,
+                    score = excluded.score,
+                    is_negative = excluded.is_negative,
+                    source = excluded.source,
+                    data = excluded.data
+            """, rows)
+            self._bump_version()
+            self._db.commit()
+        logger.info(f"Saved {len(rows)} posts to storage")
+
+    def get(self, post_id):
+        """Get a stored post by id, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT data FROM posts WHERE id = ?", (post_id,)).fetchone()
+        return Post.from_dict(json.loads(row[0])) if row else None
+
+    def query(self, since=None, until=None, categories=None, sentiment=None, negative_only=False,
+              sources=None, limit=None, offset=0):
+        """
+        Query stored posts, newest published first
+
+        Args:
+            since (float, optional): Only posts published after this Unix timestamp
+            until (float, optional): Only posts published at or before this Unix timestamp
+            categories (list, optional): Only posts in these categories
+            sentiment (str, optional): "Positive", "Negative" or "Neutral" score band
+            negative_only (bool): Only posts flagged is_negative
+            sources (list, optional): Only posts from these sources (e.g. "r/boston")
+            limit (int, optional): Maximum number of posts to return
+            offset (int): Number of matching posts to skip
+
+        Returns:
+            list: Post records
+        """
+        where, params = self._where(since, until, categories, sentiment, negative_only, sources)
+        sql = f"SELECT data FROM posts{where} ORDER BY published_ts DESC"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [Post.from_dict(json.loads(row[0])) for row in rows]
+
+    def count(self, since=None, until=None, categories=None, sentiment=None, negative_only=False,
+              sources=None):
+        """Count stored posts matching the same filters as query()"""
+        where, params = self._where(since, until, categories, sentiment, negative_only, sources)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM posts{where}", params).fetchone()[0]
+
+    def version(self):
+        """
+        Get a counter that changes whenever posts are saved or deleted
+
+        The counter lives in the database, so it also reflects writes made by
+        other processes such as the headless worker.
+
+        Returns:
+            int: Current version
+        """
+        with self._lock:
+            return self._db.execute("SELECT value FROM store_meta WHERE key = 'version'").fetchone()[0]
+
+    def changed_since(self, processed_ts=None):
+        """
+        Get posts saved at or after a processing time, oldest first
+
+        Args:
+            processed_ts (float, optional): Unix time to start from, None returns every post
+
+        Returns:
+            list: Post records
+        """
+        if processed_ts is None:
+            sql, params = "SELECT data FROM posts ORDER BY processed_ts", []
+        else:
+            sql, params = "SELECT data FROM posts WHERE processed_ts >= ? ORDER BY processed_ts", [processed_ts]
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [Post.from_dict(json.loads(row[0])) for row in rows]
+
+    def last_processed_time(self):
+        """Get the Unix time the most recently processed post was saved, or None"""
+        with self._lock:
+            return self._db.execute("SELECT MAX(processed_ts) FROM posts").fetchone()[0]
+
+    def apply_retention(self, days=None):
+        """
+        Delete posts published more than a number of days ago
+
+        Args:
+            days (float, optional): Retention period, defaults to config.POSTS_RETENTION_DAYS
+                (0 or None keeps everything)
+
+        Returns:
+            int: Number of posts deleted
+        """
+        days = config.POSTS_RETENTION_DAYS if days is None else days
+        if not days:
+            return 0
+
+        cutoff = time.time() - days * 86400
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM posts WHERE published_ts < ?", (cutoff,)).rowcount
+            if deleted:
+                self._bump_version()
+            self._db.commit()
+        if deleted:
+            logger.info(f"Removed {deleted} posts older than {days} days")
+        return deleted
+
+    def import_pickle(self, path):
+        """
+        Import posts from the legacy pickle file if the store is still empty
+
+        Args:
+            path (str): Path of the old posts_data.pickle file
+
+        Returns:
+            int: Number of posts imported
+        """
+        if not os.path.exists(path) or len(self) > 0:
+            return 0
+        try:
+            with open(path, "rb") as f:
+                posts = pickle.load(f)
+        except Exception as e:
+            logger.error(f"Error importing legacy post data: {str(e)}")
+            return 0
+
+        self.upsert([Post.from_dict(post) for post in posts if post.get('id')])
+        logger.info(f"Imported {len(posts)} posts from {path}")
+        return len(posts)
+
+    def _bump_version(self):
+        """Increment the version counter; called inside the writing transaction"""
+        self._db.execute("UPDATE store_meta SET value = value + 1 WHERE key = 'version'")
+
+    def _where(self, since, until, categories, sentiment, negative_only, sources=None):
+        """Build the WHERE clause and parameters shared by query() and count()"""
+        clauses = []
+        params = []
+        if since is not None:
+            clauses.append("published_ts > ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("published_ts <= ?")
+            params.append(until)
+        if categories:
+            clauses.append(f"category IN ({','.join('?' * len(categories))})")
+            params.extend(categories)
+        if sentiment in SENTIMENT_FILTERS:
+            clauses.append(SENTIMENT_FILTERS[sentiment])
+        if negative_only:
+            clauses.append("is_negative = 1")
+        if sources:
+            clauses.append(f"source IN ({','.join('?' * len(sources))})")
+            params.extend(sources)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_post_store():
+    """
+    Get the process-wide post store, importing the legacy pickle on first use
+
+    Returns:
+        PostStore: The shared store
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = PostStore()
+                store.import_pickle(config.LEGACY_POSTS_FILE)
+                _store = store
+    return _store
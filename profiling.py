@@ -0,0 +1,436 @@
+import io
+import os
+import sys
+import glob
+import time
+import pstats
+import cProfile
+import logging
+import functools
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+import config
+
+logger = logging.getLogger("sentiment_agent")
+
+# "sections" times each hot path and its phases (tokenize, forward, postprocess);
+# "sampling" adds periodic stack samples, "cprofile" a deterministic profile and
+# "torch" torch.profiler operator statistics of every hot path call
+PROFILING_MODES = ("off", "sections", "sampling", "cprofile", "torch")
+
+_NULL_SECTION = nullcontext()
+
+# Code of the profiled() wrappers; sampled stacks are cut off there
+_hot_path_codes = set()
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _function_label(key):
+    filename, line, name = key
+    if filename == "~":
+        return name  # Built-in function, e.g. "<built-in method torch._C._nn.linear>"
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class CycleProfiler:
+    """
+    Profiles the hot inference paths, one fetch cycle at a time
+
+    Hot paths are the methods decorated with profiled(); section() blocks
+    inside them split their time into phases. Whatever the mode, each cycle
+    gets a summary with the time per hot path and phase plus the top
+    hotspots the mode can see, written to config.PROFILING_DIR.
+    """
+
+    def __init__(self, mode, output_dir, sample_interval=None, top_n=None, keep=None):
+        """
+        Args:
+            mode (str): One of PROFILING_MODES other than "off"
+            output_dir (str): Directory the cycle profiles are written to
+            sample_interval (float, optional): Seconds between stack samples,
+                defaults to config.PROFILING_SAMPLE_INTERVAL
+            top_n (int, optional): Hotspots per summary, defaults to config.PROFILING_TOP_N
+            keep (int, optional): Newest cycle profiles kept, defaults to config.PROFILING_KEEP
+        """
+        self.mode = mode
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval or config.PROFILING_SAMPLE_INTERVAL
+        self.top_n = top_n or config.PROFILING_TOP_N
+        self.keep = keep or config.PROFILING_KEEP
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._active = {}  # Thread ident -> hot path it is in, for the sampler
+        self._wake = threading.Event()
+        self._sampler = None
+        self._torch_lock = threading.Lock()  # torch.profiler runs one session at a time
+        self._reset()
+
+    def _reset(self):
+        """Start collecting a new cycle (caller holds the lock or owns the profiler)"""
+        self.started = time.time()
+        self.timings = {}  # Hot path or section name -> [calls, seconds]
+        self.samples = Counter()  # (hot path, outermost frame, ..., innermost frame) -> samples
+        self.stats = None  # Merged pstats.Stats of every cProfile capture
+        self.operators = {}  # torch operator -> [calls, self CPU us, total CPU us]
+
+    def _record(self, name, seconds):
+        with self._lock:
+            entry = self.timings.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    @contextmanager
+    def hot_path(self, name):
+        """
+        Time a hot path call and capture it with the configured profiler
+
+        Nested hot paths (e.g. the embedder inside the categorizer) are timed
+        too, but only the outermost call starts a capture.
+        """
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        capture = self._start_capture(name) if depth == 0 else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - start)
+            if depth == 0:
+                self._stop_capture(capture)
+            self._local.depth = depth
+
+    def section(self, name):
+        """Time one phase of a hot path, e.g. "sentiment.forward" """
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            if self.mode == "torch":
+                import torch
+                # Labels the phase in torch.profiler's operator table
+                with torch.profiler.record_function(name):
+                    yield
+            else:
+                yield
+        finally:
+            self._record(name, time.perf_counter() - start)
+
+    def _start_capture(self, name):
+        if self.mode == "sampling":
+            with self._lock:
+                self._active[threading.get_ident()] = name
+                self._wake.set()
+            self._ensure_sampler()
+            return None
+
+        if self.mode == "cprofile":
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one active cProfile per process; this call goes unprofiled
+                return None
+            return profile
+
+        if self.mode == "torch":
+            if not self._torch_lock.acquire(blocking=False):
+                return None
+            try:
+                import torch
+                profile = torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU])
+                profile.__enter__()
+                return profile
+            except Exception as e:
+                self._torch_lock.release()
+                logger.warning(f"torch.profiler capture failed: {str(e)}")
+                return None
+
+        return None
+
+    def _stop_capture(self, capture):
+        if self.mode == "sampling":
+            with self._lock:
+                self._active.pop(threading.get_ident(), None)
+            return
+
+        if capture is None:
+            return
+
+        if self.mode == "cprofile":
+            capture.disable()
+            stats = pstats.Stats(capture, stream=io.StringIO())
+            with self._lock:
+                if self.stats is None:
+                    self.stats = stats
+                else:
+                    self.stats.add(stats)
+
+        elif self.mode == "torch":
+            try:
+                capture.__exit__(None, None, None)
+                averages = capture.key_averages()
+            finally:
+                self._torch_lock.release()
+            with self._lock:
+                for event in averages:
+                    entry = self.operators.setdefault(event.key, [0, 0.0, 0.0])
+                    entry[0] += event.count
+                    entry[1] += event.self_cpu_time_total
+                    entry[2] += event.cpu_time_total
+
+    def _ensure_sampler(self):
+        if self._sampler is not None:
+            return
+        with self._lock:
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="profiling-sampler", daemon=True)
+                self._sampler.start()
+
+    def _sample_loop(self):
+        """Record the stacks of threads inside a hot path every sample_interval seconds"""
+        while True:
+            with self._lock:
+                active = dict(self._active)
+                if not active:
+                    # Sleep until a hot path starts instead of polling while idle
+                    self._wake.clear()
+            if not active:
+                self._wake.wait()
+                continue
+
+            frames = sys._current_frames()
+            stacks = []
+            for ident, name in active.items():
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None and frame.f_code not in _hot_path_codes:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    stacks.append((name,) + tuple(reversed(stack)))
+            del frames
+            with self._lock:
+                self.samples.update(stacks)
+            time.sleep(self.sample_interval)
+
+    def begin_cycle(self):
+        """Drop anything captured since the last cycle, e.g. by dashboard calls"""
+        with self._lock:
+            self._reset()
+
+    def end_cycle(self, label="cycle"):
+        """
+        Write the profile of the cycle that just ended and start a new one
+
+        Args:
+            label (str): File name prefix, e.g. "cycle"
+
+        Returns:
+            str: Path of the summary, or None if no hot path ran during the cycle
+        """
+        with self._lock:
+            started, timings, samples = self.started, self.timings, self.samples
+            stats, operators = self.stats, self.operators
+            self._reset()
+        if not timings:
+            return None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.fromtimestamp(started).strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(self.output_dir, f"{label}-{stamp}-{os.getpid()}")
+
+        hotspots = self._hotspots(samples, stats, operators)
+        with open(f"{base}.txt", "w") as f:
+            f.write(self._render(started, timings, hotspots, samples))
+        if stats is not None:
+            # Loadable with pstats, snakeviz or similar
+            stats.dump_stats(f"{base}.prof")
+        if samples:
+            # Collapsed stacks, the input format of flamegraph.pl and speedscope
+            with open(f"{base}.folded", "w") as f:
+                for stack, hits in samples.most_common():
+                    f.write(f"{';'.join(stack)} {hits}\n")
+        self._prune()
+
+        top = ", ".join(hotspot for hotspot, _, _, _ in hotspots[1][:3]) if hotspots else ""
+        logger.info(f"Wrote {self.mode} profile to {base}.txt" + (f"; top hotspots: {top}" if top else ""))
+        return f"{base}.txt"
+
+    def _hotspots(self, samples, stats, operators):
+        """
+        Rank the functions or operators the mode captured
+
+        Returns:
+            tuple: (heading, rows) with rows as (label, own, total, calls), or None
+        """
+        if samples:
+            total = sum(samples.values())
+            own, inclusive = Counter(), Counter()
+            for stack, hits in samples.items():
+                own[stack[-1]] += hits
+                for frame in set(stack[1:]):
+                    inclusive[frame] += hits
+            rows = [
+                (frame, 100.0 * hits / total, 100.0 * inclusive[frame] / total, None)
+                for frame, hits in own.most_common(self.top_n)
+            ]
+            return f"{total} samples every {self.sample_interval * 1000:g} ms (own %, total %)", rows
+
+        if stats is not None:
+            ranked = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)
+            rows = [(_function_label(key), tottime, cumtime, calls) for key, (_, calls, tottime, cumtime, _) in ranked]
+            return "cProfile (own s, cumulative s, calls)", rows[:self.top_n]
+
+        if operators:
+            ranked = sorted(operators.items(), key=lambda item: item[1][1], reverse=True)
+            rows = [(key, own / 1e6, total / 1e6, calls) for key, (calls, own, total) in ranked]
+            return "torch.profiler CPU time (own s, total s, calls)", rows[:self.top_n]
+
+        return None
+
+    def _render(self, started, timings, hotspots, samples):
+        lines = [
+            f"Profile of the cycle started {datetime.fromtimestamp(started):%Y-%m-%d %H:%M:%S} "
+            f"({time.time() - started:.1f} s, mode {self.mode})",
+            "",
+            f"{'Hot path / phase':<32} {'calls':>7} {'seconds':>10} {'share':>7}",
+        ]
+        for name in sorted(name for name in timings if "." not in name):
+            calls, seconds = timings[name]
+            lines.append(f"{name:<32} {calls:>7} {seconds:>10.3f} {100.0:>6.1f}%")
+            phases = sorted(key for key in timings if key.startswith(f"{name}."))
+            for phase in phases:
+                phase_calls, phase_seconds = timings[phase]
+                share = 100.0 * phase_seconds / seconds if seconds else 0.0
+                lines.append(f"  {phase:<30} {phase_calls:>7} {phase_seconds:>10.3f} {share:>6.1f}%")
+            if phases:
+                # Cache lookups, bookkeeping and nested hot paths
+                other = max(seconds - sum(timings[phase][1] for phase in phases), 0.0)
+                share = 100.0 * other / seconds if seconds else 0.0
+                lines.append(f"  {'(other)':<30} {'':>7} {other:>10.3f} {share:>6.1f}%")
+
+        if hotspots:
+            heading, rows = hotspots
+            lines += ["", f"Top {len(rows)} hotspots by own time, {heading}:"]
+            for label, own, total, calls in rows:
+                calls = "" if calls is None else calls
+                lines.append(f"  {own:>10.3f} {total:>10.3f} {calls:>9}  {label}")
+
+        if samples:
+            lines += ["", "Samples per hot path:"]
+            per_path = Counter()
+            for stack, hits in samples.items():
+                per_path[stack[0]] += hits
+            for name, hits in per_path.most_common():
+                lines.append(f"  {name:<30} {hits:>7}")
+        return "\n".join(lines) + "\n"
+
+    def _prune(self):
+        """Delete all but the newest self.keep cycle profiles"""
+        summaries = sorted(glob.glob(os.path.join(self.output_dir, "*.txt")), key=os.path.getmtime)
+        for summary in summaries[:-self.keep]:
+            base = summary[:-len(".txt")]
+            for path in (summary, f"{base}.prof", f"{base}.folded"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+_profiler = None
+_profiler_ready = False
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    """
+    Get the process-wide profiler
+
+    Returns:
+        CycleProfiler: The profiler, or None when config.PROFILING_MODE is "off"
+    """
+    global _profiler, _profiler_ready
+    if not _profiler_ready:
+        with _profiler_lock:
+            if not _profiler_ready:
+                mode = config.PROFILING_MODE
+                if mode not in PROFILING_MODES:
+                    logger.warning(f"Unknown profiling mode '{mode}', profiling is off")
+                    mode = "off"
+                if mode != "off":
+                    _profiler = CycleProfiler(mode, config.PROFILING_DIR)
+                    logger.info(f"Profiling hot inference paths ({mode}), writing to {config.PROFILING_DIR}")
+                _profiler_ready = True
+    return _profiler
+
+
+def profiled(name):
+    """
+    Mark a method as a hot path
+
+    With profiling off the method is returned unchanged, so there is no
+    overhead at all; the mode is read once, when the decorated module is imported.
+
+    Args:
+        name (str): Hot path name; its section() names start with "<name>."
+
+    Returns:
+        callable: Decorator
+    """
+    def decorate(fn):
+        if get_profiler() is None:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with get_profiler().hot_path(name):
+                return fn(*args, **kwargs)
+
+        _hot_path_codes.add(wrapper.__code__)
+        return wrapper
+
+    return decorate
+
+
+def section(name):
+    """
+    Time one phase of a hot path
+
+    Args:
+        name (str): "<hot path>.<phase>", e.g. "sentiment.tokenize"
+
+    Returns:
+        contextmanager: Records the phase's time on exit (does nothing with profiling off)
+    """
+    profiler = get_profiler()
+    return profiler.section(name) if profiler is not None else _NULL_SECTION
+
+
+@contextmanager
+def profile_cycle(label="cycle"):
+    """
+    Profile the hot paths run inside a with-block as one cycle
+
+    Args:
+        label (str): File name prefix of the cycle's profile
+    """
+    profiler = get_profiler()
+    if profiler is None:
+        yield
+        return
+
+    profiler.begin_cycle()
+    try:
+        yield
+    finally:
+        try:
+            profiler.end_cycle(label)
+        except OSError as e:
+            logger.warning(f"Could not write profile to {profiler.output_dir}: {str(e)}")
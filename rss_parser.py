@@ -4,15 +4,55 @@ import json
 import config
 import requests
 import logging
-from datetime import datetime
+from urllib.parse import urlsplit
+from listing_stream import ListingPage
+from metrics import count, ERRORS_TOTAL
+from models import Post
 
 logger = logging.getLogger("sentiment_agent")
 
+def source_name(api_url):
+    """
+    Get a short display name for a listing URL
+    
+    Args:
+        api_url (str): Reddit JSON listing URL, or None for sample data
+        
+    Returns:
+        str: e.g. "r/boston" for https://www.reddit.com/r/boston/new.json
+    """
+    if not api_url:
+        return config.DEFAULT_SOURCE_NAME
+    match = re.search(r"/r/([^/.?]+)", api_url)
+    return f"r/{match.group(1)}" if match else urlsplit(api_url).netloc
+
 class RedditRSSParser:
-    def __init__(self):
+    def __init__(self, api_url=None, rate_limiter=None):
+        """
+        Args:
+            api_url (str, optional): Listing URL, defaults to config.REDDIT_JSON_URL
+            rate_limiter (RateLimiter, optional): Shared limiter consulted before every request
+        """
         self.user_agent = config.USER_AGENT
-        self.api_url = config.REDDIT_JSON_URL if hasattr(config, 'REDDIT_JSON_URL') else None
+        self.api_url = api_url or (config.REDDIT_JSON_URL if hasattr(config, 'REDDIT_JSON_URL') else None)
+        self.source = source_name(self.api_url)
+        self.rate_limiter = rate_limiter
         self.headers = {'User-Agent': self.user_agent}
+        
+        # Keep-alive session so consecutive polls and pages reuse one connection
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        
+        # Where backfill continues when a poll stopped at config.REDDIT_MAX_PAGES
+        # before reaching seen posts (a Reddit fullname), None when there's no gap
+        self.after = None
+        
+        # Validators from the last first-page response for conditional requests
+        self.etag = None
+        self.last_modified = None
+        
+        # Only a listing sorted by new guarantees nothing new sits behind a seen post
+        self.sorted_by_new = bool(self.api_url) and "/new" in urlsplit(self.api_url).path
     
     def get_new_posts(self, seen_ids=None, limit=None):
         """
@@ -23,8 +63,17 @@ class RedditRSSParser:
             limit (int, optional): Maximum number of posts to return
             
         Returns:
-            list: List of post dictionaries
+            list: List of Post records
         """
+        posts = self._get_new_posts(seen_ids, limit)
+        
+        # Tag every post with where it came from so later stages can partition by source
+        for post in posts:
+            post.source = self.source
+        return posts
+    
+    def _get_new_posts(self, seen_ids=None, limit=None):
+        """Get new posts from the API or sample data, see get_new_posts()"""
         if seen_ids is None:
             seen_ids = set()
         
@@ -56,7 +105,7 @@ class RedditRSSParser:
             limit (int, optional): Maximum number of posts to return
             
         Returns:
-            list: List of sample post dictionaries
+            list: List of sample Post records
         """
         if seen_ids is None:
             seen_ids = set()
@@ -106,7 +155,7 @@ class RedditRSSParser:
         ]
         
         # Filter out seen posts
-        new_posts = [post for post in sample_posts if post['id'] not in seen_ids]
+        new_posts = [Post.from_dict(post) for post in sample_posts if post['id'] not in seen_ids]
         
         # Apply limit if provided
         if limit and len(new_posts) > limit:
@@ -117,7 +166,18 @@ class RedditRSSParser:
     
     def _fetch_json_posts(self, seen_ids, limit=None):
         """
-        Fetch posts using Reddit JSON API
+        Fetch new posts using Reddit JSON API, newest first
+        
+        The first page is requested conditionally (ETag/If-Modified-Since), so
+        an unchanged listing costs one small request. On listings sorted by new,
+        pages are walked with the "after" cursor until the first already-seen
+        post or config.REDDIT_MAX_PAGES. Other listings (hot, top, ...) are not in
+        time order, so only their first page is read and seen posts are skipped.
+        If the walk stops at the page limit, the rest is left to backfill().
+        
+        The validators are only saved once the walk succeeds. If it fails part
+        way, the posts read so far are returned and the next poll asks for the
+        listing again instead of getting 304 for posts it never saw.
         
         Args:
             seen_ids (set): Set of already seen post IDs
@@ -126,92 +186,232 @@ class RedditRSSParser:
         Returns:
             list: List of processed posts
         """
+        posts = []
         try:
-            response = requests.get(self.api_url, headers=self.headers, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            after = None
+            validators = None
+            max_pages = config.REDDIT_MAX_PAGES if self.sorted_by_new else 1
             
-            if not isinstance(data, dict) or 'data' not in data or 'children' not in data.get('data', {}):
-                logger.error(f"Unexpected JSON structure: {str(data)[:100]}...")
-                return []
-            
-            posts = []
-            for child in data.get('data', {}).get('children', []):
+            for page in range(max_pages):
+                # Small first page for cheap polls, full pages once we know there's more
+                page_size = config.REDDIT_POLL_PAGE_SIZE if page == 0 else config.REDDIT_PAGE_SIZE
+                listing, page_validators = self._fetch_listing_page(page_size, after=after, conditional=page == 0)
+                if listing is None:
+                    logger.info("Reddit listing not modified since last poll")
+                    return []
+                if page == 0:
+                    validators = page_validators
+                
+                reached_seen = False
                 try:
-                    if not isinstance(child, dict) or 'data' not in child:
-                        continue
+                    # Streamed pages are decoded post by post, so stopping early skips the rest
+                    for post_data in listing:
+                        post_id = post_data.get('id')
+                        if not post_id:
+                            continue
                         
-                    post_data = child.get('data', {})
-                    
-                    # Skip if we've seen this post already
-                    post_id = post_data.get('id')
-                    if not post_id or post_id in seen_ids:
-                        continue
-                    
-                    # Extract key information
-                    title = html.unescape(post_data.get('title', ''))
-                    selftext = html.unescape(post_data.get('selftext', ''))
-                    created_utc = post_data.get('created_utc', 0)
-                    permalink = post_data.get('permalink', '')
-                    url = post_data.get('url', '')
-                    
-                    # Format the datetime 
-                    date_str = datetime.fromtimestamp(created_utc).isoformat()
-                    
-                    # Extract image URLs if any
-                    image_urls = []
-                    
-                    # Check for gallery
-                    if post_data.get('is_gallery', False) and 'gallery_data' in post_data:
-                        media_metadata = post_data.get('media_metadata', {})
-                        for item in post_data['gallery_data'].get('items', []):
-                            media_id = item.get('media_id')
-                            if media_id and media_id in media_metadata:
-                                # 's' is a dictionary, not a list
-                                s_data = media_metadata[media_id].get('s', {})
-                                if 'u' in s_data:
-                                    image_urls.append(s_data['u'])
-                    
-                    # Check for preview images
-                    elif 'preview' in post_data and 'images' in post_data['preview']:
-                        for image in post_data['preview']['images']:
-                            if 'source' in image and 'url' in image['source']:
-                                # Make sure to unescape HTML entities in URLs
-                                image_url = html.unescape(image['source']['url'])
-                                # Reddit preview URLs sometimes need special handling
-                                if "preview.redd.it" in image_url:
-                                    logger.info(f"Found Reddit preview image: {image_url}")
-                                image_urls.append(image_url)
-                    
-                    # Check if the URL itself is an image
-                    elif self.is_image_url(url):
-                        image_urls.append(url)
-                    
-                    # Create post dictionary
-                    post = {
-                        'id': post_id,
-                        'title': title,
-                        'content': selftext,
-                        'link': f"https://www.reddit.com{permalink}",
-                        'published': date_str,
-                        'image_urls': image_urls
-                    }
-                    
-                    posts.append(post)
-                    
-                except Exception as e:
-                    logger.error(f"Error processing post: {str(e)}")
-            
-            # Apply limit if provided
-            if limit and len(posts) > limit:
-                posts = posts[:limit]
+                        # Skip if we've seen this post already
+                        if post_id in seen_ids:
+                            # Only /new is in time order, so only there does a seen post mean we've
+                            # caught up. Pinned posts stay at the top, so they never do
+                            if self.sorted_by_new and not post_data.get('stickied', False):
+                                reached_seen = True
+                                break
+                            continue
+                        
+                        try:
+                            posts.append(self._extract_post(post_data))
+                        except Exception as e:
+                            logger.error(f"Error processing post: {str(e)}")
+                            count(ERRORS_TOTAL, component="parse")
+                        
+                        if limit and len(posts) >= limit:
+                            break
+                finally:
+                    listing.close()
                 
+                after = listing.after
+                if reached_seen or not after or (limit and len(posts) >= limit):
+                    break
+            else:
+                if self.sorted_by_new:
+                    # Hit the page limit with unseen posts left: backfill() picks up from here
+                    logger.info(f"Stopped after {max_pages} pages of {self.source}, leaving the rest to backfill")
+                    self.after = after
+            
+            self.etag, self.last_modified = validators
             logger.info(f"Fetched {len(posts)} new posts from Reddit JSON API")
             return posts
             
         except Exception as e:
             logger.error(f"Error in JSON fetching: {str(e)}")
+            count(ERRORS_TOTAL, component="fetch")
+            return posts
+    
+    @property
+    def needs_backfill(self):
+        """Whether a poll stopped at the page limit and left unseen posts behind"""
+        return self.after is not None
+    
+    def backfill(self, seen_ids=None, pages=None):
+        """
+        Read the posts a poll skipped by stopping at config.REDDIT_MAX_PAGES
+        
+        Continues from the saved "after" cursor until the first already-seen
+        post or the end of the listing, which clears the cursor. If the page
+        limit is hit again, the cursor moves on so the next call continues.
+        
+        Args:
+            seen_ids (set, optional): Set of already seen post IDs
+            pages (int, optional): Maximum pages to read, defaults to config.REDDIT_MAX_PAGES
+            
+        Returns:
+            list: Unseen posts from the older pages
+        """
+        if seen_ids is None:
+            seen_ids = set()
+        if not self.api_url or self.after is None:
             return []
+        
+        posts = []
+        for _ in range(pages or config.REDDIT_MAX_PAGES):
+            reached_seen = False
+            try:
+                listing, _validators = self._fetch_listing_page(config.REDDIT_PAGE_SIZE, after=self.after)
+                try:
+                    for post_data in listing:
+                        post_id = post_data.get('id')
+                        if not post_id:
+                            continue
+                        if post_id in seen_ids:
+                            if not post_data.get('stickied', False):
+                                reached_seen = True
+                                break
+                            continue
+                        try:
+                            posts.append(self._extract_post(post_data))
+                        except Exception as e:
+                            logger.error(f"Error processing post: {str(e)}")
+                            count(ERRORS_TOTAL, component="parse")
+                finally:
+                    listing.close()
+            except Exception as e:
+                # Keep the cursor so the next backfill retries this page
+                logger.error(f"Error backfilling from Reddit: {str(e)}")
+                count(ERRORS_TOTAL, component="fetch")
+                break
+            
+            self.after = None if reached_seen else listing.after
+            if not self.after:
+                break
+        
+        for post in posts:
+            post.source = self.source
+        logger.info(f"Backfilled {len(posts)} older posts from {self.source}")
+        return posts
+    
+    def _fetch_listing_page(self, page_size, after=None, conditional=False):
+        """
+        Request one page of the listing
+        
+        Args:
+            page_size (int): Number of posts to request
+            after (str, optional): Fullname to continue after
+            conditional (bool): Send the saved ETag/Last-Modified validators
+            
+        Returns:
+            tuple: (listing, validators) where listing is a ListingPage, streamed when
+                config.REDDIT_STREAMING_PARSE is on, or None if the listing was not
+                modified, and validators is the response's (ETag, Last-Modified)
+        """
+        params = {'limit': page_size}
+        if after:
+            params['after'] = after
+        
+        headers = {}
+        if conditional:
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            if self.last_modified:
+                headers['If-Modified-Since'] = self.last_modified
+        
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        stream = config.REDDIT_STREAMING_PARSE
+        response = self.session.get(self.api_url, params=params, headers=headers, timeout=30, stream=stream)
+        if self.rate_limiter is not None:
+            # Back off as Reddit asks via X-Ratelimit-* / Retry-After
+            self.rate_limiter.observe(response.status_code, response.headers)
+        if response.status_code == 304:
+            response.close()
+            return None, (self.etag, self.last_modified)
+        if not response.ok:
+            response.close()
+        response.raise_for_status()
+        
+        # Saved by the caller once the page has been read successfully
+        validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        if stream:
+            return ListingPage(response=response), validators
+        return ListingPage(data=response.json()), validators
+    
+    def _extract_post(self, post_data):
+        """
+        Build a Post from Reddit's post data
+        
+        Args:
+            post_data (dict): The 'data' of one listing child
+            
+        Returns:
+            Post: The post, with its published time as a Unix timestamp
+        """
+        # Extract key information
+        title = html.unescape(post_data.get('title', ''))
+        selftext = html.unescape(post_data.get('selftext', ''))
+        # Kept as a Unix timestamp; sorting and windowing never need to re-parse it
+        created_utc = float(post_data.get('created_utc', 0))
+        permalink = post_data.get('permalink', '')
+        url = post_data.get('url', '')
+        
+        # Extract image URLs if any
+        image_urls = []
+        
+        # Check for gallery
+        if post_data.get('is_gallery', False) and 'gallery_data' in post_data:
+            media_metadata = post_data.get('media_metadata', {})
+            for item in post_data['gallery_data'].get('items', []):
+                media_id = item.get('media_id')
+                if media_id and media_id in media_metadata:
+                    # 's' is a dictionary, not a list
+                    s_data = media_metadata[media_id].get('s', {})
+                    if 'u' in s_data:
+                        image_urls.append(s_data['u'])
+        
+        # Check for preview images
+        elif 'preview' in post_data and 'images' in post_data['preview']:
+            for image in post_data['preview']['images']:
+                if 'source' in image and 'url' in image['source']:
+                    # Make sure to unescape HTML entities in URLs
+                    image_url = html.unescape(image['source']['url'])
+                    # Reddit preview URLs sometimes need special handling
+                    if "preview.redd.it" in image_url:
+                        logger.info(f"Found Reddit preview image: {image_url}")
+                    image_urls.append(image_url)
+        
+        # Check if the URL itself is an image
+        elif self.is_image_url(url):
+            image_urls.append(url)
+        
+        # Create post record
+        return Post(
+            id=post_data.get('id'),
+            title=title,
+            content=selftext,
+            link=f"https://www.reddit.com{permalink}",
+            published=created_utc,
+            image_urls=image_urls,
+            source=self.source
+        )
     
     def is_image_url(self, url):
         """Check if a URL is likely an image"""
@@ -1,18 +1,36 @@
 import logging
 import config
-from transformers import pipeline
+import torch
+from inference_backend import load_text_classifier
+from inference_cache import create_inference_cache
+from models import Post, Sentiment
+from profiling import profiled, section
+from tokenization import SpecialTokens, TokenizedTexts
 
 logger = logging.getLogger("sentiment_agent")
 
 class SentimentAnalyzer:
-    def __init__(self):
+    def __init__(self, threads=None):
+        """
+        Args:
+            threads (int, optional): Intra-op threads for an ONNX backend, defaults to config.ONNX_THREADS
+        """
         # Initialize sentiment analysis pipeline
         logger.info("Initializing sentiment analysis pipeline")
         # Use model configuration from config.py
-        self.sentiment_pipeline = pipeline(
-            "sentiment-analysis",
-            model=config.SENTIMENT_MODEL["name"],
-            revision=config.SENTIMENT_MODEL["revision"]
+        # The backend (torch, onnx or onnx-int8) is chosen per model in config.SENTIMENT_MODEL
+        self.tokenizer, self.model, self.backend = load_text_classifier(
+            config.SENTIMENT_MODEL, "sentiment-analysis", threads=threads
+        )
+        self.special_tokens = SpecialTokens(self.tokenizer)
+        self.max_length = min(self.tokenizer.model_max_length, config.SENTIMENT_MAX_LENGTH)
+        
+        # Cache results so reposted or re-processed text skips inference.
+        # is_negative and truncation depend on these settings, so they're part of the key
+        self.cache = create_inference_cache(
+            config.SENTIMENT_MODEL,
+            backend=self.backend,
+            variant=repr((config.NEGATIVE_THRESHOLD, config.SENTIMENT_MAX_LENGTH))
         )
     
     def analyze(self, title, content):
@@ -24,26 +42,113 @@ class SentimentAnalyzer:
             content (str): The post content
             
         Returns:
-            dict: Sentiment analysis result with keys:
+            Sentiment: Sentiment analysis result with:
                 - score: A float representing sentiment (-1 to 1)
                 - label: Either 'POSITIVE' or 'NEGATIVE'
                 - is_negative: Boolean indicating if the post has negative sentiment
         """
+        return self.analyze_batch([Post(None, title, content)])[0]
+    
+    @profiled("sentiment")
+    def analyze_batch(self, posts, batch_size=None, tokenized=None):
+        """
+        Analyze the sentiment of many posts with batched forward passes
+        
+        Posts are tokenized together, sorted by token length so each batch
+        holds similarly sized inputs, and padded only to the longest input
+        in their batch.
+        
+        Args:
+            posts (list): Post records
+            batch_size (int, optional): Posts per forward pass, defaults to config.SENTIMENT_BATCH_SIZE
+            tokenized (TokenizedTexts, optional): The posts' texts, possibly already tokenized
+                for another model with the same vocabulary
+            
+        Returns:
+            list: Sentiment results in the same order as posts, in the format returned by analyze()
+        """
+        if not posts:
+            return []
+        
+        batch_size = batch_size or config.SENTIMENT_BATCH_SIZE
+        
         # Combine title and content for better sentiment analysis
-        text = f"{title}. {content}"
-        
-        # Get sentiment prediction from ML pipeline
-        result = self.sentiment_pipeline(text)[0]
-        
-        # Convert to a standardized format
-        # BERT sentiment models return a label ('POSITIVE'/'NEGATIVE') and a score (0-1)
-        # Convert to a value between -1 and 1 for easier thresholding
-        score = result['score']
-        if result['label'] == 'NEGATIVE':
-            score = -score
-        
-        return {
-            'score': score,
-            'label': result['label'],
-            'is_negative': score < config.NEGATIVE_THRESHOLD
-        }
\ No newline at end of file
+        tokenized = tokenized or TokenizedTexts([post.text for post in posts])
+        texts = tokenized.texts
+        
+        if self.cache is None:
+            return self._analyze_texts(tokenized, batch_size)
+        
+        # Only run the model on texts that aren't cached yet
+        results = self.cache.get_many(texts)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            computed = self._analyze_texts(tokenized.subset(missing), batch_size)
+            self.cache.put_many([texts[i] for i in missing], [sentiment.to_dict() for sentiment in computed])
+            for i, sentiment in zip(missing, computed):
+                results[i] = sentiment
+        
+        # Cached entries are dicts; each call gets its own Sentiment records
+        return [Sentiment.from_dict(result) if isinstance(result, dict) else result for result in results]
+    
+    def _analyze_texts(self, tokenized, batch_size):
+        """
+        Run texts through the sentiment model in length-bucketed batches
+        
+        Args:
+            tokenized (TokenizedTexts): Combined title/content strings
+            batch_size (int): Texts per forward pass
+            
+        Returns:
+            list: Sentiment results in the same order as the texts
+        """
+        # Tokenize everything once without padding; padding is applied per batch
+        with section("sentiment.tokenize"):
+            room = self.max_length - self.special_tokens.single_count
+            input_ids = [self.special_tokens.single(ids[:room]) for ids in tokenized.ids_for(self.tokenizer)]
+        
+        # Bucket by length so short posts are not padded up to long ones
+        order = sorted(range(len(input_ids)), key=lambda i: len(input_ids[i]))
+        
+        results = [None] * len(input_ids)
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            with section("sentiment.tokenize"):
+                batch = self.tokenizer.pad(
+                    {
+                        'input_ids': [input_ids[i] for i in indices],
+                        'attention_mask': [[1] * len(input_ids[i]) for i in indices]
+                    },
+                    return_tensors="pt"
+                ).to(self.model.device)
+            
+            with section("sentiment.forward"), torch.no_grad():
+                probabilities = self.model(**batch).logits.softmax(dim=-1)
+            
+            with section("sentiment.postprocess"):
+                top = probabilities.max(dim=-1)
+                for row, index in enumerate(indices):
+                    label = self.model.config.id2label[top.indices[row].item()]
+                    results[index] = sentiment_from_label(label, top.values[row].item())
+        
+        return results
+
+
+def sentiment_from_label(label, confidence):
+    """
+    Convert a model label and confidence into the standard result format
+    
+    Args:
+        label (str): 'POSITIVE' or 'NEGATIVE'
+        confidence (float): Model confidence for the label (0-1)
+        
+    Returns:
+        Sentiment: Sentiment result with score, label and is_negative
+    """
+    # BERT sentiment models return a label ('POSITIVE'/'NEGATIVE') and a score (0-1)
+    # Convert to a value between -1 and 1 for easier thresholding
+    score = confidence
+    if label == 'NEGATIVE':
+        score = -score
+    
+    return Sentiment(score=score, label=label, is_negative=score < config.NEGATIVE_THRESHOLD)
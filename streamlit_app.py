@@ -1,20 +1,16 @@
 import streamlit as st
 import time
 import os
-import threading
-import pickle
-import json
-import requests
-import html
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
-import pandas as pd
 import config
-from rss_parser import RedditRSSParser
-from categorizer import PostCategorizer
-from sentiment_analyzer import SentimentAnalyzer
-from image_analyzer import ImageAnalyzer
-from notifier import EmailNotifier
+from model_registry import get_registry
+from metrics import get_metrics, parse_metrics_text, read_metrics_file, stage_summary, start_metrics_server, STAGE_SECONDS
+from post_store import get_post_store
+from models import Sentiment
+from rss_parser import source_name
+# pandas (with dashboard_data), the pipeline and the models are imported where they
+# are first needed, so the page starts drawing as soon as Streamlit itself is loaded
 
 # Set up logging
 logging.basicConfig(
@@ -30,172 +26,39 @@ logger = logging.getLogger("sentiment_app")
 os.makedirs("logs", exist_ok=True)
 os.makedirs("data", exist_ok=True)
 
-# File to store posts data
-POSTS_FILE = "data/posts_data.pickle"
-
-def load_posts():
-    """Load posts from pickle file"""
-    try:
-        if os.path.exists(POSTS_FILE):
-            with open(POSTS_FILE, "rb") as f:
-                posts = pickle.load(f)
-                logger.info(f"Loaded {len(posts)} posts from storage")
-                return posts
-        else:
-            logger.info("No saved data found, starting with empty post storage")
-            return []
-    except Exception as e:
-        logger.error(f"Error loading post data: {str(e)}")
-        return []
-
-def save_posts(posts):
-    """Save posts to pickle file"""
-    try:
-        # Ensure we only keep the 50 most recent posts
-        sorted_posts = sorted(posts, key=lambda x: x.get('timestamp', 0), reverse=True)
-        posts_to_save = sorted_posts[:50]
-        
-        with open(POSTS_FILE, "wb") as f:
-            pickle.dump(posts_to_save, f)
-        logger.info(f"Saved {len(posts_to_save)} posts to storage")
-    except Exception as e:
-        logger.error(f"Error saving post data: {str(e)}")
-
-def check_for_bursts(posts):
+def start_background_work():
     """
-    Check if there are any bursts of negative sentiment in any category
+    Start loading models in the background and serving metrics
     
-    Returns:
-        list: List of (category, posts) tuples where a burst was detected
+    Called once the page has been drawn, so loading models never delays the
+    first render. The registry is process-wide, so models only load once
+    across all sessions. With a separate worker the dashboard only reads the
+    store and needs neither.
     """
-    bursts = []
-    burst_timeframe_seconds = config.BURST_TIMEFRAME * 60
-    cutoff_time = time.time() - burst_timeframe_seconds
-    
-    # Convert all post timestamps to ensure consistency
-    for post in posts:
-        # If the post has a published field as ISO timestamp string, convert to Unix timestamp
-        if 'published' in post and isinstance(post['published'], str):
-            try:
-                post['published_timestamp'] = datetime.fromisoformat(post['published']).timestamp()
-            except ValueError:
-                # Handle the case where the timestamp string is not in ISO format
-                post['published_timestamp'] = post.get('timestamp', 0)
-        # If published is already a timestamp, use it directly
-        elif 'published' in post and isinstance(post['published'], (int, float)):
-            post['published_timestamp'] = post['published']
-        # Fallback to the processing timestamp
-        else:
-            post['published_timestamp'] = post.get('timestamp', 0)
-    
-    # Only consider recent posts within the burst timeframe based on published timestamps
-    recent_posts = [post for post in posts if post.get('published_timestamp', 0) > cutoff_time]
-    
-    # Group by category
-    categories = {}
-    for post in recent_posts:
-        category = post.get('category', 'Other')
-        if category not in categories:
-            categories[category] = []
-        categories[category].append(post)
-    
-    # Check each category for negative bursts
-    for category, category_posts in categories.items():
-        negative_posts = [p for p in category_posts if p.get('sentiment', {}).get('is_negative', False)]
-        if len(negative_posts) >= config.BURST_THRESHOLD:
-            bursts.append((category, negative_posts))
-    
-    return bursts
+    if config.UI_READ_ONLY:
+        return
+    if config.WARM_UP_MODELS and not config.INFERENCE_SERVER_URL:
+        from text_analysis import warm_up_models
+
+        get_registry().warm_up(warm_up_models(config.WARM_UP_MODELS), background=True)
+    # The worker exports metrics itself; otherwise this process does the processing
+    start_metrics_server()
 
 def get_new_posts(last_fetch_time=None):
     """
-    Background function to fetch and process new posts
+    Fetch and process new posts from the dashboard
     Uses AI-powered categorization and sentiment analysis
     """
-    # Get posts from storage to check for already processed IDs
-    posts = load_posts()
-    seen_ids = {post.get('id', '') for post in posts}
+    from pipeline import run_fetch_cycle
     
-    # Initialize components
-    parser = RedditRSSParser()
-    categorizer = PostCategorizer()
-    text_analyzer = SentimentAnalyzer()
-    image_analyzer = ImageAnalyzer()
-    notifier = EmailNotifier()
+    def set_status(message):
+        st.session_state.status = message
     
-    # Show status in the app
-    st.session_state.status = "Fetching posts..."
-    
-    # Get new posts (limit to None to get all new posts)
     try:
-        new_posts = parser.get_new_posts(seen_ids, limit=None)
-        logger.info(f"Found {len(new_posts)} new posts")
-        
-        if not new_posts:
-            st.session_state.status = "No new posts found"
-            return
-        
-        st.session_state.status = f"Processing {len(new_posts)} new posts..."
-        
-        # Process each post
-        for i, post in enumerate(new_posts):
-            st.session_state.status = f"Processing post {i+1}/{len(new_posts)}: {post.get('title', '')[:30]}..."
-            
-            try:
-                # Analyze images if present
-                image_analysis = None
-                if 'image_urls' in post and post['image_urls']:
-                    logger.info(f"Analyzing {len(post['image_urls'])} images for post {post['id']}")
-                    image_analysis = image_analyzer.analyze_images(post['image_urls'])
-                    
-                    # Add image captions to post content for better categorization and sentiment analysis
-                    if image_analysis.get('captions'):
-                        post['content'] = post.get('content', '') + " " + " ".join(image_analysis['captions'])
-                
-                # Categorize post
-                category = categorizer.categorize(post['title'], post.get('content', ''))
-                post['category'] = category
-                logger.info(f"Categorized post {post['id']} as {category}")
-                
-                # Analyze text sentiment
-                text_sentiment = text_analyzer.analyze(post['title'], post.get('content', ''))
-                
-                # Add image tags to sentiment result if available
-                sentiment = text_sentiment.copy()
-                
-                # Add image tags if available
-                if image_analysis and 'content_tags' in image_analysis:
-                    sentiment['image_tags'] = image_analysis.get('content_tags', [])
-                
-                post['sentiment'] = sentiment
-                
-                # Add timestamp
-                post['timestamp'] = time.time()
-                
-                # Add to posts list
-                posts.append(post)
-                
-            except Exception as e:
-                logger.error(f"Error processing post {post.get('id', 'unknown')}: {str(e)}")
-        
-        # Save updated posts
-        save_posts(posts)
-        
-        # Check for bursts and send notifications
-        bursts = check_for_bursts(posts)
-        if bursts:
-            st.session_state.status = f"Found {len(bursts)} bursts of negative sentiment"
-            logger.info(f"Found {len(bursts)} bursts of negative sentiment")
-            
-            # Send notifications
-            for category, category_posts in bursts:
-                logger.info(f"Sending notification for burst in category {category}")
-                notifier.send_burst_alert(category, category_posts)
-        
-        # Update status
-        st.session_state.status = f"Finished processing. Found {len(new_posts)} new posts."
+        processed = run_fetch_cycle(on_progress=set_status)
+        if processed:
+            st.session_state.status = f"Finished processing. Found {processed} new posts."
         st.session_state.last_fetch_time = time.time()
-        st.session_state.posts = posts  # Update posts in session
         
     except Exception as e:
         logger.error(f"Error in background processing: {str(e)}")
@@ -207,31 +70,8 @@ def format_datetime(timestamp):
         return "Unknown"
     return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
 
-def get_post_time(post):
-    """Get the best available timestamp from a post"""
-    # Try published_timestamp first (calculated during burst detection)
-    if 'published_timestamp' in post:
-        return post['published_timestamp']
-    
-    # Try converting published if it's a string
-    if 'published' in post and isinstance(post['published'], str):
-        try:
-            return datetime.fromisoformat(post['published']).timestamp()
-        except ValueError:
-            pass
-    
-    # Try published if it's already a timestamp
-    if 'published' in post and isinstance(post['published'], (int, float)):
-        return post['published']
-    
-    # Fall back to processing timestamp
-    return post.get('timestamp', 0)
-
 def initialize_session_state():
     """Initialize Streamlit session state variables"""
-    if 'posts' not in st.session_state:
-        st.session_state.posts = load_posts()
-    
     if 'last_fetch_time' not in st.session_state:
         st.session_state.last_fetch_time = None
     
@@ -240,111 +80,130 @@ def initialize_session_state():
     
     if 'auto_refresh' not in st.session_state:
         st.session_state.auto_refresh = False
-        
-    if 'need_refresh' not in st.session_state:
-        st.session_state.need_refresh = False
 
-# Main Streamlit app
-def main():
-    # Initialize session state
-    initialize_session_state()
+def render_system_panel():
+    """Show stage timings, counters and model stats from the metrics registry"""
+    import pandas as pd
     
-    # Check if we need to refresh data (from auto-refresh)
-    if st.session_state.need_refresh:
-        get_new_posts()
-        st.session_state.need_refresh = False
+    if config.UI_READ_ONLY:
+        # The worker process writes its metrics to a shared file after every cycle
+        samples = read_metrics_file()
+        st.caption("Worker metrics, updated after every fetch cycle")
+    else:
+        samples = parse_metrics_text(get_metrics().render())
     
-    # App title and description
-    st.title("Reddit Sentiment Analyzer")
-    st.markdown("Monitors r/boston subreddit for sentiment and categorizes posts")
+    stages = stage_summary(samples)
+    if stages:
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "stage": stage["stage"],
+                    "calls": stage["count"],
+                    "mean ms": stage["mean"] * 1000 if stage["mean"] is not None else None,
+                    "p50 ms ≤": stage["p50"] * 1000 if stage["p50"] is not None else None,
+                    "p99 ms ≤": stage["p99"] * 1000 if stage["p99"] is not None else None
+                }
+                for stage in stages
+            ]),
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        st.caption("No stage timings yet")
     
-    # Sidebar with controls
-    with st.sidebar:
-        st.header("Controls")
-        
-        # Manual refresh button
-        if st.button("Fetch New Posts"):
-            with st.spinner("Fetching posts..."):
-                # Run directly instead of using a thread to avoid Streamlit context warnings
-                get_new_posts()
-        
-        # Auto-refresh toggle
-        auto_refresh = st.checkbox("Auto-refresh", value=st.session_state.auto_refresh)
-        if auto_refresh != st.session_state.auto_refresh:
-            st.session_state.auto_refresh = auto_refresh
-        
-        refresh_interval = st.slider("Refresh interval (minutes)", 
-                                     min_value=1, max_value=60, value=config.CHECK_INTERVAL)
-        
-        st.subheader("Categories")
-        category_filter = st.multiselect("Filter by category", 
-                                        options=["All"] + config.CATEGORIES,
-                                        default="All")
-        
-        st.subheader("Sentiment")
-        sentiment_filter = st.radio("Filter by sentiment", 
-                                   options=["All", "Positive", "Negative", "Neutral"],
-                                   index=0)
+    counters = [
+        {
+            "metric": name.replace("sentiment_agent_", ""),
+            "labels": ", ".join(f"{key}={value}" for key, value in labels.items()),
+            "value": value
+        }
+        for name, labels, value in samples if not name.startswith(STAGE_SECONDS)
+    ]
+    if counters:
+        st.dataframe(pd.DataFrame(counters), hide_index=True, use_container_width=True)
+    if config.METRICS_PORT:
+        st.caption(f"Prometheus metrics: http://{config.METRICS_HOST}:{config.METRICS_PORT}/metrics")
+
+def render_posts(refresh_interval, category_filter, source_filter, sentiment_filter):
+    """
+    Show status, bursts and the filtered posts
+    
+    Runs as a fragment, so auto-refresh reruns just this section.
+    
+    Args:
+        refresh_interval (int): Minutes between auto-refresh fetches
+        category_filter (list): Selected categories, may contain "All"
+        source_filter (list): Selected sources, or None
+        sentiment_filter (str): "All", "Positive", "Negative" or "Neutral"
+    """
+    # Fetch once the refresh interval has passed (the worker does this in read-only mode)
+    if st.session_state.auto_refresh and not config.UI_READ_ONLY:
+        last_fetch_time = st.session_state.last_fetch_time or 0
+        if time.time() - last_fetch_time > refresh_interval * 60:
+            st.session_state.status = "Auto-refreshing..."
+            get_new_posts()
     
     # Status information
     status_col1, status_col2 = st.columns(2)
     with status_col1:
         st.write(f"Status: {st.session_state.status}")
+    store = get_post_store()
     with status_col2:
-        if st.session_state.last_fetch_time:
-            st.write(f"Last fetch: {format_datetime(st.session_state.last_fetch_time)}")
+        # In read-only mode the newest stored post shows when the worker last saved anything
+        last_fetch_time = store.last_processed_time() if config.UI_READ_ONLY else st.session_state.last_fetch_time
+        if last_fetch_time:
+            st.write(f"Last fetch: {format_datetime(last_fetch_time)}")
         else:
             st.write("Last fetch: Never")
     
+    with st.expander("System"):
+        render_system_panel()
+    
+    # The columnar post index needs pandas, the heaviest import the dashboard has
+    import pandas as pd
+    import dashboard_data
+    
+    # Every query below is served from cache until the store changes
+    version = dashboard_data.store_version()
+    
     # Show bursts if any
-    posts = st.session_state.posts
-    bursts = check_for_bursts(posts)
+    bursts = [
+        (category, neg_posts) for category, neg_posts in dashboard_data.active_bursts(version)
+        if not source_filter or neg_posts[0].source in source_filter
+    ]
     if bursts:
         st.subheader(f"🚨 Bursts Detected: {len(bursts)}")
         for category, neg_posts in bursts:
-            with st.expander(f"Burst in {category} category - {len(neg_posts)} negative posts"):
+            with st.expander(f"Burst in {category} category ({neg_posts[0].source}) - {len(neg_posts)} negative posts"):
                 for post in neg_posts:
-                    st.markdown(f"**{post.get('title', 'No title')}** - "
-                               f"Score: {post.get('sentiment', {}).get('score', 0):.2f}")
+                    st.markdown(f"**{post.title or 'No title'}** - "
+                               f"Score: {post.sentiment.score:.2f}")
     
     # Display posts with filtering
     st.subheader("Recent Posts")
     
-    # Apply filters
-    filtered_posts = posts
-    
-    # Category filter
-    if category_filter and "All" not in category_filter:
-        filtered_posts = [p for p in filtered_posts if p.get('category') in category_filter]
-    
-    # Sentiment filter
-    if sentiment_filter == "Positive":
-        filtered_posts = [p for p in filtered_posts if p.get('sentiment', {}).get('score', 0) > 0.1]
-    elif sentiment_filter == "Negative":
-        filtered_posts = [p for p in filtered_posts if p.get('sentiment', {}).get('score', 0) < -0.1]
-    elif sentiment_filter == "Neutral":
-        filtered_posts = [p for p in filtered_posts if abs(p.get('sentiment', {}).get('score', 0)) <= 0.1]
-    
-    # Sort by published timestamp (newest first)
-    filtered_posts = sorted(filtered_posts, key=get_post_time, reverse=True)
+    # Filter with vectorized masks over the in-memory columnar index, newest published first
+    categories = category_filter if category_filter and "All" not in category_filter else None
+    filters = {
+        'categories': tuple(categories) if categories else None,
+        'sentiment': sentiment_filter if sentiment_filter != "All" else None,
+        'sources': tuple(source_filter) if source_filter else None
+    }
+    total = dashboard_data.post_count(version, **filters)
+    page_count = max((total + config.DASHBOARD_PAGE_SIZE - 1) // config.DASHBOARD_PAGE_SIZE, 1)
+    # Keyed on the filters so changing them goes back to the first page
+    page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key=f"page-{filters}") - 1
+    posts_df = dashboard_data.posts_page(version, page=page, **filters)
     
     # Display posts in cards
-    if not filtered_posts:
+    if posts_df.empty:
         st.info("No posts found with the selected filters")
     else:
-        # Convert to DataFrame for easier display
-        posts_df = pd.DataFrame([
-            {
-                "title": p.get('title', 'No title'),
-                "category": p.get('category', 'Other'),
-                "sentiment": p.get('sentiment', {}).get('label', 'NEUTRAL'),
-                "score": p.get('sentiment', {}).get('score', 0),
-                "timestamp": format_datetime(get_post_time(p)),
-                "link": p.get('link', '#'),
-                "id": p.get('id', ''),
-                "content": p.get('content', '')[:200] + '...' if p.get('content', '') else 'No content'
-            } for p in filtered_posts
-        ])
+        first = page * config.DASHBOARD_PAGE_SIZE
+        st.caption(f"Showing {first + 1}-{first + len(posts_df)} of {total} posts")
+        posts_df = posts_df.assign(timestamp=pd.to_datetime(posts_df["published"], unit="s", utc=True).dt.tz_convert(
+            datetime.now().astimezone().tzinfo
+        ))
         
         # Use Streamlit's built-in dataframe for a cleaner overview
         st.dataframe(
@@ -354,17 +213,18 @@ def main():
                 "category": st.column_config.TextColumn("Category"),
                 "sentiment": st.column_config.TextColumn("Sentiment"),
                 "score": st.column_config.NumberColumn("Score", format="%.2f"),
-                "timestamp": st.column_config.TextColumn("Time")
+                "timestamp": st.column_config.DatetimeColumn("Time", format="YYYY-MM-DD HH:mm")
             },
             hide_index=True,
             use_container_width=True
         )
         
-        # Show detailed cards for each post
-        for i, post in enumerate(filtered_posts[:10]):  # Limit to 10 posts for performance
-            sentiment = post.get('sentiment', {})
-            sentiment_score = sentiment.get('score', 0)
-            sentiment_label = sentiment.get('label', 'NEUTRAL')
+        # Detail cards only for the top of the current page; full posts are loaded just for them
+        card_ids = tuple(posts_df["id"][:config.DASHBOARD_CARDS_PER_PAGE])
+        for i, post in enumerate(dashboard_data.posts_by_id(version, card_ids)):
+            sentiment = post.sentiment or Sentiment()
+            sentiment_score = sentiment.score
+            sentiment_label = sentiment.label
             
             # Determine card color based on sentiment
             if sentiment_score > 0.1:
@@ -382,33 +242,86 @@ def main():
                 col1, col2 = st.columns([4, 1])
                 
                 with col1:
-                    st.markdown(f"### {post.get('title', 'No title')}")
-                    st.text(f"Category: {post.get('category', 'Other')}")
+                    st.markdown(f"### {post.title or 'No title'}")
+                    st.text(f"Category: {post.category or 'Other'}")
                 
                 with col2:
                     st.markdown(f"**Sentiment: {sentiment_label}**")
                     st.markdown(f"Score: {sentiment_score:.2f}")
                 
-                st.markdown(post.get('content', '')[:200] + '...' if len(post.get('content', '')) > 200 else post.get('content', ''))
+                st.markdown(post.content[:200] + '...' if len(post.content) > 200 else post.content)
                 
                 # Show image tags if available
-                if 'image_tags' in sentiment and sentiment['image_tags']:
-                    st.text(f"Image content: {', '.join(sentiment['image_tags'][:5])}")
+                if sentiment.image_tags:
+                    st.text(f"Image content: {', '.join(sentiment.image_tags[:5])}")
                 
-                st.markdown(f"[View on Reddit]({post.get('link', '#')})")
+                st.markdown(f"[View on Reddit]({post.link or '#'})")
+
+# Main Streamlit app
+def main():
+    # Initialize session state
+    initialize_session_state()
     
-    # Auto-refresh logic
-    if st.session_state.auto_refresh:
-        # Calculate time since last fetch
-        if st.session_state.last_fetch_time:
-            time_since_last = time.time() - st.session_state.last_fetch_time
-            if time_since_last > refresh_interval * 60:
-                st.session_state.status = "Auto-refreshing..."
-                # Use a flag to trigger refresh on next rerun instead of threading
-                st.session_state.need_refresh = True
+    # App title and description
+    st.title("Reddit Sentiment Analyzer")
+    source_names = [source_name(url) for url in config.REDDIT_SOURCES]
+    st.markdown(f"Monitors {', '.join(source_names)} for sentiment and categorizes posts")
+    
+    # Sidebar with controls
+    with st.sidebar:
+        st.header("Controls")
+        
+        # Manual refresh button (a separate worker does the fetching in read-only mode)
+        if config.UI_READ_ONLY:
+            st.caption("Posts are fetched by the background worker")
+        elif st.button("Fetch New Posts"):
+            with st.spinner("Fetching posts..."):
+                # Run directly instead of using a thread to avoid Streamlit context warnings
+                get_new_posts()
+        
+        # Auto-refresh toggle
+        auto_refresh = st.checkbox("Auto-refresh", value=st.session_state.auto_refresh)
+        if auto_refresh != st.session_state.auto_refresh:
+            st.session_state.auto_refresh = auto_refresh
         
-        # Set up auto-refresh for the page
-        st.rerun()
+        refresh_interval = st.slider("Refresh interval (minutes)", 
+                                     min_value=1, max_value=60, value=config.CHECK_INTERVAL)
+        
+        st.subheader("Categories")
+        category_filter = st.multiselect("Filter by category", 
+                                        options=["All"] + config.CATEGORIES,
+                                        default="All")
+        
+        source_filter = None
+        if len(source_names) > 1:
+            st.subheader("Sources")
+            source_filter = st.multiselect("Filter by source", options=source_names)
+        
+        st.subheader("Sentiment")
+        sentiment_filter = st.radio("Filter by sentiment", 
+                                   options=["All", "Positive", "Negative", "Neutral"],
+                                   index=0)
+        
+        st.subheader("Models")
+        model_stats = get_registry().stats()
+        if config.INFERENCE_SERVER_URL:
+            st.caption(f"Models are served by the inference server at {config.INFERENCE_SERVER_URL}")
+        elif not model_stats:
+            st.caption("Models are loaded by the worker" if config.UI_READ_ONLY else "Models are loading...")
+        for name, stats in model_stats.items():
+            st.caption(f"{name}: loaded in {stats['load_seconds']:.1f}s, "
+                       f"{stats['rss_bytes'] / (1024 * 1024):.0f} MB")
+            cache = getattr(get_registry().get(name), 'cache', None)
+            if cache is not None:
+                cache_stats = ", ".join(f"{key.replace('_', ' ')}: {value}" for key, value in cache.stats().items())
+                st.caption(f"{name} cache: {cache_stats}")
+    
+    # With auto-refresh on, only the posts section reruns on a timer; the
+    # script never blocks waiting for the next refresh
+    run_every = config.UI_REFRESH_SECONDS if st.session_state.auto_refresh else None
+    st.fragment(run_every=run_every)(render_posts)(refresh_interval, category_filter, source_filter, sentiment_filter)
+    
+    start_background_work()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,93 @@
+import os
+
+# Keep tests off the real caches, ports and data files; set before config is imported
+os.environ.setdefault("INFERENCE_CACHE_ENABLED", "false")
+os.environ.setdefault("IMAGE_CACHE_ENABLED", "false")
+os.environ.setdefault("METRICS_PORT", "0")
+os.environ.setdefault("PROFILING_MODE", "off")
+
+import pytest
+
+import config
+
+# Words the tiny test models know; anything else is [UNK]
+VOCAB_WORDS = [
+    "the", "a", "is", "this", "example", "on", "in", "at", "of", "and", "to", "was", "so",
+    "traffic", "red", "line", "delays", "snow", "storm", "great", "terrible", "pizza", "new",
+    "restaurant", "apartment", "rent", "game", "tonight", "police", "city", "council", "vote",
+    "photo", "sunset", "question", "anyone", "know", "events", "news", "food", "housing",
+    "transportation", "crime", "politics", "weather", "sports", "other", "good", "bad",
+    "hello", "world",
+]
+VOCAB = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + VOCAB_WORDS + list(".,!?'")
+
+
+def _tiny_tokenizer():
+    """Build a lowercasing BERT-style tokenizer over VOCAB"""
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+
+    backend = Tokenizer(models.WordPiece({token: i for i, token in enumerate(VOCAB)}, unk_token="[UNK]"))
+    backend.normalizer = normalizers.BertNormalizer(lowercase=True)
+    backend.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    backend.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        pair="[CLS] $A [SEP] $B:1 [SEP]:1",
+        special_tokens=[("[CLS]", VOCAB.index("[CLS]")), ("[SEP]", VOCAB.index("[SEP]"))],
+    )
+    return PreTrainedTokenizerFast(
+        tokenizer_object=backend, model_max_length=128, unk_token="[UNK]", pad_token="[PAD]",
+        cls_token="[CLS]", sep_token="[SEP]", mask_token="[MASK]",
+    )
+
+
+def _save_tiny_classifier(path, labels, seed):
+    """Save a randomly initialized two-layer BERT classifier with its tokenizer"""
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification
+
+    _tiny_tokenizer().save_pretrained(path)
+
+    torch.manual_seed(seed)
+    model = BertForSequenceClassification(BertConfig(
+        vocab_size=len(VOCAB),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=128,
+        initializer_range=0.2,
+        num_labels=len(labels),
+        id2label=dict(enumerate(labels)),
+        label2id={label: i for i, label in enumerate(labels)},
+    ))
+    model.eval()
+    model.save_pretrained(path)
+    return {"name": path, "revision": "main", "backend": "torch"}
+
+
+@pytest.fixture(scope="session")
+def tiny_models(tmp_path_factory):
+    """
+    Tiny local sentiment and NLI models, so model tests run offline in seconds
+
+    Returns:
+        dict: "sentiment" and "nli" model configurations in the config.py format
+    """
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    root = tmp_path_factory.mktemp("models")
+    return {
+        "sentiment": _save_tiny_classifier(str(root / "sentiment"), ["NEGATIVE", "POSITIVE"], seed=0),
+        "nli": _save_tiny_classifier(str(root / "nli"), ["contradiction", "neutral", "entailment"], seed=1),
+    }
+
+
+@pytest.fixture
+def tiny_config(tiny_models, monkeypatch):
+    """Point the text models in config at the tiny models"""
+    monkeypatch.setattr(config, "SENTIMENT_MODEL", dict(tiny_models["sentiment"]))
+    monkeypatch.setattr(config, "ZERO_SHOT_MODEL", dict(tiny_models["nli"]))
+    monkeypatch.setattr(config, "CATEGORIZER_MODE", "nli")
+    monkeypatch.setattr(config, "INFERENCE_CACHE_ENABLED", False)
+    return tiny_models
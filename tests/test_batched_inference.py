@@ -0,0 +1,80 @@
+import pytest
+
+import config
+from models import Post
+
+TEXTS = [
+    ("Traffic on the Red Line", "Delays again, terrible."),
+    ("Great pizza", ""),
+    ("Snow storm tonight", "The city is so bad at this. Anyone know if the game is on?"),
+    ("New restaurant", "Great new pizza restaurant in the city, good food and good rent"),
+    ("Question", "Anyone know a good apartment?"),
+    ("Photo", "Sunset at the city council"),
+    ("Police", "Crime in the city, police news at the council vote tonight, terrible and bad"),
+]
+
+
+@pytest.fixture
+def posts():
+    return [Post(str(i), title, content) for i, (title, content) in enumerate(TEXTS)]
+
+
+def test_sentiment_batches_match_pipeline(tiny_config, posts):
+    from transformers import pipeline
+    from sentiment_analyzer import SentimentAnalyzer, sentiment_from_label
+
+    analyzer = SentimentAnalyzer()
+    reference = pipeline("sentiment-analysis", model=tiny_config["sentiment"]["name"])
+
+    # Small batches so posts of different lengths are bucketed and padded together
+    results = analyzer.analyze_batch(posts, batch_size=3)
+
+    assert len(results) == len(posts)
+    for post, result in zip(posts, results):
+        expected = reference(post.text)[0]
+        expected = sentiment_from_label(expected["label"], expected["score"])
+        assert result.label == expected.label
+        assert result.score == pytest.approx(expected.score, abs=1e-4)
+        assert result.is_negative == expected.is_negative
+
+
+def test_sentiment_results_do_not_depend_on_batch_size(tiny_config, posts):
+    from sentiment_analyzer import SentimentAnalyzer
+
+    analyzer = SentimentAnalyzer()
+    one_by_one = [analyzer.analyze(post.title, post.content) for post in posts]
+    batched = analyzer.analyze_batch(posts, batch_size=16)
+
+    for single, batch in zip(one_by_one, batched):
+        assert batch.label == single.label
+        assert batch.score == pytest.approx(single.score, abs=1e-4)
+
+
+def test_categories_match_zero_shot_pipeline(tiny_config, posts, monkeypatch):
+    from transformers import pipeline
+    from categorizer import PostCategorizer
+
+    monkeypatch.setattr(config, "CATEGORIZER_PRUNE_TOP_K", 0)
+    categorizer = PostCategorizer()
+    reference = pipeline("zero-shot-classification", model=tiny_config["nli"]["name"])
+
+    # Batches that split one post's label pairs across forward passes
+    results = categorizer.categorize_batch(posts, batch_size=5)
+
+    expected = [
+        reference(post.text, candidate_labels=config.CATEGORIES,
+                  hypothesis_template=config.CATEGORY_HYPOTHESIS_TEMPLATE)["labels"][0]
+        for post in posts
+    ]
+    assert results == expected
+
+
+def test_pruned_categories_do_not_depend_on_batch_size(tiny_config, posts, monkeypatch):
+    from categorizer import PostCategorizer
+
+    monkeypatch.setattr(config, "CATEGORIZER_PRUNE_TOP_K", 3)
+    monkeypatch.setattr(config, "CATEGORIZER_PREVIEW_TOKENS", 4)
+    categorizer = PostCategorizer()
+
+    one_by_one = [categorizer.categorize(post.title, post.content) for post in posts]
+    assert categorizer.categorize_batch(posts, batch_size=7) == one_by_one
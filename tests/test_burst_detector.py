@@ -0,0 +1,75 @@
+from burst_detector import BurstDetector
+from models import Post, Sentiment
+
+NOW = 1_700_000_000.0
+
+
+def negative_post(post_id, minutes_ago, category="Transportation", source="r/boston"):
+    return Post(
+        post_id,
+        title=f"Post {post_id}",
+        published=NOW - minutes_ago * 60,
+        source=source,
+        category=category,
+        sentiment=Sentiment(-0.8, "NEGATIVE", True),
+    )
+
+
+def test_reposted_posts_are_counted_once():
+    detector = BurstDetector(threshold=3, timeframe_minutes=60)
+    posts = [negative_post("a", 5), negative_post("b", 4)]
+
+    # The same posts arrive again, e.g. from an overlapping poll
+    detector.add(posts, now=NOW)
+    detector.add(posts, now=NOW)
+    detector.add([negative_post("a", 5)], now=NOW)
+
+    assert detector.active_bursts(now=NOW) == []
+
+    detector.add([negative_post("c", 3)], now=NOW)
+    [(category, burst)] = detector.active_bursts(now=NOW)
+    assert category == "Transportation"
+    assert [post.id for post in burst] == ["a", "b", "c"]
+
+
+def test_new_bursts_are_reported_once():
+    detector = BurstDetector(threshold=2, timeframe_minutes=60)
+    detector.add([negative_post("a", 5), negative_post("b", 4)], now=NOW)
+
+    assert len(detector.new_bursts(now=NOW)) == 1
+    assert detector.new_bursts(now=NOW) == []
+
+    # Still the same burst after another post joins it
+    detector.add([negative_post("c", 1)], now=NOW)
+    assert detector.new_bursts(now=NOW) == []
+
+
+def test_burst_alerts_again_after_dropping_below_threshold():
+    detector = BurstDetector(threshold=2, timeframe_minutes=10)
+    detector.add([negative_post("a", 8), negative_post("b", 7)], now=NOW)
+    assert len(detector.new_bursts(now=NOW)) == 1
+
+    # Both posts leave the window, then a fresh burst starts
+    later = NOW + 10 * 60
+    assert detector.new_bursts(now=later) == []
+    detector.add([negative_post("c", -9), negative_post("d", -9.5)], now=later)
+    assert len(detector.new_bursts(now=later)) == 1
+
+
+def test_sources_and_categories_are_separate():
+    detector = BurstDetector(threshold=2, timeframe_minutes=60)
+    detector.add([
+        negative_post("a", 5, source="r/boston"),
+        negative_post("b", 4, source="r/cambridge"),
+        negative_post("c", 3, category="Crime"),
+    ], now=NOW)
+
+    assert detector.active_bursts(now=NOW) == []
+
+
+def test_ignores_positive_and_expired_posts():
+    detector = BurstDetector(threshold=2, timeframe_minutes=10)
+    positive = Post("p", published=NOW, category="Transportation", sentiment=Sentiment(0.9, "POSITIVE", False))
+    detector.add([positive, negative_post("old", 30), negative_post("a", 1)], now=NOW)
+
+    assert detector.active_bursts(now=NOW) == []
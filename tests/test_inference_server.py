@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+from inference_server import MicroBatcher
+
+
+class RecordingModel:
+    """Doubles numbers, failing on negative ones, and records every batch it was given"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if any(item < 0 for item in items):
+            raise ValueError("negative input")
+        return [item * 2 for item in items]
+
+
+def submit_concurrently(batcher, requests):
+    """Submit each request from its own thread; returns results or exceptions by index"""
+    outcomes = [None] * len(requests)
+    start = threading.Barrier(len(requests))
+
+    def submit(i):
+        start.wait()
+        try:
+            outcomes[i] = batcher.submit(requests[i])
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return outcomes
+
+
+def test_concurrent_requests_are_coalesced():
+    model = RecordingModel()
+    batcher = MicroBatcher("test", model, max_batch=100, max_wait=0.5)
+    requests = [[i, i + 100] for i in range(8)]
+
+    outcomes = submit_concurrently(batcher, requests)
+
+    assert outcomes == [[i * 2, (i + 100) * 2] for i in range(8)]
+    assert len(model.batches) < len(requests)
+    assert batcher.stats()['requests'] == 8
+    assert batcher.stats()['items'] == 16
+
+
+def test_batches_stop_at_max_batch():
+    model = RecordingModel()
+    batcher = MicroBatcher("test", model, max_batch=4, max_wait=0.5)
+
+    outcomes = submit_concurrently(batcher, [[i, i] for i in range(6)])
+
+    assert outcomes == [[i * 2, i * 2] for i in range(6)]
+    assert all(len(batch) <= 4 for batch in model.batches)
+
+
+def test_bad_item_only_fails_its_own_request():
+    model = RecordingModel()
+    batcher = MicroBatcher("test", model, max_batch=100, max_wait=0.5)
+
+    outcomes = submit_concurrently(batcher, [[1, 2], [3, -1], [4]])
+
+    assert outcomes[0] == [2, 4]
+    assert isinstance(outcomes[1], ValueError)
+    assert outcomes[2] == [8]
+
+
+def test_single_failing_item_raises():
+    batcher = MicroBatcher("test", RecordingModel(), max_wait=0)
+
+    with pytest.raises(ValueError):
+        batcher.submit([-1])
+    # The batcher keeps serving after an error
+    assert batcher.submit([5]) == [10]
+
+
+def test_empty_request_skips_the_model():
+    model = RecordingModel()
+    batcher = MicroBatcher("test", model, max_wait=0)
+
+    assert batcher.submit([]) == []
+    assert model.batches == []
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from listing_stream import ListingStreamParser, ListingPage
+
+
+def awkward_title(i):
+    return f'Post {i} with "quotes", {{braces}} and [brackets] \\ é☃'
+
+
+def make_listing(count=5, after="t3_after", before=None):
+    """Build a Reddit listing body with awkward strings in it"""
+    children = [
+        {
+            "kind": "t3",
+            "data": {
+                "id": f"p{i}",
+                "name": f"t3_p{i}",
+                "title": awkward_title(i),
+                "selftext": "line\nbreak \\\" escaped quote",
+                "preview": {"images": [{"source": {"url": f"https://i.redd.it/{i}.jpg?a=1&amp;b=2"}}]},
+                "stickied": i == 0,
+                "score": i * 10,
+            },
+        }
+        for i in range(count)
+    ]
+    return json.dumps({
+        "kind": "Listing",
+        "data": {"after": after, "dist": count, "children": children, "before": before},
+    }).encode("utf-8")
+
+
+def parse_in_chunks(body, chunk_size):
+    parser = ListingStreamParser()
+    children = []
+    for start in range(0, len(body), chunk_size):
+        children.extend(parser.feed(body[start:start + chunk_size]))
+    parser.close()
+    return parser, children
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 100000])
+def test_stream_matches_json(chunk_size):
+    body = make_listing()
+    expected = [child["data"] for child in json.loads(body)["data"]["children"]]
+
+    parser, children = parse_in_chunks(body, chunk_size)
+
+    assert children == expected
+    assert parser.after == "t3_after"
+    assert parser.before is None
+    assert parser.found_children
+
+
+def test_multibyte_characters_split_across_chunks():
+    body = make_listing(count=2)
+    # Every split point, including inside UTF-8 sequences
+    for split in range(1, len(body)):
+        parser = ListingStreamParser()
+        children = parser.feed(body[:split]) + parser.feed(body[split:])
+        assert [child["title"] for child in children] == [awkward_title(0), awkward_title(1)]
+
+
+def test_empty_listing():
+    parser, children = parse_in_chunks(make_listing(count=0, after=None), 5)
+
+    assert children == []
+    assert parser.after is None
+    assert parser.found_children
+
+
+def test_truncated_body_raises():
+    body = make_listing()
+    parser = ListingStreamParser()
+    parser.feed(body[:len(body) // 2])
+
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_listing_page_from_parsed_json():
+    data = json.loads(make_listing(count=3, after="t3_next", before="t3_prev"))
+    page = ListingPage(data=data)
+
+    assert [post["id"] for post in page] == ["p0", "p1", "p2"]
+    assert page.after == "t3_next"
+    assert page.before == "t3_prev"
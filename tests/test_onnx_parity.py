@@ -0,0 +1,61 @@
+import pytest
+
+import config
+from inference_backend import load_text_classifier
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+TEXTS = [
+    "Traffic on the Red Line. Delays again, terrible.",
+    "Great pizza",
+    "Snow storm tonight, anyone know if the game is on?",
+    "Great new pizza restaurant in the city, good food and good rent",
+]
+
+# Largest allowed logit difference from PyTorch, as for benchmarks/check_onnx_parity.py
+LOGIT_TOLERANCE = 1e-3
+INT8_PROBABILITY_TOLERANCE = 0.1
+
+
+@pytest.fixture
+def onnx_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "ONNX_MODELS_DIR", str(tmp_path / "onnx"))
+    return tmp_path / "onnx"
+
+
+def logits(model_config, backend, task, texts):
+    import torch
+
+    tokenizer, model, used = load_text_classifier(dict(model_config, backend=backend), task)
+    assert used == backend
+    inputs = tokenizer(texts, padding=True, return_tensors="pt")
+    with torch.no_grad():
+        return model(**inputs).logits
+
+
+@pytest.mark.parametrize("model, task", [
+    ("sentiment", "sentiment-analysis"),
+    ("nli", "zero-shot-classification"),
+])
+def test_onnx_logits_match_torch(tiny_models, onnx_dir, model, task):
+    expected = logits(tiny_models[model], "torch", task, TEXTS)
+    actual = logits(tiny_models[model], "onnx", task, TEXTS)
+
+    assert any(onnx_dir.rglob("model.onnx"))
+    assert actual.shape == expected.shape
+    assert (actual - expected).abs().max().item() <= LOGIT_TOLERANCE
+
+
+def test_int8_probabilities_stay_close(tiny_models, onnx_dir):
+    expected = logits(tiny_models["sentiment"], "torch", "sentiment-analysis", TEXTS).softmax(dim=-1)
+    actual = logits(tiny_models["sentiment"], "onnx-int8", "sentiment-analysis", TEXTS).softmax(dim=-1)
+
+    assert (actual - expected).abs().max().item() <= INT8_PROBABILITY_TOLERANCE
+
+
+def test_onnx_sessions_use_the_given_thread_count(tiny_models, onnx_dir):
+    _, model, _ = load_text_classifier(dict(tiny_models["sentiment"], backend="onnx"), "sentiment-analysis",
+                                       threads=2)
+
+    assert model.session.get_session_options().intra_op_num_threads == 2
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from models import Post, Sentiment
+from post_index import PostIndex
+from post_store import PostStore
+
+DAY = 86400
+
+
+def make_post(post_id, age_days=0.0, score=0.5, category="News", source="r/boston", now=None):
+    now = time.time() if now is None else now
+    return Post(
+        post_id,
+        title=f"Post {post_id}",
+        content="Some content",
+        published=now - age_days * DAY,
+        source=source,
+        category=category,
+        sentiment=Sentiment(score, "NEGATIVE" if score < 0 else "POSITIVE", score < -0.1),
+        timestamp=now,
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PostStore(db_path=str(tmp_path / "posts.sqlite3"))
+
+
+def test_upsert_replaces_by_id_and_bumps_version(store):
+    start = store.version()
+
+    store.upsert([make_post("a"), make_post("b")])
+    assert store.version() == start + 1
+
+    store.upsert([make_post("a", score=-0.9)])
+    assert store.version() == start + 2
+    assert len(store) == 2
+    assert store.get("a").sentiment.score == pytest.approx(-0.9)
+    assert "a" in store and "missing" not in store
+
+
+def test_empty_upsert_keeps_version(store):
+    version = store.version()
+    store.upsert([])
+    assert store.version() == version
+
+
+def test_retention_deletes_old_posts_and_bumps_version(store):
+    store.upsert([make_post("new", age_days=1), make_post("old", age_days=10), make_post("older", age_days=40)])
+    version = store.version()
+
+    assert store.apply_retention(days=7) == 2
+    assert store.version() == version + 1
+    assert [post.id for post in store.query()] == ["new"]
+
+
+def test_retention_without_deletes_keeps_version(store):
+    store.upsert([make_post("new", age_days=1)])
+    version = store.version()
+
+    assert store.apply_retention(days=7) == 0
+    assert store.apply_retention(days=0) == 0
+    assert store.version() == version
+
+
+def test_version_is_shared_between_connections(store):
+    # A second connection stands in for the worker process writing to the same file
+    worker = PostStore(db_path=store.db_path)
+    version = store.version()
+
+    worker.upsert([make_post("a")])
+
+    assert store.version() == version + 1
+    assert store.get("a") is not None
+
+
+def test_query_filters_newest_first(store):
+    now = time.time()
+    store.upsert([
+        make_post("a", age_days=3, score=-0.5, category="Crime", now=now),
+        make_post("b", age_days=2, score=0.5, category="News", source="r/cambridge", now=now),
+        make_post("c", age_days=1, score=0.0, category="Crime", now=now),
+    ])
+
+    assert [post.id for post in store.query()] == ["c", "b", "a"]
+    assert [post.id for post in store.query(categories=["Crime"])] == ["c", "a"]
+    assert [post.id for post in store.query(sentiment="Negative")] == ["a"]
+    assert [post.id for post in store.query(negative_only=True)] == ["a"]
+    assert [post.id for post in store.query(sources=["r/cambridge"])] == ["b"]
+    assert [post.id for post in store.query(since=now - 2.5 * DAY, limit=1, offset=1)] == ["b"]
+    assert store.count(categories=["Crime"]) == 2
+
+
+def test_index_refresh_returns_the_version_it_indexed(store):
+    store.upsert([make_post("a")])
+    index = PostIndex(store)
+
+    assert index.refresh() == store.version()
+    assert len(index) == 1
+
+    store.upsert([make_post("b")])
+    assert index.refresh() == store.version()
+    assert len(index) == 2
+
+    # Retention removes posts, so the index is rebuilt
+    store.upsert([make_post("old", age_days=30)])
+    store.apply_retention(days=7)
+    assert index.refresh() == store.version()
+    assert index.count() == 2
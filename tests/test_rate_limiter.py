@@ -0,0 +1,82 @@
+import pytest
+
+import fetcher
+from fetcher import RateLimiter
+
+
+class FakeClock:
+    """Stands in for time.monotonic() and time.sleep() in the fetcher module"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(fetcher.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(fetcher.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_burst_then_refill_rate(clock):
+    limiter = RateLimiter(requests_per_minute=60, burst=3)
+
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+    # The bucket is empty: one token refills every second
+    limiter.acquire()
+    assert sum(clock.sleeps) == pytest.approx(1.0)
+
+
+def test_retry_after_pauses_every_caller(clock):
+    limiter = RateLimiter(requests_per_minute=600, burst=10)
+
+    limiter.observe(429, {"Retry-After": "30"})
+    limiter.acquire()
+
+    assert sum(clock.sleeps) == pytest.approx(30.0)
+
+
+def test_429_without_headers_pauses_a_minute(clock):
+    limiter = RateLimiter(requests_per_minute=600, burst=10)
+
+    limiter.observe(429, {})
+
+    assert limiter.paused_until == pytest.approx(clock.now + 60)
+
+
+def test_exhausted_quota_pauses_until_reset(clock):
+    limiter = RateLimiter(requests_per_minute=600, burst=10)
+
+    limiter.observe(200, {"X-Ratelimit-Remaining": "0.0", "X-Ratelimit-Reset": "12"})
+
+    assert limiter.paused_until == pytest.approx(clock.now + 12)
+
+
+def test_remaining_quota_does_not_pause(clock):
+    limiter = RateLimiter(requests_per_minute=600, burst=10)
+
+    limiter.observe(200, {"X-Ratelimit-Remaining": "5", "X-Ratelimit-Reset": "12"})
+    limiter.observe(200, {"Retry-After": "not a number"})
+
+    assert limiter.paused_until == 0.0
+
+
+def test_shorter_pause_does_not_cut_a_longer_one(clock):
+    limiter = RateLimiter(requests_per_minute=600, burst=10)
+
+    limiter.observe(429, {"Retry-After": "30"})
+    limiter.observe(429, {"Retry-After": "5"})
+
+    assert limiter.paused_until == pytest.approx(clock.now + 30)
@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+import config
+from rss_parser import RedditRSSParser
+
+# Listing ids, newest first
+IDS = [f"p{i}" for i in range(20, 0, -1)]
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = headers or {}
+        self._body = json.dumps(body).encode("utf-8") if body is not None else b""
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self._body), 16):
+            yield self._body[start:start + 16]
+
+    def json(self):
+        return json.loads(self._body)
+
+    def close(self):
+        pass
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeReddit:
+    """Serves IDS as a paginated /new listing with an ETag"""
+
+    def __init__(self):
+        self.failing_after = set()
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        after = params.get('after')
+        self.requests.append(after)
+        if after in self.failing_after:
+            return FakeResponse(500)
+        if headers.get('If-None-Match') == "v1":
+            return FakeResponse(304)
+        start = IDS.index(after[3:]) + 1 if after else 0
+        page = IDS[start:start + params['limit']]
+        children = [{"data": {"id": i, "name": f"t3_{i}", "title": i, "created_utc": 1}} for i in page]
+        next_after = f"t3_{page[-1]}" if start + params['limit'] < len(IDS) else None
+        return FakeResponse(200, {"data": {"after": next_after, "children": children, "before": None}},
+                            {"ETag": "v1"})
+
+
+@pytest.fixture
+def reddit(monkeypatch):
+    monkeypatch.setattr(config, "DEMO_MODE", False)
+    monkeypatch.setattr(config, "REDDIT_MAX_PAGES", 2)
+    monkeypatch.setattr(config, "REDDIT_POLL_PAGE_SIZE", 3)
+    monkeypatch.setattr(config, "REDDIT_PAGE_SIZE", 3)
+    return FakeReddit()
+
+
+@pytest.fixture
+def parser(reddit):
+    parser = RedditRSSParser("https://www.reddit.com/r/test/new.json")
+    parser.session.get = reddit.get
+    return parser
+
+
+def ids(posts):
+    return [post.id for post in posts]
+
+
+def test_failed_page_keeps_posts_and_validators(parser, reddit):
+    reddit.failing_after.add("t3_p18")
+
+    # The second page fails: the first page's posts are kept and no ETag is saved
+    assert ids(parser.get_new_posts(set())) == ["p20", "p19", "p18"]
+    assert parser.etag is None
+
+    # So the next poll reads the listing again instead of getting 304
+    reddit.failing_after.clear()
+    assert ids(parser.get_new_posts(set()))[:3] == ["p20", "p19", "p18"]
+    assert parser.etag == "v1"
+
+
+def test_unchanged_listing_returns_nothing(parser):
+    parser.get_new_posts({"p20"})
+
+    assert parser.get_new_posts(set()) == []
+
+
+def test_walk_stops_at_first_seen_post(parser, reddit):
+    assert ids(parser.get_new_posts({"p19"})) == ["p20"]
+    assert reddit.requests == [None]
+    assert not parser.needs_backfill
+
+
+def test_hot_listing_skips_seen_posts_without_stopping(reddit):
+    parser = RedditRSSParser("https://www.reddit.com/r/test/hot.json")
+    parser.session.get = reddit.get
+
+    # Hot isn't in time order, so unseen posts after a seen one are still new
+    assert ids(parser.get_new_posts({"p19"})) == ["p20", "p18"]
+    assert reddit.requests == [None]
+    assert not parser.needs_backfill
+
+
+def test_truncated_walk_is_backfilled(parser):
+    posts = parser.get_new_posts({"p10"})
+    assert ids(posts) == ["p20", "p19", "p18", "p17", "p16", "p15"]
+    assert parser.needs_backfill
+
+    seen = set(ids(posts)) | {"p10"}
+    assert ids(parser.backfill(seen, pages=1)) == ["p14", "p13", "p12"]
+    assert parser.needs_backfill
+
+    # Stops at the first seen post and clears the cursor
+    assert ids(parser.backfill(seen)) == ["p11"]
+    assert not parser.needs_backfill
+    assert parser.backfill(seen) == []
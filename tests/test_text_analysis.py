@@ -0,0 +1,35 @@
+import pytest
+
+import config
+from text_analysis import text_analysis_mode, warm_up_models
+
+NAMES = ["categorizer", "sentiment", "image"]
+
+
+@pytest.mark.parametrize("text_mode, categorizer_mode, expected", [
+    ("separate", "nli", "separate"),
+    ("separate", "embedding", "separate"),
+    ("shared", "embedding", "shared"),
+    # Shared needs the embedding categorizer
+    ("shared", "nli", "separate"),
+    ("bogus", "embedding", "separate"),
+])
+def test_mode_resolves_from_config(monkeypatch, text_mode, categorizer_mode, expected):
+    monkeypatch.setattr(config, "TEXT_ANALYSIS_MODE", text_mode)
+    monkeypatch.setattr(config, "CATEGORIZER_MODE", categorizer_mode)
+
+    assert text_analysis_mode() == expected
+
+
+def test_shared_mode_does_not_warm_up_the_sentiment_model(monkeypatch):
+    monkeypatch.setattr(config, "TEXT_ANALYSIS_MODE", "shared")
+    monkeypatch.setattr(config, "CATEGORIZER_MODE", "embedding")
+
+    assert warm_up_models(NAMES) == ["categorizer", "image"]
+
+
+def test_separate_mode_warms_up_the_given_models(monkeypatch):
+    monkeypatch.setattr(config, "TEXT_ANALYSIS_MODE", "separate")
+
+    assert warm_up_models(NAMES) == NAMES
+    assert warm_up_models(["image"]) == ["image"]
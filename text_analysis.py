@@ -0,0 +1,350 @@
+import os
+import hashlib
+import logging
+import threading
+import numpy as np
+import config
+from inference_cache import create_inference_cache
+from metrics import stage_timer
+from models import Sentiment
+from tokenization import TokenizedTexts
+
+logger = logging.getLogger("sentiment_agent")
+
+# "separate" runs the sentiment model and the categorizer side by side on shared
+# token ids; "shared" runs one sentence encoder per post for both tasks
+TEXT_ANALYSIS_MODES = ("separate", "shared")
+
+
+class SentimentHead:
+    """
+    Linear sentiment classifier over sentence embeddings
+
+    The default head scores embeddings against prototypes of the
+    config.SENTIMENT_DESCRIPTIONS phrases. fit_sentiment_head() replaces it
+    with weights distilled from the full sentiment model.
+    """
+
+    def __init__(self, weight, bias, labels):
+        """
+        Args:
+            weight (numpy.ndarray): (labels, dimension) weight matrix
+            bias (numpy.ndarray): (labels,) bias vector
+            labels (list): Label of each row, 'NEGATIVE' or 'POSITIVE'
+        """
+        self.weight = np.asarray(weight, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.labels = [str(label) for label in labels]
+
+    @classmethod
+    def from_prototypes(cls, embedder):
+        """Build the default head from the embedded SENTIMENT_DESCRIPTIONS phrases"""
+        labels = list(config.SENTIMENT_DESCRIPTIONS)
+        prototypes = []
+        for label in labels:
+            embeddings = embedder.embed(config.SENTIMENT_DESCRIPTIONS[label])
+            prototype = embeddings.mean(axis=0)
+            prototypes.append(prototype / np.linalg.norm(prototype))
+        weight = np.stack(prototypes) / config.SENTIMENT_PROTOTYPE_TEMPERATURE
+        return cls(weight, np.zeros(len(labels)), labels)
+
+    @classmethod
+    def load(cls, path, model_config):
+        """
+        Load a fitted head
+
+        Args:
+            path (str): .npz file written by save()
+            model_config (dict): Embedding model the head must have been fitted on
+
+        Returns:
+            SentimentHead: The head, or None if there is no usable file
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            fitted_on = str(data["model"])
+            if fitted_on != f"{model_config['name']}@{model_config['revision']}":
+                logger.warning(f"Sentiment head {path} was fitted on {fitted_on}, ignoring it")
+                return None
+            return cls(data["weight"], data["bias"], data["labels"].tolist())
+
+    def save(self, path, model_config):
+        """
+        Save the head
+
+        Args:
+            path (str): .npz file to write
+            model_config (dict): Embedding model the head was fitted on
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, weight=self.weight, bias=self.bias, labels=np.array(self.labels),
+                     model=np.array(f"{model_config['name']}@{model_config['revision']}"))
+
+    def fingerprint(self):
+        """Hash of the weights, so cached results are dropped when the head changes"""
+        digest = hashlib.sha1(self.weight.tobytes())
+        digest.update(self.bias.tobytes())
+        digest.update(repr(self.labels).encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    def predict(self, embeddings):
+        """
+        Classify embeddings
+
+        Args:
+            embeddings (numpy.ndarray): (texts, dimension) unit embeddings
+
+        Returns:
+            list: Sentiment records in the standard result format
+        """
+        # Imported here so the dashboard can check the mode without importing torch
+        from sentiment_analyzer import sentiment_from_label
+
+        logits = embeddings @ self.weight.T + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return [
+            sentiment_from_label(self.labels[label], float(probabilities[row, label]))
+            for row, label in enumerate(best)
+        ]
+
+
+def fit_sentiment_head(embedder, teacher, posts, steps=300):
+    """
+    Distill the full sentiment model into a linear head over sentence embeddings
+
+    Args:
+        embedder (TextEmbedder): Shared sentence encoder
+        teacher (SentimentAnalyzer): Sentiment model whose outputs are the targets
+        posts (list): Post records to fit on
+        steps (int): Optimizer steps
+
+    Returns:
+        SentimentHead: The fitted head
+    """
+    import torch
+
+    tokenized = TokenizedTexts([post.text for post in posts])
+    embeddings = torch.from_numpy(embedder.embed(tokenized))
+    # Soft targets: the teacher's (NEGATIVE, POSITIVE) probabilities
+    positive = [
+        abs(sentiment.score) if sentiment.label == 'POSITIVE' else 1 - abs(sentiment.score)
+        for sentiment in teacher.analyze_batch(posts, tokenized=tokenized)
+    ]
+    targets = torch.tensor([[1 - p, p] for p in positive])
+
+    # Softmax regression on the frozen embeddings
+    linear = torch.nn.Linear(embeddings.shape[1], 2)
+    optimizer = torch.optim.Adam(linear.parameters(), lr=0.05, weight_decay=1e-4)
+    for _ in range(steps):
+        optimizer.zero_grad()
+        loss = -(targets * linear(embeddings).log_softmax(dim=-1)).sum(dim=-1).mean()
+        loss.backward()
+        optimizer.step()
+    logger.info(f"Fitted sentiment head on {len(posts)} posts (loss {loss.item():.4f})")
+    return SentimentHead(linear.weight.detach().numpy(), linear.bias.detach().numpy(), ['NEGATIVE', 'POSITIVE'])
+
+
+class TextAnalysisEngine:
+    """
+    Categorizes posts and analyzes their sentiment in one pass over their text
+
+    Each post's text is built and tokenized once. In "separate" mode the
+    categorizer and the sentiment model reuse those token ids wherever their
+    vocabularies match. In "shared" mode (embedding categorizer, no sentiment
+    model) each post goes through one sentence encoder, whose embedding feeds
+    both the category prototypes and a linear sentiment head.
+    """
+
+    def __init__(self, categorizer, sentiment_analyzer=None):
+        """
+        Args:
+            categorizer (PostCategorizer): Categorization model
+            sentiment_analyzer (SentimentAnalyzer, optional): Sentiment model; leave out to
+                run "shared" mode, which needs the categorizer in "embedding" mode
+        """
+        self.categorizer = categorizer
+        self.sentiment_analyzer = sentiment_analyzer
+        self.mode = "separate" if sentiment_analyzer is not None else "shared"
+
+        if self.mode == "shared":
+            if categorizer.mode != "embedding":
+                raise ValueError("A shared encoder needs the categorizer in embedding mode")
+            self.embedder = categorizer.embedder
+            self.sentiment_head = (
+                SentimentHead.load(config.SENTIMENT_HEAD_PATH, config.EMBEDDING_MODEL)
+                or SentimentHead.from_prototypes(self.embedder)
+            )
+            # The head's results replace the sentiment model's, so they're cached separately
+            self.cache = create_inference_cache(
+                config.EMBEDDING_MODEL,
+                variant=repr(("sentiment", self.sentiment_head.fingerprint(), config.EMBEDDING_MAX_LENGTH,
+                              config.NEGATIVE_THRESHOLD))
+            )
+        else:
+            self.cache = None
+
+    def analyze_batch(self, posts, batch_size=None):
+        """
+        Categorize many posts and analyze their sentiment
+
+        Args:
+            posts (list): Post records
+            batch_size (int, optional): Passed on to the categorizer's NLI model
+
+        Returns:
+            list: (category, Sentiment) tuples in the same order as posts
+        """
+        if not posts:
+            return []
+
+        tokenized = TokenizedTexts([post.text for post in posts])
+
+        if self.mode == "separate":
+            with stage_timer("categorize"):
+                categories = self.categorizer.categorize_batch(posts, batch_size, tokenized=tokenized)
+            with stage_timer("sentiment"):
+                sentiments = self.sentiment_analyzer.analyze_batch(posts, tokenized=tokenized)
+            return list(zip(categories, sentiments))
+
+        texts = tokenized.texts
+        sentiments = self.cache.get_many(texts) if self.cache is not None else [None] * len(texts)
+        categories = (
+            self.categorizer.cache.get_many(texts) if self.categorizer.cache is not None else [None] * len(texts)
+        )
+
+        # Encode each post that either task still needs exactly once
+        missing = [i for i in range(len(texts)) if sentiments[i] is None or categories[i] is None]
+        if missing:
+            subset = tokenized.subset(missing)
+            with stage_timer("encode"):
+                embeddings = self.embedder.embed(subset)
+            with stage_timer("categorize"):
+                computed_categories = self.categorizer.categorize_batch(
+                    [posts[i] for i in missing], batch_size, tokenized=subset, embeddings=embeddings
+                )
+            with stage_timer("sentiment"):
+                computed_sentiments = self.sentiment_head.predict(embeddings)
+            new_sentiments = []
+            for i, category, sentiment in zip(missing, computed_categories, computed_sentiments):
+                categories[i] = category
+                if sentiments[i] is None:
+                    sentiments[i] = sentiment
+                    new_sentiments.append((texts[i], sentiment.to_dict()))
+            if self.cache is not None and new_sentiments:
+                self.cache.put_many([text for text, _ in new_sentiments], [result for _, result in new_sentiments])
+
+        # Cached entries are dicts; each call gets its own Sentiment records
+        sentiments = [
+            Sentiment.from_dict(sentiment) if isinstance(sentiment, dict) else sentiment for sentiment in sentiments
+        ]
+        return list(zip(categories, sentiments))
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def text_analysis_mode(categorizer_mode=None):
+    """
+    Resolve the mode create_text_engine() runs in, without loading any model
+
+    Args:
+        categorizer_mode (str, optional): The categorizer's mode, defaults to config.CATEGORIZER_MODE
+
+    Returns:
+        str: "shared" when config.TEXT_ANALYSIS_MODE asks for it and the categorizer
+            runs in "embedding" mode, else "separate"
+    """
+    if categorizer_mode is None:
+        categorizer_mode = config.CATEGORIZER_MODE
+    if config.TEXT_ANALYSIS_MODE == "shared" and categorizer_mode == "embedding":
+        return "shared"
+    return "separate"
+
+
+def warm_up_models(names):
+    """
+    Drop the models the text analysis engine won't use from a warm-up list
+
+    Args:
+        names (list): Registry model names, e.g. config.WARM_UP_MODELS
+
+    Returns:
+        list: The names, without "sentiment" in "shared" mode
+    """
+    if text_analysis_mode() == "shared":
+        return [name for name in names if name != "sentiment"]
+    return list(names)
+
+
+def create_text_engine(registry):
+    """
+    Create a text analysis engine from the models in a registry
+
+    Runs in the mode text_analysis_mode() resolves; in "shared" mode the
+    sentiment model is never loaded.
+
+    Args:
+        registry (ModelRegistry): Registry to load the models from
+
+    Returns:
+        TextAnalysisEngine: The engine
+    """
+    categorizer = registry.get("categorizer")
+    if config.TEXT_ANALYSIS_MODE not in TEXT_ANALYSIS_MODES:
+        logger.warning(f"Unknown text analysis mode '{config.TEXT_ANALYSIS_MODE}', using separate")
+    elif config.TEXT_ANALYSIS_MODE == "shared" and categorizer.mode != "embedding":
+        logger.warning("TEXT_ANALYSIS_MODE=shared needs CATEGORIZER_MODE=embedding, using separate")
+    mode = text_analysis_mode(categorizer.mode)
+    engine = TextAnalysisEngine(categorizer, registry.get("sentiment") if mode == "separate" else None)
+    logger.info(f"Text analysis running in {engine.mode} mode")
+    return engine
+
+
+def get_text_engine():
+    """
+    Get the process-wide text analysis engine, loading its models from the registry
+
+    Returns:
+        TextAnalysisEngine: The shared engine, see create_text_engine()
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from model_registry import get_registry
+
+                _engine = create_text_engine(get_registry())
+    return _engine
+
+
+if __name__ == "__main__":
+    import argparse
+    from model_registry import get_registry
+    from post_store import get_post_store
+
+    parser = argparse.ArgumentParser(description="Shared-encoder text analysis tools")
+    parser.add_argument("--fit-sentiment-head", action="store_true",
+                        help="Distill the sentiment model into a head for TEXT_ANALYSIS_MODE=shared")
+    parser.add_argument("--limit", type=int, default=5000, help="Most recent stored posts to fit on")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.fit_sentiment_head:
+        from text_embedder import TextEmbedder
+
+        posts = get_post_store().query(limit=args.limit)
+        if not posts:
+            raise SystemExit("No stored posts to fit on; run the ingestion first")
+        head = fit_sentiment_head(TextEmbedder(), get_registry().get("sentiment"), posts)
+        head.save(config.SENTIMENT_HEAD_PATH, config.EMBEDDING_MODEL)
+        print(f"Saved sentiment head to {config.SENTIMENT_HEAD_PATH}")
+    else:
+        parser.print_help()
@@ -0,0 +1,79 @@
+import logging
+import config
+import torch
+from profiling import profiled, section
+from tokenization import SpecialTokens, TokenizedTexts
+
+logger = logging.getLogger("sentiment_agent")
+
+
+class TextEmbedder:
+    """
+    Small sentence encoder that turns texts into unit-length embedding vectors
+
+    Embeddings are the attention-masked mean of the encoder's last hidden
+    state (sentence-transformers pooling), L2-normalized so a dot product
+    between two embeddings is their cosine similarity.
+    """
+
+    def __init__(self, model_config=None):
+        """
+        Args:
+            model_config (dict, optional): Model configuration with 'name' and 'revision',
+                defaults to config.EMBEDDING_MODEL
+        """
+        from transformers import AutoModel, AutoTokenizer
+
+        self.model_config = model_config or config.EMBEDDING_MODEL
+        name, revision = self.model_config["name"], self.model_config["revision"]
+        logger.info(f"Initializing sentence encoder {name}")
+        self.tokenizer = AutoTokenizer.from_pretrained(name, revision=revision)
+        self.model = AutoModel.from_pretrained(name, revision=revision)
+        self.model.eval()
+        self.max_length = min(self.tokenizer.model_max_length, config.EMBEDDING_MAX_LENGTH)
+        self.special_tokens = SpecialTokens(self.tokenizer)
+
+    @profiled("embed")
+    def embed(self, texts, batch_size=None):
+        """
+        Embed texts in length-bucketed batches
+
+        Args:
+            texts (list or TokenizedTexts): Texts to embed, possibly already tokenized
+                for another model with the same vocabulary
+            batch_size (int, optional): Texts per forward pass, defaults to config.EMBEDDING_BATCH_SIZE
+
+        Returns:
+            numpy.ndarray: float32 array of shape (len(texts), dimension), one unit vector per text
+        """
+        batch_size = batch_size or config.EMBEDDING_BATCH_SIZE
+        if not isinstance(texts, TokenizedTexts):
+            texts = TokenizedTexts(texts)
+        with section("embed.tokenize"):
+            room = self.max_length - self.special_tokens.single_count
+            input_ids = [self.special_tokens.single(ids[:room]) for ids in texts.ids_for(self.tokenizer)]
+
+        # Bucket by length so short posts are not padded up to long ones
+        order = sorted(range(len(input_ids)), key=lambda i: len(input_ids[i]))
+
+        embeddings = torch.zeros(len(input_ids), self.model.config.hidden_size)
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            with section("embed.tokenize"):
+                batch = self.tokenizer.pad(
+                    {
+                        'input_ids': [input_ids[i] for i in indices],
+                        'attention_mask': [[1] * len(input_ids[i]) for i in indices]
+                    },
+                    return_tensors="pt"
+                ).to(self.model.device)
+
+            with section("embed.forward"), torch.no_grad():
+                hidden = self.model(**batch).last_hidden_state
+
+            with section("embed.postprocess"):
+                mask = batch['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                embeddings[indices] = torch.nn.functional.normalize(pooled, dim=-1).cpu()
+
+        return embeddings.numpy()
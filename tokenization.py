@@ -0,0 +1,138 @@
+import hashlib
+import config
+
+# Longest input any text model takes; posts are tokenized once up to this length
+# and each model truncates the shared ids to its own limit
+MAX_SHARED_TOKENS = max(config.CATEGORIZER_MAX_LENGTH, config.SENTIMENT_MAX_LENGTH, config.EMBEDDING_MAX_LENGTH)
+
+# Tokenized with every tokenizer to tell whether two of them produce the same ids
+_PROBE_TEXT = "Hello WORLD, it's 12:30 at the Café!"
+
+
+def tokenizer_fingerprint(tokenizer):
+    """
+    Get a key that is equal for tokenizers producing the same token ids
+
+    DistilBERT and MiniLM both use the bert-base-uncased vocabulary, for
+    example, so their ids can be shared.
+
+    Args:
+        tokenizer (transformers.PreTrainedTokenizer): Tokenizer to identify
+
+    Returns:
+        str: Hash of the vocabulary and of the ids of a probe text
+    """
+    fingerprint = getattr(tokenizer, "_shared_fingerprint", None)
+    if fingerprint is None:
+        digest = hashlib.sha1()
+        digest.update(repr(sorted(tokenizer.get_vocab().items())).encode("utf-8"))
+        digest.update(repr(tokenizer.encode(_PROBE_TEXT, add_special_tokens=False)).encode("utf-8"))
+        fingerprint = digest.hexdigest()
+        tokenizer._shared_fingerprint = fingerprint
+    return fingerprint
+
+
+class SpecialTokens:
+    """
+    Adds a tokenizer's special tokens around ids tokenized without them
+
+    The layout ([CLS] a [SEP] b [SEP] for BERT, <s> a </s></s> b </s> for
+    BART, ...) is read off the tokenizer's own output for a probe text, so
+    it works for any tokenizer without model-specific code.
+    """
+
+    def __init__(self, tokenizer):
+        """
+        Args:
+            tokenizer (transformers.PreTrainedTokenizer): Tokenizer whose layout to use
+        """
+        first = tokenizer.encode("hello", add_special_tokens=False)
+        second = tokenizer.encode("world", add_special_tokens=False)
+
+        single = tokenizer("hello")["input_ids"]
+        start = self._find(single, first)
+        self.single_prefix = single[:start]
+        self.single_suffix = single[start + len(first):]
+
+        pair = tokenizer("hello", "world")["input_ids"]
+        start = self._find(pair, first)
+        middle_start = start + len(first)
+        second_start = self._find(pair, second, middle_start)
+        self.pair_prefix = pair[:start]
+        self.pair_middle = pair[middle_start:second_start]
+        self.pair_suffix = pair[second_start + len(second):]
+
+        self.single_count = len(self.single_prefix) + len(self.single_suffix)
+        self.pair_count = len(self.pair_prefix) + len(self.pair_middle) + len(self.pair_suffix)
+
+    @staticmethod
+    def _find(ids, part, start=0):
+        for i in range(start, len(ids) - len(part) + 1):
+            if ids[i:i + len(part)] == part:
+                return i
+        raise ValueError("Could not locate probe tokens in the tokenizer output")
+
+    def single(self, ids):
+        """Wrap one sequence's ids in special tokens"""
+        return self.single_prefix + list(ids) + self.single_suffix
+
+    def pair(self, ids, pair_ids):
+        """Join a sequence pair's ids with special tokens"""
+        return self.pair_prefix + list(ids) + self.pair_middle + list(pair_ids) + self.pair_suffix
+
+
+class TokenizedTexts:
+    """
+    Texts with their token ids, computed at most once per distinct tokenizer
+
+    Models that share a vocabulary get the same ids instead of each running
+    its own tokenizer over every post. Ids are without special tokens and
+    truncated to MAX_SHARED_TOKENS; each model applies its own limit.
+    """
+
+    def __init__(self, texts, ids=None):
+        """
+        Args:
+            texts (list): Texts to tokenize
+            ids (dict, optional): Tokenizer fingerprint -> ids already computed for texts
+        """
+        self.texts = list(texts)
+        self._ids = ids if ids is not None else {}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def ids_for(self, tokenizer):
+        """
+        Get the token ids of every text for a tokenizer
+
+        Args:
+            tokenizer (transformers.PreTrainedTokenizer): Tokenizer of the model that will use the ids
+
+        Returns:
+            list: One list of token ids (without special tokens) per text
+        """
+        fingerprint = tokenizer_fingerprint(tokenizer)
+        ids = self._ids.get(fingerprint)
+        if ids is None:
+            ids = tokenizer(
+                self.texts,
+                add_special_tokens=False,
+                truncation=True,
+                max_length=MAX_SHARED_TOKENS
+            )["input_ids"] if self.texts else []
+            self._ids[fingerprint] = ids
+        return ids
+
+    def subset(self, indices):
+        """
+        Get the tokenized texts at some positions, keeping ids already computed
+
+        Args:
+            indices (list): Positions to keep
+
+        Returns:
+            TokenizedTexts: The selected texts
+        """
+        ids = {fingerprint: [values[i] for i in indices] for fingerprint, values in self._ids.items()}
+        return TokenizedTexts([self.texts[i] for i in indices], ids)
@@ -0,0 +1,63 @@
+import os
+import time
+import logging
+import config
+from fetcher import MultiSourceFetcher
+from model_registry import get_registry
+from pipeline import run_fetch_cycle
+from text_analysis import warm_up_models
+from metrics import start_metrics_server
+
+# Set up logging
+os.makedirs("logs", exist_ok=True)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(),
+        logging.FileHandler("logs/sentiment_agent.log")
+    ]
+)
+logger = logging.getLogger("sentiment_agent")
+
+
+def run_cycle(fetcher):
+    """
+    Poll the sources that are due, logging instead of raising so the worker keeps going
+
+    Args:
+        fetcher (MultiSourceFetcher): Long-lived fetcher shared by every cycle
+    """
+    start = time.perf_counter()
+    try:
+        processed = run_fetch_cycle(fetcher, on_progress=logger.debug, due_only=True)
+        logger.info(f"Fetch cycle processed {processed} posts in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        logger.error(f"Error in fetch cycle: {str(e)}")
+
+
+def main():
+    """
+    Headless ingestion worker
+
+    Sleeps until the next source's adaptive poll interval (starting at
+    config.CHECK_INTERVAL minutes) elapses, but at most
+    config.WORKER_TICK_SECONDS, then polls the sources that are due and
+    writes the results to the shared post store. Run the dashboard with
+    INGESTION_MODE=worker so it only reads from the store.
+    """
+    logger.info("Starting ingestion worker")
+    start_metrics_server()
+    # With a shared inference server the models live there instead
+    if not config.INFERENCE_SERVER_URL:
+        get_registry().warm_up(warm_up_models(config.WARM_UP_MODELS))
+
+    fetcher = MultiSourceFetcher()
+    logger.info(f"Watching {', '.join(fetcher.source_names)}")
+    while True:
+        run_cycle(fetcher)
+        time.sleep(min(max(fetcher.seconds_until_next_poll(), 1), config.WORKER_TICK_SECONDS))
+
+
+if __name__ == "__main__":
+    main()